@@ -0,0 +1,180 @@
+import argparse
+import contextlib
+import logging
+import os
+import re
+import threading
+import time
+
+from typing import Dict, Iterator, Optional
+
+import problems
+
+# Memory used by a test container besides the solution: the runner, the
+# compilers and the validator.
+_CONTAINER_OVERHEAD = 256 * 1024 * 1024
+_DEFAULT_BUDGET_FRACTION = 0.8
+# How often the concurrency can change, in seconds.
+_ADJUSTMENT_INTERVAL = 5.0
+# Percentage of the last 10 seconds in which some tasks were stalled waiting
+# for memory, from /proc/pressure/memory.
+_MEMORY_PRESSURE_THRESHOLD = 10.0
+
+_SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'm': 1024**2, 'g': 1024**3}
+_SIZE = re.compile(r'(\d+)\s*([kmg]?)b?', re.IGNORECASE)
+
+
+def addAdmissionArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control how many tests can run at once."""
+    parser.add_argument('--memory-budget',
+                        type=parseSize,
+                        default=None,
+                        help=('Memory that the tests running at once can use, '
+                              'like 8g. Defaults to '
+                              f'{_DEFAULT_BUDGET_FRACTION:.0%}% of the '
+                              'available memory'))
+
+
+def parseSize(value: str) -> int:
+    """Parses a size in bytes, with an optional k, m or g suffix."""
+    match = _SIZE.fullmatch(value.strip())
+    if match is None:
+        raise argparse.ArgumentTypeError(f'Invalid size: {value!r}')
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2).lower()]
+
+
+def _meminfo() -> Dict[str, int]:
+    """Returns the contents of /proc/meminfo, in bytes."""
+    result: Dict[str, int] = {}
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                fields = value.split()
+                if fields:
+                    result[name] = int(fields[0]) * 1024
+    except OSError:
+        pass
+    return result
+
+
+def _memoryPressure() -> Optional[float]:
+    """Returns the share of time that tasks recently stalled on memory."""
+    try:
+        with open('/proc/pressure/memory', 'r') as f:
+            for line in f:
+                fields = line.split()
+                if fields and fields[0] == 'some':
+                    return float(fields[1].split('=')[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+
+def estimateMemory(p: problems.Problem, *, rootDirectory: str) -> int:
+    """Estimates the memory that testing a problem uses, in bytes.
+
+    Solutions run one at a time, so this is the MemoryLimit, plus room for
+    the largest case to be read and its output written, plus the container
+    itself.
+    """
+    largestCase = 0
+    for root, _, filenames in os.walk(
+            os.path.join(rootDirectory, p.path, 'cases')):
+        for filename in filenames:
+            try:
+                largestCase = max(
+                    largestCase,
+                    os.stat(os.path.join(root, filename)).st_size)
+            except OSError:
+                continue
+    memoryLimit = int(p.config.get('limits', {}).get('MemoryLimit', 0))
+    return memoryLimit + 2 * largestCase + _CONTAINER_OVERHEAD
+
+
+class AdmissionController:
+    """Limits the tests that run at once by their memory and the load.
+
+    A test is only admitted while the memory of all the running ones fits in
+    the budget, although a single test is always admitted so that large
+    problems still run. Concurrency is lowered, one test at a time, when
+    the machine is under memory pressure or its load is above the number of
+    cores, and raised back once it recovers.
+    """
+    def __init__(self, *, budget: int, maxWorkers: int) -> None:
+        self.budget = budget
+        self.maxWorkers = maxWorkers
+        self.limit = maxWorkers
+        self._condition = threading.Condition()
+        self._running = 0
+        self._reserved = 0
+        self._lastAdjustment = 0.0
+
+    def _underPressure(self) -> bool:
+        pressure = _memoryPressure()
+        if pressure is not None:
+            if pressure >= _MEMORY_PRESSURE_THRESHOLD:
+                return True
+        else:
+            meminfo = _meminfo()
+            if meminfo.get('MemAvailable', 1) < 0.1 * meminfo.get(
+                    'MemTotal', 0):
+                return True
+        try:
+            return os.getloadavg()[0] > (os.cpu_count() or 1)
+        except OSError:
+            return False
+
+    def _adjustLocked(self) -> None:
+        now = time.monotonic()
+        if now - self._lastAdjustment < _ADJUSTMENT_INTERVAL:
+            return
+        self._lastAdjustment = now
+        if self._underPressure():
+            if self.limit > 1:
+                self.limit -= 1
+                logging.warning(
+                    'Memory pressure or load is high. Running at most %d '
+                    'tests at once.', self.limit)
+        elif self.limit < self.maxWorkers:
+            self.limit += 1
+            logging.info('Running at most %d tests at once.', self.limit)
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def admitted(self, footprint: int) -> Iterator[None]:
+        """Waits until a test that uses `footprint` bytes can run."""
+        with self._condition:
+            while True:
+                self._adjustLocked()
+                if self._running == 0 or (
+                        self._running < self.limit
+                        and self._reserved + footprint <= self.budget):
+                    break
+                # Wake up from time to time to notice that the pressure is
+                # gone.
+                self._condition.wait(timeout=_ADJUSTMENT_INTERVAL)
+            self._running += 1
+            self._reserved += footprint
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._reserved -= footprint
+                self._condition.notify_all()
+
+
+def admissionController(args: argparse.Namespace, *,
+                        maxWorkers: int) -> AdmissionController:
+    """Returns an admission controller from the parsed arguments."""
+    budget: Optional[int] = args.memory_budget
+    if budget is None:
+        available = _meminfo().get('MemAvailable')
+        if available is None:
+            # Without a way to know, only the concurrency is limited.
+            budget = maxWorkers * (1 << 40)
+        else:
+            budget = int(available * _DEFAULT_BUDGET_FRACTION)
+    logging.debug('Memory budget for tests: %d MiB', budget // (1024 * 1024))
+    return AdmissionController(budget=budget, maxWorkers=maxWorkers)
@@ -0,0 +1,106 @@
+import argparse
+import os
+import threading
+import unittest
+import unittest.mock
+
+import admission
+import problems
+import testutil
+
+
+class ParseSizeTest(unittest.TestCase):
+    def test_parseSize(self) -> None:
+        self.assertEqual(admission.parseSize('512'), 512)
+        self.assertEqual(admission.parseSize('64k'), 64 * 1024)
+        self.assertEqual(admission.parseSize(' 8 GB'), 8 * 1024**3)
+        self.assertEqual(admission.parseSize('256M'), 256 * 1024**2)
+        with self.assertRaises(argparse.ArgumentTypeError):
+            admission.parseSize('8t')
+
+
+class EstimateMemoryTest(testutil.TempDirectoryTestCase):
+    def test_estimateMemory(self) -> None:
+        for name, size in (('1.in', 10), ('2.in', 1000), ('2.out', 5)):
+            self.writeFile(os.path.join('p', 'cases', 'sub', name),
+                           b'x' * size)
+        p = problems.Problem(path='p',
+                             title='p',
+                             config={'limits': {
+                                 'MemoryLimit': 33554432
+                             }})
+        self.assertEqual(
+            admission.estimateMemory(p, rootDirectory=self.tempDirectory),
+            33554432 + 2 * 1000 + admission._CONTAINER_OVERHEAD)
+
+
+class AdmissionControllerTest(unittest.TestCase):
+    def _controller(self, *, underPressure: bool = False,
+                    **kwargs: int) -> admission.AdmissionController:
+        controller = admission.AdmissionController(**kwargs)
+        patcher = unittest.mock.patch.object(controller,
+                                             '_underPressure',
+                                             return_value=underPressure)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return controller
+
+    def test_budget(self) -> None:
+        controller = self._controller(budget=100, maxWorkers=4)
+        admitted = threading.Event()
+
+        def _second() -> None:
+            with controller.admitted(60):
+                admitted.set()
+
+        with controller.admitted(60):
+            thread = threading.Thread(target=_second)
+            thread.start()
+            self.assertFalse(admitted.wait(timeout=0.2))
+        self.assertTrue(admitted.wait(timeout=5))
+        thread.join()
+
+        with controller.admitted(40), controller.admitted(60):
+            pass
+
+    def test_oversized(self) -> None:
+        controller = self._controller(budget=100, maxWorkers=4)
+        # A test that does not fit is still admitted when it runs alone.
+        with controller.admitted(1000):
+            pass
+
+    def test_pressure(self) -> None:
+        controller = self._controller(underPressure=True,
+                                      budget=1000,
+                                      maxWorkers=4)
+        with self.assertLogs(level='WARNING'):
+            with controller.admitted(1):
+                pass
+        self.assertEqual(controller.limit, 3)
+        # The limit only changes once per interval.
+        with controller.admitted(1):
+            pass
+        self.assertEqual(controller.limit, 3)
+
+    def test_arguments(self) -> None:
+        parser = argparse.ArgumentParser()
+        admission.addAdmissionArguments(parser)
+        self.assertIn('80% of the available memory',
+                      ' '.join(parser.format_help().split()))
+
+    def test_admissionController(self) -> None:
+        args = argparse.Namespace(memory_budget=1 << 30)
+        controller = admission.admissionController(args, maxWorkers=3)
+        self.assertEqual(controller.budget, 1 << 30)
+        self.assertEqual(controller.maxWorkers, 3)
+
+        with unittest.mock.patch.object(admission,
+                                        '_meminfo',
+                                        return_value={'MemAvailable': 1000}):
+            controller = admission.admissionController(
+                argparse.Namespace(memory_budget=None), maxWorkers=3)
+        self.assertEqual(controller.budget, 800)
+
+
+if __name__ == '__main__':
+    unittest.main()
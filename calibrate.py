@@ -0,0 +1,342 @@
+#!/usr/bin/python3
+import argparse
+import collections
+import concurrent.futures
+import difflib
+import json
+import logging
+import math
+import os
+import shutil
+import sys
+import threading
+
+from typing import Any, DefaultDict, Dict, List, Mapping, Optional, Tuple
+
+import yaml
+
+import configindex
+import headroom
+import problems
+import repository
+import runtests
+import schemas
+import topology
+
+# Case times of each solution, across all the repetitions.
+_SolutionTimes = DefaultDict[str, DefaultDict[str, List[float]]]
+
+
+def _calibrationConfig(config: Mapping[str, Any],
+                       multiplier: float) -> Dict[str, Any]:
+    """Returns the settings used while calibrating.
+
+    The limits are raised, so that the solutions that are expected to time
+    out run long enough to measure how slow they are.
+    """
+    limits = dict(config['limits'])
+    for name in ('TimeLimit', 'OverallWallTimeLimit'):
+        limits[name] = math.ceil(
+            headroom.parseDuration(limits[name]) * multiplier * 1000)
+    return dict(config, limits=limits)
+
+
+def _runRepetitions(p: problems.Problem, *, repetitions: int, jobs: int,
+                    limitMultiplier: float, resultsDirectory: str,
+                    rootDirectory: str, ci: bool) -> Optional[_SolutionTimes]:
+    """Runs all the solutions of a problem several times, in parallel."""
+    testsConfig = runtests.loadTestsConfig(p, rootDirectory=rootDirectory)
+    calibrationProblem = p._replace(
+        config=_calibrationConfig(p.config, limitMultiplier))
+
+    # Each repetition gets its own copy of the problem, since generated .out
+    # files are written to it.
+    views = [
+        runtests.problemView(calibrationProblem,
+                             runtests.FULL_SCOPE,
+                             testsConfig,
+                             rootDirectory=rootDirectory,
+                             viewDirectory=os.path.join(
+                                 resultsDirectory, 'views', str(repetition),
+                                 p.path),
+                             linkOutputs=False)
+        for repetition in range(repetitions)
+    ]
+
+    cpus = topology.allocate(max(1, min(jobs, repetitions)))
+    threadAffinityMapping: Dict[int, int] = {}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(cpus),
+            initializer=runtests.threadInitializer,
+            initargs=(threadAffinityMapping, threading.Lock(),
+                      cpus)) as executor:
+        futures = [
+            executor.submit(runtests.testProblem,
+                            view,
+                            threadAffinityMapping=threadAffinityMapping,
+                            resultsDirectory=os.path.join(
+                                resultsDirectory, 'runs', str(repetition)),
+                            rootDirectory=rootDirectory,
+                            ci=ci) for repetition, view in enumerate(views)
+        ]
+        results = [future.result() for future in futures]
+
+    times: _SolutionTimes = collections.defaultdict(
+        lambda: collections.defaultdict(list))
+    for result in results:
+        if result is None:
+            return None
+        for testResult in result[1].get('tests', []):
+            if testResult['type'] != 'solutions':
+                continue
+            for usage in headroom.caseUsages(testResult):
+                times[testResult['filename']][usage.name].append(usage.time)
+    return times
+
+
+def _roundUp(seconds: float) -> float:
+    """Rounds a time limit up to 10ms, or to 100ms above one second."""
+    step = 0.1 if seconds >= 1 else 0.01
+    # Rounded again, so that e.g. 12 steps are 1.2 and not 1.2000000000000002.
+    return round(math.ceil(round(seconds / step, 6)) * step, 2)
+
+
+def proposeTimeLimit(times: Mapping[str, Mapping[str, List[float]]],
+                     expectedVerdicts: Mapping[str, str],
+                     safetyFactor: float) -> Tuple[float, bool]:
+    """Proposes a time limit from the measured case times.
+
+    The limit is the slowest run of any accepted solution, times the safety
+    factor. Returns the limit, and whether it is also at least the safety
+    factor away from the fastest that every intended TLE solution gets in
+    its slowest case.
+    """
+    slowestAccepted = max((max(caseTimes) for solution, cases in times.items()
+                           if expectedVerdicts.get(solution, 'AC') == 'AC'
+                           for caseTimes in cases.values()),
+                          default=0.0)
+    timeLimit = _roundUp(slowestAccepted * safetyFactor)
+
+    fastestTimeLimitExceeded = min(
+        (max(min(caseTimes) for caseTimes in cases.values())
+         for solution, cases in times.items()
+         if expectedVerdicts.get(solution) == 'TLE' and cases),
+        default=math.inf)
+    return timeLimit, timeLimit * safetyFactor <= fastestTimeLimitExceeded
+
+
+def _formatLimit(original: yaml.Node, seconds: float) -> str:
+    """Formats a time limit like the value it replaces."""
+    if original.tag == 'tag:yaml.org,2002:str':
+        return json.dumps(f'{seconds:g}s')
+    return str(round(seconds * 1000))
+
+
+def timeLimitPatch(settingsPath: str, relativePath: str,
+                   seconds: float) -> Optional[str]:
+    """Returns a patch that sets limits.TimeLimit in a settings.json.
+
+    Only the value is replaced, so the formatting of the file is kept.
+    """
+    with open(settingsPath, 'r') as f:
+        contents = f.read()
+    root = yaml.compose(contents, Loader=configindex.YamlLoader)
+    value: Optional[yaml.Node] = None
+    for key, node in getattr(root, 'value', []):
+        if key.value != 'limits' or not isinstance(node, yaml.MappingNode):
+            continue
+        for limitKey, limitNode in node.value:
+            if limitKey.value == 'TimeLimit':
+                value = limitNode
+    if value is None:
+        return None
+    patched = (contents[:value.start_mark.index] +
+               _formatLimit(value, seconds) + contents[value.end_mark.index:])
+    if patched == contents:
+        return None
+    return ''.join(
+        difflib.unified_diff(contents.splitlines(keepends=True),
+                             patched.splitlines(keepends=True),
+                             fromfile=f'a/{relativePath}',
+                             tofile=f'b/{relativePath}'))
+
+
+def _summary(times: List[float]) -> Dict[str, float]:
+    ordered = sorted(times)
+    return {
+        'min': ordered[0],
+        'p50': ordered[len(ordered) // 2],
+        'max': ordered[-1],
+    }
+
+
+def calibrateProblem(p: problems.Problem, *, repetitions: int, jobs: int,
+                     safetyFactor: float, limitMultiplier: float,
+                     resultsDirectory: str, rootDirectory: str,
+                     ci: bool) -> bool:
+    """Proposes a time limit for a problem.
+
+    The proposal, and the case time distribution it is based on, are
+    written to the results directory. Returns whether the proposed limit
+    separates the accepted from the intended TLE solutions.
+    """
+    logging.info('%-30s: Running all solutions %d times...', p.title,
+                 repetitions)
+    problemResultsDirectory = os.path.join(resultsDirectory, p.path)
+    times = _runRepetitions(p,
+                            repetitions=repetitions,
+                            jobs=jobs,
+                            limitMultiplier=limitMultiplier,
+                            resultsDirectory=problemResultsDirectory,
+                            rootDirectory=rootDirectory,
+                            ci=ci)
+    if times is None:
+        problems.error(f'Failed to calibrate {p.title}',
+                       filename=os.path.join(p.path, 'settings.json'),
+                       ci=ci)
+        return False
+
+    expectedVerdicts = {
+        solution['filename']: solution.get('verdict', 'AC')
+        for solution in runtests.loadTestsConfig(
+            p, rootDirectory=rootDirectory).get('solutions', [])
+    }
+    timeLimit, separated = proposeTimeLimit(times, expectedVerdicts,
+                                            safetyFactor)
+    currentTimeLimit = headroom.parseDuration(p.config['limits']['TimeLimit'])
+
+    for solution, cases in sorted(times.items()):
+        slowest = max(max(caseTimes) for caseTimes in cases.values())
+        logging.info(
+            f'    {expectedVerdicts.get(solution, "AC"):3} | '
+            f'{solution[:40]:40} | slowest case {slowest:7.3f}s')
+    logging.info('%-30s: Current TimeLimit %.3fs, proposed %.3fs', p.title,
+                 currentTimeLimit, timeLimit)
+
+    settingsPath = os.path.join(p.path, 'settings.json')
+    patch = timeLimitPatch(os.path.join(rootDirectory, settingsPath),
+                           settingsPath, timeLimit)
+    with open(os.path.join(problemResultsDirectory, 'calibration.json'),
+              'w') as f:
+        json.dump(
+            {
+                'repetitions': repetitions,
+                'safety_factor': safetyFactor,
+                'current_time_limit': currentTimeLimit,
+                'proposed_time_limit': timeLimit,
+                'separated': separated,
+                'solutions': {
+                    solution: {
+                        'expected': expectedVerdicts.get(solution, 'AC'),
+                        'cases': {
+                            case: _summary(caseTimes)
+                            for case, caseTimes in cases.items()
+                        },
+                    }
+                    for solution, cases in times.items()
+                },
+            },
+            f,
+            indent=2)
+    if patch is not None:
+        with open(os.path.join(problemResultsDirectory, 'calibration.patch'),
+                  'w') as f:
+            f.write(patch)
+        logging.info('Suggested change:\n%s', patch)
+
+    if not separated:
+        problems.warning(
+            f'No time limit separates the accepted from the TLE solutions '
+            f'of {p.title} by a factor of {safetyFactor}',
+            filename=settingsPath,
+            ci=ci)
+    return separated
+
+
+def _main() -> None:
+    rootDirectory = repository.repositoryRoot()
+
+    parser = argparse.ArgumentParser(
+        description=('Run the solutions of problems several times, and '
+                     'propose time limits for them.'))
+    parser.add_argument('--ci',
+                        action='store_true',
+                        help='Signal that this is being run from the CI.')
+    parser.add_argument('--all',
+                        action='store_true',
+                        help=('Consider all problems, instead of '
+                              'only those that have changed'))
+    parser.add_argument('--jobs',
+                        '-j',
+                        type=int,
+                        default=runtests.availableProcessors(),
+                        help='Number of repetitions to run concurrently')
+    parser.add_argument('--repetitions',
+                        '-n',
+                        type=int,
+                        default=5,
+                        help='Number of times each solution is run')
+    parser.add_argument('--safety-factor',
+                        type=float,
+                        default=2.0,
+                        help=('Ratio between the time limit and the slowest '
+                              'accepted run, and between the slowest case '
+                              'of any TLE solution and the time limit'))
+    parser.add_argument('--limit-multiplier',
+                        type=float,
+                        default=3.0,
+                        help=('Factor by which the limits are raised while '
+                              'calibrating, to measure the TLE solutions'))
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help='Verbose logging')
+    parser.add_argument('--results-directory',
+                        default=os.path.join(rootDirectory, 'results',
+                                             'calibration'),
+                        help='Directory to store the results of the runs')
+    parser.add_argument('problem_paths',
+                        metavar='PROBLEM',
+                        type=str,
+                        nargs='*')
+    problems.addAnnotationArguments(parser)
+
+    args = parser.parse_args()
+    problems.configureAnnotations(args)
+
+    logging.basicConfig(format='%(asctime)s: %(message)s',
+                        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    if not repository.isWithin(os.path.abspath(args.results_directory),
+                               rootDirectory):
+        parser.error('--results-directory must be inside the repository')
+
+    problemList = problems.problems(allProblems=args.all,
+                                    rootDirectory=rootDirectory,
+                                    problemPaths=args.problem_paths)
+    if not schemas.validate(problemList=problemList,
+                            rootDirectory=rootDirectory,
+                            ci=args.ci):
+        sys.exit(1)
+
+    if os.path.isdir(args.results_directory):
+        shutil.rmtree(args.results_directory)
+    os.makedirs(args.results_directory)
+
+    anyFailure = False
+    for p in problemList:
+        if not calibrateProblem(p,
+                                repetitions=args.repetitions,
+                                jobs=args.jobs,
+                                safetyFactor=args.safety_factor,
+                                limitMultiplier=args.limit_multiplier,
+                                resultsDirectory=args.results_directory,
+                                rootDirectory=rootDirectory,
+                                ci=args.ci):
+            anyFailure = True
+
+    if anyFailure:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,96 @@
+import unittest
+
+import calibrate
+import testutil
+
+_SETTINGS = '''{
+  "limits": {
+    "MemoryLimit": 33554432,
+    "TimeLimit": %s
+  },
+  "title": "sumas"
+}
+'''
+
+
+class ProposeTimeLimitTest(unittest.TestCase):
+    expectedVerdicts = {
+        'solutions/tle.cpp': 'TLE',
+        'solutions/wa.cpp': 'WA',
+    }
+
+    def test_separated(self) -> None:
+        self.assertEqual(
+            calibrate.proposeTimeLimit(
+                {
+                    'solutions/ac.cpp': {
+                        '1': [0.2, 0.25],
+                        '2': [0.3, 0.4],
+                    },
+                    # The TLE solution is only slow in one case.
+                    'solutions/tle.cpp': {
+                        '1': [2.0, 2.5],
+                        '2': [0.1, 0.1],
+                    },
+                    # Only the accepted solutions set the limit.
+                    'solutions/wa.cpp': {
+                        '1': [5.0],
+                    },
+                },
+                self.expectedVerdicts,
+                safetyFactor=2.0), (0.8, True))
+
+    def test_notSeparated(self) -> None:
+        self.assertEqual(
+            calibrate.proposeTimeLimit(
+                {
+                    'solutions/ac.cpp': {
+                        '1': [0.55, 0.6],
+                    },
+                    'solutions/tle.cpp': {
+                        '1': [1.9, 2.5],
+                    },
+                },
+                self.expectedVerdicts,
+                safetyFactor=2.0), (1.2, False))
+
+    def test_roundUp(self) -> None:
+        self.assertEqual(
+            calibrate.proposeTimeLimit({'solutions/ac.cpp': {
+                '1': [0.123]
+            }}, {},
+                                       safetyFactor=1.0), (0.13, True))
+
+
+class TimeLimitPatchTest(testutil.TempDirectoryTestCase):
+    def _patch(self, timeLimit: str, seconds: float) -> str:
+        path = self.writeFile('settings.json', _SETTINGS % timeLimit)
+        patch = calibrate.timeLimitPatch(path, 'p/settings.json', seconds)
+        return patch or ''
+
+    def test_numeric(self) -> None:
+        self.assertEqual(
+            self._patch('1000', 1.5), '--- a/p/settings.json\n'
+            '+++ b/p/settings.json\n'
+            '@@ -1,7 +1,7 @@\n'
+            ' {\n'
+            '   "limits": {\n'
+            '     "MemoryLimit": 33554432,\n'
+            '-    "TimeLimit": 1000\n'
+            '+    "TimeLimit": 1500\n'
+            '   },\n'
+            '   "title": "sumas"\n'
+            ' }\n')
+
+    def test_string(self) -> None:
+        self.assertIn('-    "TimeLimit": "1s"\n+    "TimeLimit": "0.25s"\n',
+                      self._patch('"1s"', 0.25))
+
+    def test_unchanged(self) -> None:
+        self.assertEqual(self._patch('1500', 1.5), '')
+        path = self.writeFile('other.json', '{"limits": {}}\n')
+        self.assertIsNone(calibrate.timeLimitPatch(path, 'other.json', 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import concurrent.futures
+import functools
+import json
+import logging
+import os
+import threading
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import yaml
+
+import manifest
+import repository
+
+_CACHE_VERSION = 1
+
+# libyaml's loader is an order of magnitude faster than the pure-Python one,
+# but it is not always available.
+YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Below this many files, starting the worker threads costs more than it
+# saves.
+_PARALLEL_THRESHOLD = 32
+
+# The (st_mtime_ns, st_size) of a file when it was parsed.
+_Stat = Tuple[int, int]
+
+
+def _stat(path: str) -> _Stat:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _parse(path: str) -> Any:
+    """Parses a .json or .yaml file."""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            return yaml.load(f, Loader=YamlLoader)
+        return json.load(f)
+
+
+def _isJson(value: Any) -> bool:
+    """Returns whether a value is the same after a round trip through JSON.
+
+    YAML files can have values like dates, or keys that are not strings,
+    which would not be read back as they were parsed.
+    """
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return True
+    if isinstance(value, list):
+        return all(_isJson(v) for v in value)
+    if isinstance(value, dict):
+        return all(
+            isinstance(k, str) and _isJson(v) for k, v in value.items())
+    return False
+
+
+class ConfigIndex:
+    """Parses configuration files at most once.
+
+    Parsed files are kept in memory for the duration of the process, and in
+    a JSON cache on disk between runs. Entries are invalidated when the
+    modification time or size of the file changes. The returned values are
+    shared between callers, so they must not be modified.
+    """
+    def __init__(self, cachePath: Optional[str] = None) -> None:
+        self.cachePath = cachePath
+        self._lock = threading.Lock()
+        self._parsed: Dict[str, Tuple[_Stat, Any]] = {}
+        # The entries that are written to the on-disk cache.
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        if cachePath is not None and os.path.isfile(cachePath):
+            try:
+                with open(cachePath, 'r') as f:
+                    contents = json.load(f)
+                if contents.get('version') == _CACHE_VERSION:
+                    self._entries = contents['entries']
+            except (OSError, ValueError):
+                logging.exception('Failed to load config cache %s', cachePath)
+        for path, entry in self._entries.items():
+            self._parsed[path] = (tuple(entry['stat']), entry['value'])
+
+    def _cached(self, path: str, stat: _Stat) -> Tuple[bool, Any]:
+        with self._lock:
+            parsed = self._parsed.get(path)
+        if parsed is None or parsed[0] != stat:
+            return False, None
+        return True, parsed[1]
+
+    def _store(self, path: str, stat: _Stat, value: Any) -> None:
+        with self._lock:
+            self._parsed[path] = (stat, value)
+            if self.cachePath is not None and _isJson(value):
+                self._entries[path] = {'stat': list(stat), 'value': value}
+                self._dirty = True
+
+    def load(self, path: str) -> Any:
+        """Returns the parsed contents of a .json or .yaml file."""
+        path = os.path.abspath(path)
+        stat = _stat(path)
+        found, value = self._cached(path, stat)
+        if not found:
+            value = _parse(path)
+            self._store(path, stat, value)
+        return value
+
+    def loadAll(self, paths: Sequence[str]) -> List[Any]:
+        """Returns the parsed contents of several files, in order.
+
+        Files that are not cached are parsed in parallel, and the on-disk
+        cache is updated.
+        """
+        absolutePaths = [os.path.abspath(path) for path in paths]
+        stats = [_stat(path) for path in absolutePaths]
+        values: List[Any] = [None] * len(paths)
+        missing: List[int] = []
+        for i, (path, stat) in enumerate(zip(absolutePaths, stats)):
+            found, values[i] = self._cached(path, stat)
+            if not found:
+                missing.append(i)
+
+        if len(missing) >= _PARALLEL_THRESHOLD and (os.cpu_count() or 1) > 1:
+            with concurrent.futures.ThreadPoolExecutor() as executor:
+                parsed = list(
+                    executor.map(_parse, [absolutePaths[i] for i in missing]))
+        else:
+            parsed = [_parse(absolutePaths[i]) for i in missing]
+        for i, value in zip(missing, parsed):
+            values[i] = value
+            self._store(absolutePaths[i], stats[i], value)
+
+        if missing:
+            logging.debug('Parsed %d of %d configs', len(missing), len(paths))
+            self.save()
+        return values
+
+    def save(self) -> None:
+        """Writes the on-disk cache, if anything new was parsed."""
+        if self.cachePath is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            contents = {
+                'version': _CACHE_VERSION,
+                'entries': self._entries,
+            }
+            manifest.writeJson(self.cachePath, contents, compact=True)
+            self._dirty = False
+
+
+@functools.lru_cache(maxsize=None)
+def configIndex(rootDirectory: str) -> ConfigIndex:
+    """Returns the process-wide config index of a repository."""
+    return ConfigIndex(
+        os.path.join(repository.stateDirectory(rootDirectory),
+                     'config-cache.json'))
+
+
+def loadConfig(path: str, rootDirectory: Optional[str] = None) -> Any:
+    """Returns the parsed contents of a config file in the repository."""
+    if rootDirectory is None:
+        rootDirectory = repository.repositoryRoot()
+    index = configIndex(rootDirectory)
+    value = index.load(os.path.join(rootDirectory, path))
+    index.save()
+    return value
@@ -0,0 +1,65 @@
+import datetime
+import json
+import os
+import unittest
+import unittest.mock
+
+import configindex
+import testutil
+
+
+class ConfigIndexTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.cachePath = os.path.join(self.tempDirectory, 'state',
+                                      'config-cache.json')
+
+    def test_cache(self) -> None:
+        paths = [
+            self.writeFile(f'p{i}/settings.json', json.dumps({'title': i}))
+            for i in range(4)
+        ]
+        contestPath = self.writeFile('contest.yaml',
+                                     'start_time: 2020-01-01 00:00:00\n')
+        self.assertEqual(
+            configindex.ConfigIndex(self.cachePath).loadAll(paths),
+            [{'title': i} for i in range(4)])
+
+        # Another index reads the configs from the cache instead of the
+        # files, except for the ones that changed.
+        self.writeFile('p1/settings.json', json.dumps({'title': 'new'}))
+        index = configindex.ConfigIndex(self.cachePath)
+        with unittest.mock.patch.object(configindex,
+                                        '_parse',
+                                        wraps=configindex._parse) as parse:
+            self.assertEqual(index.loadAll(paths), [{
+                'title': 0
+            }, {
+                'title': 'new'
+            }, {
+                'title': 2
+            }, {
+                'title': 3
+            }])
+            self.assertEqual(index.load(contestPath), {
+                'start_time': datetime.datetime(2020, 1, 1),
+            })
+        self.assertEqual([call.args for call in parse.call_args_list],
+                         [(paths[1], ), (contestPath, )])
+        index.save()
+
+        # Values that do not survive a round trip through JSON are not
+        # cached.
+        with open(self.cachePath) as f:
+            self.assertEqual(sorted(json.load(f)['entries']), sorted(paths))
+
+    def test_corruptCache(self) -> None:
+        self.writeFile(self.cachePath, '{"version": 1, ')
+        path = self.writeFile('settings.json', '{}')
+        with self.assertLogs(level='ERROR'):
+            index = configindex.ConfigIndex(self.cachePath)
+        self.assertEqual(index.load(path), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
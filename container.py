@@ -5,7 +5,7 @@ import subprocess
 import os.path
 
 from types import TracebackType
-from typing import Any, Iterator, IO, Optional, Type, Sequence
+from typing import Any, Iterator, IO, List, Optional, Type, Sequence
 
 import problems
 
@@ -28,17 +28,19 @@ def _maybe_open(path: Optional[str],
             yield f
 
 
-def getImageName(ci: bool) -> str:
-    """Ensures the container image is present in the expected version."""
+def imageName(ci: bool) -> str:
+    """Returns the tagged name of the container image."""
     if ci:
         # Since this is running on GitHub, downloading the image from the
         # GitHub container registry is significantly faster.
-        imageName = 'docker.pkg.github.com/omegaup/quark/omegaup-runner-ci'
-    else:
-        # This does not require authentication.
-        imageName = 'omegaup/runner-ci'
+        return 'docker.pkg.github.com/omegaup/quark/omegaup-runner-ci:v1.9.67'
+    # This does not require authentication.
+    return 'omegaup/runner-ci:v1.9.67'
 
-    taggedContainerName = f'{imageName}:v1.9.67'
+
+def getImageName(ci: bool) -> str:
+    """Ensures the container image is present in the expected version."""
+    taggedContainerName = imageName(ci)
     if not subprocess.check_output(
         ['docker', 'image', 'ls', '-q', taggedContainerName],
             universal_newlines=True).strip():
@@ -173,3 +175,59 @@ class Compile:
             self.containerId,
         ],
                               stdout=subprocess.DEVNULL)
+
+
+class Runner:
+    """A long-lived container that runs omegaup-runner on demand.
+
+    Starting a container takes a significant fraction of the time needed to
+    test a small problem, so this one is reused across runs. This is
+    intended to be used as a context manager:
+
+    with Runner(rootDirectory='/path/to/repo', ci=False) as r:
+      subprocess.run(r.command(['-oneshot=ci', '-input', 'problems/sumas']))
+    """
+    def __init__(self, rootDirectory: str, ci: bool):
+        self.containerId = ''
+        self.rootDirectory = rootDirectory
+        self.ci = ci
+
+    def __enter__(self) -> 'Runner':
+        self.containerId = subprocess.run([
+            'docker',
+            'run',
+            '--rm',
+            '--detach',
+            '--entrypoint',
+            '/usr/bin/sleep',
+            '--volume',
+            f'{self.rootDirectory}:/src',
+            getImageName(self.ci),
+            'infinity',
+        ],
+                                          universal_newlines=True,
+                                          stdout=subprocess.PIPE,
+                                          check=True).stdout.strip()
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        subprocess.check_call([
+            'docker',
+            'container',
+            'kill',
+            self.containerId,
+        ],
+                              stdout=subprocess.DEVNULL)
+
+    def command(self, args: Sequence[str]) -> List[str]:
+        """Returns the command that runs omegaup-runner with `args`."""
+        return [
+            'docker',
+            'exec',
+            '--workdir',
+            '/src',
+            self.containerId,
+            '/usr/bin/omegaup-runner',
+        ] + list(args)
@@ -1,6 +1,10 @@
+import csv
 import os
 import logging
 from typing import (
+    Callable,
+    Collection,
+    Iterator,
     NamedTuple,
     Mapping,
     Any,
@@ -9,14 +13,16 @@ from typing import (
     Optional,
     Dict,
     Set,
+    Tuple,
 )
+import manifest
+import configindex
 import omegaup.api
+import operations
 import repository
-import json
 import datetime
-import yaml
 
-_CONFIG_FILE = 'contest.yaml'
+CONFIG_FILE = 'contest.yaml'
 
 
 class Contest(NamedTuple):
@@ -28,14 +34,30 @@ class Contest(NamedTuple):
     @staticmethod
     def load(contestPath: str, rootDirectory: str) -> 'Contest':
         """Load a single contest from the path."""
-        with open(os.path.join(rootDirectory, contestPath, _CONFIG_FILE)) as f:
-            problemConfig = yaml.safe_load(f)
+        problemConfig = configindex.loadConfig(
+            os.path.join(contestPath, CONFIG_FILE), rootDirectory)
 
         return Contest(path=contestPath,
-                       title=problemConfig['title'],
+                       title=problemConfig.get('title', contestPath),
                        config=problemConfig)
 
 
+def _loadContests(contestPaths: Sequence[str],
+                  rootDirectory: str) -> List[Contest]:
+    """Loads several contests, parsing their configs in parallel."""
+    contestConfigs = configindex.configIndex(rootDirectory).loadAll([
+        os.path.join(rootDirectory, contestPath, CONFIG_FILE)
+        for contestPath in contestPaths
+    ])
+    return [
+        Contest(path=contestPath,
+                # A missing title is reported by the schema validation.
+                title=contestConfig.get('title', contestPath),
+                config=contestConfig)
+        for contestPath, contestConfig in zip(contestPaths, contestConfigs)
+    ]
+
+
 def contests(allContests: bool = False,
              contestPaths: Sequence[str] = (),
              rootDirectory: Optional[str] = None) -> List[Contest]:
@@ -54,39 +76,35 @@ def contests(allContests: bool = False,
         # Generate the Contest objects from just the path. The title is ignored
         # anyways, since it's read from the configuration file in the contest
         # directory for anything important.
-        return [
-            Contest.load(contestPath=contestPath, rootDirectory=rootDirectory)
-            for contestPath in contestPaths
-        ]
+        return _loadContests(contestPaths, rootDirectory)
 
-    with open(os.path.join(rootDirectory, 'problems.json'), 'r') as p:
-        config = json.load(p)
+    config = configindex.loadConfig('problems.json', rootDirectory)
 
-    configContests: List[Contest] = []
+    enabledContests: List[Mapping[str, Any]] = []
     for contest in config['contests']:
         if contest.get('disabled', False):
             logging.warning('Contest %s disabled. Skipping.', contest['title'])
             continue
-        configContests.append(
-            Contest.load(contestPath=contest['path'],
-                         rootDirectory=rootDirectory))
+        enabledContests.append(contest)
 
     if allContests:
         logging.info('Loading everything as requested.')
-        return configContests
+        return _loadContests([contest['path'] for contest in enabledContests],
+                             rootDirectory)
 
-    changes = repository.gitDiff(rootDirectory)
+    changes = repository.changedFiles(rootDirectory)
 
-    contests: List[Contest] = []
-    for contest in configContests:
-        logging.info('Loading %s.', contest.title)
+    # Only the configs of the contests that changed are loaded.
+    changedPaths: List[str] = []
+    for contest in enabledContests:
+        logging.info('Loading %s.', contest['title'])
 
-        if contest.path not in changes:
-            logging.info('No changes to %s. Skipping.', contest.title)
+        if not changes.containsPrefix(contest['path']):
+            logging.info('No changes to %s. Skipping.', contest['title'])
             continue
-        contests.append(contest)
+        changedPaths.append(contest['path'])
 
-    return contests
+    return _loadContests(changedPaths, rootDirectory)
 
 
 def date_to_timestamp(date: str) -> int:
@@ -94,25 +112,13 @@ def date_to_timestamp(date: str) -> int:
         datetime.datetime.strptime(date, '%Y-%m-%dT%H:%M:%SZ').timestamp())
 
 
-def upsertContest(
-    client: omegaup.api.Client,
-    contestPath: str,
-    canCreate: bool,
-    timeout: datetime.timedelta,
-) -> None:
-    """Upsert a contest to omegaUp given the configuration."""
-    with open(os.path.join(contestPath, _CONFIG_FILE)) as f:
-        contestConfig = yaml.safe_load(f)
-
-    logging.info('Upserting contest %s...', contestConfig['title'])
-
-    title = contestConfig['title']
-    alias = contestConfig['alias']
+def contestPayload(contestConfig: Mapping[str, Any]) -> Dict[str, Any]:
+    """Returns the payload of the contest create/update API call."""
     misc = contestConfig['misc']
     languages = misc['languages']
 
     if languages == 'all':
-        misc['languages'] = ','.join((
+        languages = ','.join((
             'c11-clang',
             'c11-gcc',
             'cpp11-clang',
@@ -135,17 +141,17 @@ def upsertContest(
             'rs',
         ))
     elif languages == 'karel':
-        misc['languages'] = 'kj,kp'
+        languages = 'kj,kp'
     elif languages == 'none':
-        misc['languages'] = ''
+        languages = ''
 
-    payload = {
-        'title': title,
+    return {
+        'title': contestConfig['title'],
         'admission_mode': misc['admission_mode'],
         'description': contestConfig.get('description', ''),
         'feedback': misc["feedback"],
         'finish_time': date_to_timestamp(contestConfig['finish_time']),
-        'languages': misc['languages'],
+        'languages': languages,
         'penalty': misc['penalty']['time'],
         'penalty_calc_policy': misc['penalty']['calc_policy'],
         'penalty_type': misc['penalty']['type'],
@@ -159,153 +165,516 @@ def upsertContest(
         'window_length': contestConfig.get('window_length', None),
     }
 
-    exists = client.contest.details(contest_alias=alias,
-                                    check_=False)["status"] == 'ok'
-
-    if not exists:
-        if not canCreate:
-            raise Exception("Contest doesn't exist!")
-        logging.info("Contest doesn't exist. Creating contest.")
-        endpoint = '/api/contest/create/'
-        payload['alias'] = alias
-    else:
-        endpoint = '/api/contest/update/'
-        payload['contest_alias'] = alias
-
-    client.query(endpoint, payload, timeout_=timeout)
 
-    # Adding admins
-    targetAdmins: Sequence[str] = contestConfig.get('admins',
-                                                    {}).get('users', [])
-    targetAdminGroups: Sequence[str] = contestConfig.get('admins',
-                                                         {}).get('groups', [])
+# Columns of a .csv roster that can hold the contestant usernames.
+_ROSTER_COLUMNS = ('username', 'usernameoremail', 'email')
 
-    allAdmins = client.contest.admins(contest_alias=alias)
+# The parts of a contest that are reconciled independently, and recorded in
+# the deploy manifest.
+CONTEST_SECTIONS = ('settings', 'admins', 'problems', 'contestants')
 
-    if len(targetAdmins) > 0:
-        admins = {
-            a['username'].lower()
-            for a in allAdmins['admins'] if a['role'] == 'admin'
-        }
+# Endpoints of the calls that create or update the contest itself.
+_CONTEST_UPSERT_ENDPOINTS = ('/api/contest/create/', '/api/contest/update/')
 
-        desiredAdmins = {admin.lower() for admin in targetAdmins}
+# Endpoints of the calls that sync the contestant roster.
+_CONTESTANT_ENDPOINTS = ('/api/contest/addUser/', '/api/contest/removeUser/')
 
-        clientAdmin: Set[str] = set()
-        if client.username:
-            clientAdmin.add(client.username.lower())
-        adminsToRemove = admins - desiredAdmins - clientAdmin
-        adminsToAdd = desiredAdmins - admins - clientAdmin
 
-        for admin in adminsToAdd:
-            logging.info('Adding contest admin: %s', admin)
-            client.contest.addAdmin(contest_alias=alias, usernameOrEmail=admin)
+def readRoster(path: str, header: bool = True) -> Iterator[str]:
+    """Yields the lowercased usernames in a roster file, as they are read.
 
-        for admin in adminsToRemove:
-            logging.info('Removing contest admin: %s', admin)
-            client.contest.removeAdmin(contest_alias=alias,
-                                       usernameOrEmail=admin)
+    Text files have one username or email per line. Blank lines and lines
+    that start with `#` are ignored. In .csv files, the usernames are read
+    from the `username`, `usernameOrEmail` or `email` column of the header,
+    or from the first column if `header` is false.
+    """
+    with open(path, 'r', newline='') as f:
+        if not path.lower().endswith('.csv'):
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield line.lower()
+            return
+
+        column = 0
+        reader = csv.reader(f)
+        if header:
+            headerRow = [cell.strip().lower() for cell in next(reader, [])]
+            matches = [c for c in _ROSTER_COLUMNS if c in headerRow]
+            if not matches:
+                raise Exception(
+                    f'{path} has no username, usernameOrEmail or email '
+                    'column. Set contestants.header to false if it has '
+                    'no header.')
+            column = headerRow.index(matches[0])
+        for row in reader:
+            if len(row) <= column:
+                continue
+            contestant = row[column].strip()
+            if contestant and not contestant.startswith('#'):
+                yield contestant.lower()
+
+
+def _desiredContestants(
+    contestPath: str,
+    contestConfig: Mapping[str, Any],
+) -> Optional[Set[str]]:
+    """Returns the contestants from the config and its roster file.
 
-    adminGroups = {
-        a['alias'].lower()
-        for a in allAdmins['group_admins'] if a['role'] == 'admin'
+    Returns None if the contestants are not managed by the config.
+    """
+    contestantsConfig = contestConfig.get('contestants', {})
+    users: Sequence[str] = contestantsConfig.get('users', [])
+    rosterFile: Optional[str] = contestantsConfig.get('file')
+    if not users and rosterFile is None:
+        return None
+
+    desiredContestants = {user.lower() for user in users}
+    if rosterFile is not None:
+        desiredContestants.update(
+            readRoster(os.path.join(contestPath, rosterFile),
+                       header=contestantsConfig.get('header', True)))
+    return desiredContestants
+
+
+def contestHashes(contestPath: str,
+                  contestConfig: Mapping[str, Any]) -> Dict[str, str]:
+    """Returns the hashes of each section of the desired contest state."""
+    contestants = contestConfig.get('contestants', {})
+    rosterFile: Optional[str] = contestants.get('file')
+    rosterHash: Optional[str] = None
+    if rosterFile is not None:
+        rosterHash = manifest.hashFile(os.path.join(contestPath, rosterFile))
+    return {
+        'settings': manifest.hashJson(contestPayload(contestConfig)),
+        'admins': manifest.hashJson(contestConfig.get('admins', {})),
+        'problems': manifest.hashJson(contestConfig.get('problems', [])),
+        'contestants': manifest.hashJson({
+            'config': contestants,
+            'roster': rosterHash,
+        }),
     }
 
-    desiredGroups = {group.lower() for group in targetAdminGroups}
 
-    groupsToRemove = adminGroups - desiredGroups
-    groupsToAdd = desiredGroups - adminGroups
+def _changedSections(contestPath: str, contestConfig: Mapping[str, Any],
+                     deployManifest: Optional[manifest.DeployManifest],
+                     verifyRemote: bool) -> Tuple[Set[str], Dict[str, str]]:
+    """Returns the sections that changed since the last deploy, and hashes.
 
-    for group in groupsToAdd:
-        logging.info('Adding contest admin group: %s', group)
-        client.contest.addGroupAdmin(contest_alias=alias, group=group)
+    All sections are considered changed if there is no record of a previous
+    deploy, or the remote state is to be verified.
+    """
+    hashes = contestHashes(contestPath, contestConfig)
+    if deployManifest is None:
+        return set(CONTEST_SECTIONS), hashes
+    previous = deployManifest.get('contests', contestConfig['alias'])
+    if verifyRemote or not previous:
+        return set(CONTEST_SECTIONS), hashes
+    return {
+        section
+        for section in CONTEST_SECTIONS
+        if previous.get(section) != hashes[section]
+    }, hashes
+
+
+class ContestState(NamedTuple):
+    """The current state of a contest in omegaUp."""
+    exists: bool
+    admins: omegaup.api.ApiReturnType
+    problems: omegaup.api.ApiReturnType
+    users: omegaup.api.ApiReturnType
+    # The number of API calls that were made to read the state.
+    apiCalls: int
+
+
+def readContestState(
+    client: omegaup.api.Client,
+    alias: str,
+    *,
+    sections: Collection[str] = CONTEST_SECTIONS,
+    exists: Optional[bool] = None,
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+) -> ContestState:
+    """Reads the current state of a contest.
+
+    All the reads are issued concurrently, so this costs a single round-trip.
+    Only the state needed to reconcile the given `sections` is read, and
+    whether the contest exists is not read if it is already known. A contest
+    that does not exist yet, or whose state was not read, is reported as
+    having no admins, problems nor contestants.
+    """
+    reads: Dict[str, Callable[[], omegaup.api.ApiReturnType]] = {}
+    if exists is None:
+        reads['details'] = lambda: client.contest.details(contest_alias=alias,
+                                                          check_=False)
+    if 'admins' in sections:
+        reads['admins'] = lambda: client.contest.admins(contest_alias=alias,
+                                                        check_=False)
+    if 'problems' in sections:
+        reads['problems'] = lambda: client.contest.problems(
+            contest_alias=alias, check_=False)
+    if 'contestants' in sections:
+        reads['users'] = lambda: client.contest.users(contest_alias=alias,
+                                                      check_=False)
+    results = operations.readConcurrently(reads, concurrency=concurrency)
+
+    if exists is None:
+        exists = results['details']['status'] == 'ok'
+    if not exists:
+        results = {}
+    for name in ('admins', 'problems', 'users'):
+        if name in results and results[name].get('status') == 'error':
+            raise Exception(results[name])
+    return ContestState(exists=exists,
+                        admins=results.get('admins', {
+                            'admins': [],
+                            'group_admins': []
+                        }),
+                        problems=results.get('problems', {'problems': []}),
+                        users=results.get('users', {
+                            'users': [],
+                            'groups': []
+                        }),
+                        apiCalls=len(reads))
+
+
+def contestOperations(
+    client: omegaup.api.Client,
+    contestPath: str,
+    contestConfig: Mapping[str, Any],
+    state: ContestState,
+    sections: Collection[str] = CONTEST_SECTIONS,
+) -> List[operations.Operation]:
+    """Computes the calls needed to make the contest match its config.
+
+    Only the given `sections` are reconciled. If the settings are, the first
+    operation creates or updates the contest itself, and must be applied
+    before the rest.
+    """
+    alias = contestConfig['alias']
+    payload = contestPayload(contestConfig)
+    result: List[operations.Operation] = []
+
+    if 'settings' in sections:
+        if not state.exists:
+            payload['alias'] = alias
+            result.append(
+                operations.Operation(endpoint='/api/contest/create/',
+                                     payload=payload,
+                                     description='Creating contest'))
+        else:
+            payload['contest_alias'] = alias
+            result.append(
+                operations.Operation(endpoint='/api/contest/update/',
+                                     payload=payload,
+                                     description='Updating contest'))
 
-    for group in groupsToRemove:
-        logging.info('Removing contest admin group: %s', group)
-        client.contest.removeGroupAdmin(contest_alias=alias, group=group)
+    # Adding admins
+    if 'admins' in sections:
+        targetAdmins: Sequence[str] = contestConfig.get('admins', {}).get(
+            'users', [])
+        targetAdminGroups: Sequence[str] = contestConfig.get(
+            'admins', {}).get('groups', [])
+
+        if len(targetAdmins) > 0:
+            admins = {
+                a['username'].lower()
+                for a in state.admins['admins'] if a['role'] == 'admin'
+            }
+
+            desiredAdmins = {admin.lower() for admin in targetAdmins}
+
+            clientAdmin: Set[str] = set()
+            if client.username:
+                clientAdmin.add(client.username.lower())
+            adminsToRemove = admins - desiredAdmins - clientAdmin
+            adminsToAdd = desiredAdmins - admins - clientAdmin
+
+            for admin in sorted(adminsToAdd):
+                result.append(
+                    operations.Operation(
+                        endpoint='/api/contest/addAdmin/',
+                        payload={
+                            'contest_alias': alias,
+                            'usernameOrEmail': admin,
+                        },
+                        description=f'Adding contest admin: {admin}'))
+
+            for admin in sorted(adminsToRemove):
+                result.append(
+                    operations.Operation(
+                        endpoint='/api/contest/removeAdmin/',
+                        payload={
+                            'contest_alias': alias,
+                            'usernameOrEmail': admin,
+                        },
+                        description=f'Removing contest admin: {admin}'))
+
+        adminGroups = {
+            a['alias'].lower()
+            for a in state.admins['group_admins'] if a['role'] == 'admin'
+        }
+
+        desiredGroups = {group.lower() for group in targetAdminGroups}
+
+        groupsToRemove = adminGroups - desiredGroups
+        groupsToAdd = desiredGroups - adminGroups
+
+        for group in sorted(groupsToAdd):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/contest/addGroupAdmin/',
+                    payload={
+                        'contest_alias': alias,
+                        'group': group,
+                    },
+                    description=f'Adding contest admin group: {group}'))
+
+        for group in sorted(groupsToRemove):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/contest/removeGroupAdmin/',
+                    payload={
+                        'contest_alias': alias,
+                        'group': group,
+                    },
+                    description=f'Removing contest admin group: {group}'))
 
     # Adding problems
-    targetProblems: Sequence[Dict[str,
-                                  Any]] = contestConfig.get('problems', [])
-
-    allProblems = client.contest.problems(contest_alias=alias)
-    problems = {
-        p['alias'].lower(): {
-            'points': p['points'],
-            'order_in_contest': p['order'],
+    if 'problems' in sections:
+        targetProblems: Sequence[Dict[str, Any]] = contestConfig.get(
+            'problems', [])
+
+        problems = {
+            p['alias'].lower(): {
+                'points': p['points'],
+                'order_in_contest': p['order'],
+            }
+            for p in state.problems['problems']
         }
-        for p in allProblems['problems']
-    }
 
-    desiredProblems = {
-        problem['alias'].lower(): {
-            'points': problem.get('points', 100),
-            'order_in_contest': problem.get('order_in_contest', idx + 1),
+        desiredProblems = {
+            problem['alias'].lower(): {
+                'points': problem.get('points', 100),
+                'order_in_contest': problem.get('order_in_contest', idx + 1),
+            }
+            for idx, problem in enumerate(targetProblems)
+        }
+        problemsToRemove = problems.keys() - desiredProblems
+        problemsToUpsert = (desiredProblems.keys() - problems.keys()) | {
+            problem
+            for problem in problems
+            if problem in problems and problem in desiredProblems and
+            (desiredProblems[problem] != problems[problem])
         }
-        for idx, problem in enumerate(targetProblems)
-    }
-    problemsToRemove = problems.keys() - desiredProblems
-    problemsToUpsert = (desiredProblems.keys() - problems.keys()) | {
-        problem
-        for problem in problems
-        if problem in problems and problem in desiredProblems and
-        (desiredProblems[problem] != problems[problem])
-    }
-
-    for problem in problemsToUpsert:
-        logging.info('Upserting contest problem: %s', problem)
-        client.contest.addProblem(
-            contest_alias=alias,
-            problem_alias=problem,
-            order_in_contest=desiredProblems[problem]['order_in_contest'],
-            points=desiredProblems[problem]['points'])
 
-    for problem in problemsToRemove:
-        logging.info('Removing contest problem: %s', problem)
-        client.contest.removeProblem(contest_alias=alias,
-                                     problem_alias=problem)
+        for problem in sorted(problemsToUpsert):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/contest/addProblem/',
+                    payload={
+                        'contest_alias': alias,
+                        'problem_alias': problem,
+                        'order_in_contest':
+                        desiredProblems[problem]['order_in_contest'],
+                        'points': desiredProblems[problem]['points'],
+                    },
+                    description=f'Upserting contest problem: {problem}'))
+
+        for problem in sorted(problemsToRemove):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/contest/removeProblem/',
+                    payload={
+                        'contest_alias': alias,
+                        'problem_alias': problem,
+                    },
+                    description=f'Removing contest problem: {problem}'))
 
     # Adding contestants
-    targetContestants: Sequence[str] = contestConfig.get('contestants',
-                                                         {}).get('users', [])
-    targetContestantGroups: Sequence[str] = contestConfig.get(
-        'contestants', {}).get('groups', [])
+    if 'contestants' in sections:
+        targetContestantGroups: Sequence[str] = contestConfig.get(
+            'contestants', {}).get('groups', [])
+
+        desiredContestants = _desiredContestants(contestPath, contestConfig)
+        if desiredContestants is not None:
+            # Walk the current contestants while consuming the desired ones.
+            # Whatever is left afterwards needs to be added.
+            contestantsToRemove: List[str] = []
+            for c in state.users['users']:
+                contestant = c['username'].lower()
+                if contestant in desiredContestants:
+                    desiredContestants.discard(contestant)
+                else:
+                    contestantsToRemove.append(contestant)
+
+            for contestant in sorted(desiredContestants):
+                result.append(
+                    operations.Operation(
+                        endpoint='/api/contest/addUser/',
+                        payload={
+                            'contest_alias': alias,
+                            'usernameOrEmail': contestant,
+                        },
+                        description=f'Adding contestant: {contestant}'))
+
+            for contestant in sorted(contestantsToRemove):
+                result.append(
+                    operations.Operation(
+                        endpoint='/api/contest/removeUser/',
+                        payload={
+                            'contest_alias': alias,
+                            'usernameOrEmail': contestant,
+                        },
+                        description=f'Removing contestant: {contestant}'))
+
+        contestantGroups = {
+            c['alias'].lower()
+            for c in state.users['groups']
+        }
 
-    allContestants = client.contest.users(contest_alias=alias)
+        desiredGroups = {group.lower() for group in targetContestantGroups}
 
-    if len(targetContestants) > 0:
-        contestants = {c['username'].lower() for c in allContestants['users']}
+        groupsToRemove = contestantGroups - desiredGroups
+        groupsToAdd = desiredGroups - contestantGroups
 
-        desiredContestants = {
-            contestant.lower()
-            for contestant in targetContestants
-        }
+        for group in sorted(groupsToAdd):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/contest/addGroup/',
+                    payload={
+                        'contest_alias': alias,
+                        'group': group,
+                    },
+                    description=f'Adding contestant group: {group}'))
 
-        contestantsToRemove = contestants - desiredContestants
-        contestantsToAdd = desiredContestants - contestants
+        for group in sorted(groupsToRemove):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/contest/removeGroup/',
+                    payload={
+                        'contest_alias': alias,
+                        'group': group,
+                    },
+                    description=f'Removing contestant group: {group}'))
 
-        for contestant in contestantsToAdd:
-            logging.info('Adding contestant: %s', contestant)
-            client.contest.addUser(contest_alias=alias,
-                                   usernameOrEmail=contestant)
+    return result
 
-        for contestant in contestantsToRemove:
-            logging.info('Removing contestant: %s', contestant)
-            client.contest.removeUser(contest_alias=alias,
-                                      usernameOrEmail=contestant)
 
-    contestantGroups = {c['alias'].lower() for c in allContestants['groups']}
+def planContest(
+    client: omegaup.api.Client,
+    contestPath: str,
+    canCreate: bool,
+    *,
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+    deployManifest: Optional[manifest.DeployManifest] = None,
+    verifyRemote: bool = False,
+) -> operations.Plan:
+    """Computes what upserting a contest would do, without changing it."""
+    contestConfig = configindex.loadConfig(
+        os.path.join(contestPath, CONFIG_FILE))
+
+    sections, _ = _changedSections(contestPath, contestConfig,
+                                   deployManifest, verifyRemote)
+    if not sections:
+        return operations.Plan(title=contestConfig['title'],
+                               action='unchanged',
+                               reads=0,
+                               operations=[])
+    state = readContestState(
+        client,
+        contestConfig['alias'],
+        sections=sections,
+        exists=None if len(sections) == len(CONTEST_SECTIONS) else True,
+        concurrency=concurrency)
+    if state.exists:
+        action = 'update'
+    elif canCreate:
+        action = 'create'
+    else:
+        action = 'missing'
+    return operations.Plan(title=contestConfig['title'],
+                           action=action,
+                           reads=state.apiCalls,
+                           operations=contestOperations(
+                               client, contestPath, contestConfig, state,
+                               sections))
 
-    desiredGroups = {group.lower() for group in targetContestantGroups}
 
-    groupsToRemove = contestantGroups - desiredGroups
-    groupsToAdd = desiredGroups - contestantGroups
+def upsertContest(
+    client: omegaup.api.Client,
+    contestPath: str,
+    canCreate: bool,
+    timeout: datetime.timedelta,
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+    rateLimiter: Optional[operations.RateLimiter] = None,
+    deployManifest: Optional[manifest.DeployManifest] = None,
+    verifyRemote: bool = False,
+) -> None:
+    """Upsert a contest to omegaUp given the configuration.
 
-    for group in groupsToAdd:
-        logging.info('Adding contestant group: %s', group)
-        client.contest.addGroup(contest_alias=alias, group=group)
+    If a `deployManifest` is provided, only the sections that changed since
+    the last successful deploy are read and reconciled, unless `verifyRemote`
+    is set. The sections that are skipped are not read at all, so changes
+    made directly in omegaUp (e.g. through the web UI) are only undone by a
+    deploy with `verifyRemote`.
 
-    for group in groupsToRemove:
-        logging.info('Removing contestant group: %s', group)
-        client.contest.removeGroup(contest_alias=alias, group=group)
+    The contestant roster is synced last, with calls spaced out by
+    `rateLimiter`. Since only the difference with the current roster is
+    applied, an interrupted sync continues where it stopped when retried.
+    """
+    contestConfig = configindex.loadConfig(
+        os.path.join(contestPath, CONFIG_FILE))
+
+    sections, hashes = _changedSections(contestPath, contestConfig,
+                                        deployManifest, verifyRemote)
+    if not sections:
+        logging.info('No changes to %s since the last deploy. Skipping.',
+                     contestConfig['title'])
+        return
+
+    logging.info('Upserting contest %s (%s)...', contestConfig['title'],
+                 ', '.join(s for s in CONTEST_SECTIONS if s in sections))
+
+    # A contest that was deployed before is known to exist, unless all of it
+    # is being reconciled anyways.
+    state = readContestState(
+        client,
+        contestConfig['alias'],
+        sections=sections,
+        exists=None if len(sections) == len(CONTEST_SECTIONS) else True,
+        concurrency=concurrency)
+
+    if not state.exists:
+        if not canCreate:
+            raise Exception("Contest doesn't exist!")
+        logging.info("Contest doesn't exist. Creating contest.")
 
-    logging.info("Successfully upserted contest %s", title)
+    upsertOps: List[operations.Operation] = []
+    contestantOps: List[operations.Operation] = []
+    otherOps: List[operations.Operation] = []
+    for op in contestOperations(client, contestPath, contestConfig, state,
+                                sections):
+        if op.endpoint in _CONTEST_UPSERT_ENDPOINTS:
+            upsertOps.append(op)
+        elif op.endpoint in _CONTESTANT_ENDPOINTS:
+            contestantOps.append(op)
+        else:
+            otherOps.append(op)
+
+    # The contest itself needs to exist before anything else is added to it.
+    for op in upsertOps:
+        logging.info('%s', op.description)
+        client.query(op.endpoint, op.payload, timeout_=timeout)
+    operations.applyOperations(client, otherOps, concurrency=concurrency)
+    operations.applyOperations(
+        client,
+        contestantOps,
+        concurrency=concurrency,
+        rateLimiter=rateLimiter,
+        progress=f'{contestConfig["title"]}: contestants')
+
+    if deployManifest is not None:
+        deployManifest.update('contests', contestConfig['alias'], hashes)
+
+    logging.info("Successfully upserted contest %s", contestConfig['title'])
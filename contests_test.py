@@ -0,0 +1,135 @@
+import os
+import unittest
+
+from typing import List
+
+import contests
+import manifest
+import testutil
+
+
+class ReadRosterTest(testutil.TempDirectoryTestCase):
+    def _read(self, filename: str, contents: str,
+              header: bool = True) -> List[str]:
+        return list(
+            contests.readRoster(self.writeFile(filename, contents),
+                                header=header))
+
+    def test_text(self) -> None:
+        self.assertEqual(
+            self._read('roster.txt',
+                       '# Group A\nAlice\n\n  bob@example.com \n'),
+            ['alice', 'bob@example.com'])
+
+    def test_csv(self) -> None:
+        self.assertEqual(
+            self._read('roster.csv', ('Name,UsernameOrEmail\n'
+                                      'Alice,Alice\n'
+                                      'Bob,\n'
+                                      'Carol\n'
+                                      '"Dave, Jr.",dave@example.com\n')),
+            ['alice', 'dave@example.com'])
+
+    def test_csvColumnPreference(self) -> None:
+        self.assertEqual(
+            self._read('ROSTER.CSV', 'email,username\na@example.com,alice\n'),
+            ['alice'])
+
+    def test_csvWithoutHeader(self) -> None:
+        with self.assertRaisesRegex(Exception, 'contestants.header'):
+            self._read('roster.csv', 'alice,Alice\nbob,Bob\n')
+        self.assertEqual(
+            self._read('roster.csv', 'Alice,a\nbob,b\n', header=False),
+            ['alice', 'bob'])
+
+    def test_desiredContestants(self) -> None:
+        self.writeFile('roster.csv', 'alice\nbob\n')
+        self.assertIsNone(
+            contests._desiredContestants(self.tempDirectory, {}))
+        self.assertEqual(
+            contests._desiredContestants(
+                self.tempDirectory, {
+                    'contestants': {
+                        'users': ['Carol', 'alice'],
+                        'file': 'roster.csv',
+                        'header': False,
+                    },
+                }), {'alice', 'bob', 'carol'})
+
+
+class ChangedSectionsTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.contestPath = self.tempDirectory
+        self.writeFile('roster.txt', 'alice\n')
+        self.contestConfig = {
+            'alias': 'Contest',
+            'title': 'Contest',
+            'start_time': '2026-01-01T00:00:00Z',
+            'finish_time': '2026-01-01T05:00:00Z',
+            'misc': {
+                'admission_mode': 'private',
+                'feedback': 'detailed',
+                'languages': 'all',
+                'penalty': {
+                    'time': 0,
+                    'calc_policy': 'sum',
+                    'type': 'none',
+                    'points_decay_factor': 0,
+                },
+                'requests_user_information': 'no',
+                'score_mode': 'partial',
+                'scoreboard': 100,
+                'show_scoreboard_after': True,
+                'submissions_gap': 60,
+            },
+            'problems': [{'alias': 'sumas', 'points': 100}],
+            'contestants': {'file': 'roster.txt'},
+        }
+        self.deployManifest = manifest.DeployManifest(
+            os.path.join(self.contestPath, 'deploy-manifest.json'),
+            'https://omegaup.com')
+
+    def test_changedSections(self) -> None:
+        sections, hashes = contests._changedSections(self.contestPath,
+                                                     self.contestConfig,
+                                                     self.deployManifest,
+                                                     verifyRemote=False)
+        self.assertEqual(sections, set(contests.CONTEST_SECTIONS))
+        self.deployManifest.update('contests', 'contest', hashes)
+
+        sections, _ = contests._changedSections(self.contestPath,
+                                                self.contestConfig,
+                                                self.deployManifest,
+                                                verifyRemote=False)
+        self.assertEqual(sections, set())
+
+        with open(os.path.join(self.contestPath, 'roster.txt'), 'a') as f:
+            f.write('bob\n')
+        sections, _ = contests._changedSections(
+            self.contestPath,
+            dict(self.contestConfig, problems=[]),
+            self.deployManifest,
+            verifyRemote=False)
+        self.assertEqual(sections, {'problems', 'contestants'})
+
+    def test_verifyRemote(self) -> None:
+        _, hashes = contests._changedSections(self.contestPath,
+                                              self.contestConfig,
+                                              self.deployManifest,
+                                              verifyRemote=False)
+        self.deployManifest.update('contests', 'contest', hashes)
+        sections, _ = contests._changedSections(self.contestPath,
+                                                self.contestConfig,
+                                                self.deployManifest,
+                                                verifyRemote=True)
+        self.assertEqual(sections, set(contests.CONTEST_SECTIONS))
+        sections, _ = contests._changedSections(self.contestPath,
+                                                self.contestConfig,
+                                                None,
+                                                verifyRemote=False)
+        self.assertEqual(sections, set(contests.CONTEST_SECTIONS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import collections
+import logging
+import os
+import subprocess
+
+from typing import Any, Dict, Iterable, List, Mapping, Sequence, Set
+
+import configindex
+import repository
+
+# The git mode of symbolic links.
+_SYMLINK_MODE = '120000'
+
+
+def _relativePath(path: str, rootDirectory: str) -> str:
+    return os.path.relpath(path, rootDirectory).replace(os.sep, '/')
+
+
+def _trackedSymlinks(rootDirectory: str) -> List[str]:
+    """Returns the paths of all the symlinks tracked by git."""
+    output = subprocess.check_output(['git', 'ls-files', '--stage', '-z'],
+                                     cwd=rootDirectory,
+                                     universal_newlines=True)
+    symlinks: List[str] = []
+    for entry in output.split('\0'):
+        if not entry:
+            continue
+        # Each entry looks like '<mode> <object> <stage>\t<path>'.
+        metadata, path = entry.split('\t', 1)
+        if metadata.startswith(_SYMLINK_MODE + ' '):
+            symlinks.append(path)
+    return symlinks
+
+
+class DependencyIndex:
+    """Maps files in the repository to the problems that depend on them.
+
+    A problem depends on everything under its own directory, on the targets
+    of the symlinks under its directory, and on the paths listed in the
+    optional `dependencies` array of its `settings.json`. Those paths are
+    relative to the root of the repository, and can be files or
+    directories.
+    """
+    def __init__(self, rootDirectory: str,
+                 problemConfigs: Mapping[str, Mapping[str, Any]]) -> None:
+        self._dependents: Dict[str, Set[str]] = collections.defaultdict(set)
+
+        for problemPath, problemConfig in problemConfigs.items():
+            self._dependents[problemPath].add(problemPath)
+            for dependency in problemConfig.get('dependencies', []):
+                self._dependents[dependency].add(problemPath)
+
+        problemTrie = repository.PathTrie(problemConfigs)
+        realRoot = os.path.realpath(rootDirectory)
+        for symlink in _trackedSymlinks(rootDirectory):
+            owner = problemTrie.owner(symlink)
+            if owner is None:
+                continue
+            target = os.path.realpath(os.path.join(rootDirectory, symlink))
+            if os.path.commonpath([realRoot, target]) != realRoot:
+                # Files outside of the repository never show up in the diff.
+                continue
+            self._dependents[_relativePath(target, realRoot)].add(owner)
+
+        self._trie = repository.PathTrie(self._dependents)
+
+    def dependents(self, path: str) -> Set[str]:
+        """Returns the problems that depend on a file."""
+        result: Set[str] = set()
+        for dependency in self._trie.ancestors(path):
+            result.update(self._dependents[dependency])
+        return result
+
+    def affected(self, changedFiles: Iterable[str]) -> Dict[str, List[str]]:
+        """Returns the changed files that affect each problem."""
+        result: Dict[str, List[str]] = collections.defaultdict(list)
+        for changedFile in changedFiles:
+            for problemPath in self.dependents(changedFile):
+                result[problemPath].append(changedFile)
+        logging.debug('%d problems affected by the changes', len(result))
+        return dict(result)
+
+
+def dependencyIndex(rootDirectory: str,
+                    problemPaths: Sequence[str]) -> DependencyIndex:
+    """Builds the dependency index of the problems in the repository."""
+    problemConfigs = configindex.configIndex(rootDirectory).loadAll([
+        os.path.join(rootDirectory, problemPath, 'settings.json')
+        for problemPath in problemPaths
+    ])
+    return DependencyIndex(rootDirectory,
+                           dict(zip(problemPaths, problemConfigs)))
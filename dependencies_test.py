@@ -0,0 +1,72 @@
+import json
+import os
+import subprocess
+import unittest
+
+from typing import Any, Mapping
+
+import dependencies
+import testutil
+
+
+class DependencyIndexTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.rootDirectory = os.path.join(self.tempDirectory, 'repo')
+        os.makedirs(self.rootDirectory)
+        subprocess.check_call(['git', 'init', '-q'], cwd=self.rootDirectory)
+
+        self._writeProblem('p/a', {'title': 'a'})
+        self._writeProblem('p/b', {
+            'title': 'b',
+            'dependencies': ['lib/common'],
+        })
+        self._writeProblem('p/ab', {'title': 'ab'})
+        self.writeFile('repo/shared/validator.py', 'print(1)\n')
+        self.writeFile('repo/lib/common/testlib.h', '\n')
+        self.writeFile('repo/lib/other.h', '\n')
+        self._symlink('p/a/validator.py', '../../shared/validator.py')
+        self._symlink('p/ab/lib', '../../lib')
+        # Files outside of the repository are ignored.
+        self.writeFile('outside.txt', '\n')
+        self._symlink('p/ab/outside.txt', '../../../outside.txt')
+        subprocess.check_call(['git', 'add', '.'], cwd=self.rootDirectory)
+
+    def _writeProblem(self, path: str, config: Mapping[str, Any]) -> None:
+        self.writeFile(os.path.join(self.rootDirectory, path, 'settings.json'),
+                       json.dumps(config))
+
+    def _symlink(self, path: str, target: str) -> None:
+        os.symlink(target, os.path.join(self.rootDirectory, path))
+
+    def test_dependents(self) -> None:
+        index = dependencies.dependencyIndex(self.rootDirectory,
+                                             ['p/a', 'p/b', 'p/ab'])
+        self.assertEqual(index.dependents('p/a/settings.json'), {'p/a'})
+        self.assertEqual(index.dependents('p/ab/cases/1.in'), {'p/ab'})
+        self.assertEqual(index.dependents('shared/validator.py'), {'p/a'})
+        self.assertEqual(index.dependents('shared/other.py'), set())
+        self.assertEqual(index.dependents('lib/common/testlib.h'),
+                         {'p/b', 'p/ab'})
+        self.assertEqual(index.dependents('lib/other.h'), {'p/ab'})
+        self.assertEqual(index.dependents('outside.txt'), set())
+        self.assertEqual(index.dependents('p'), set())
+
+    def test_affected(self) -> None:
+        index = dependencies.dependencyIndex(self.rootDirectory,
+                                             ['p/a', 'p/b', 'p/ab'])
+        self.assertEqual(
+            index.affected([
+                'p/a/statements/es.markdown',
+                'shared/validator.py',
+                'lib/common/testlib.h',
+                'README.md',
+            ]), {
+                'p/a': ['p/a/statements/es.markdown', 'shared/validator.py'],
+                'p/b': ['lib/common/testlib.h'],
+                'p/ab': ['lib/common/testlib.h'],
+            })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,395 @@
+#!/usr/bin/python3
+import argparse
+import concurrent.futures
+import contextlib
+import contextvars
+import datetime
+import functools
+import logging
+import os
+import shutil
+import sys
+import threading
+
+from typing import Dict, List, Mapping, Optional
+
+import admission
+import container
+import contests
+import deployclient
+import generateresources
+import headroom
+import journal
+import manifest
+import operations
+import problempackage
+import problems
+import repository
+import runtests
+import schemas
+import topology
+import uploadproblems
+
+_STAGES = ('validate', 'resources', 'test', 'upload', 'contests')
+
+
+def _problemAlias(p: problems.Problem) -> Optional[str]:
+    """Returns the alias of a problem, or None if it has none."""
+    alias = (p.config.get('misc') or {}).get('alias')
+    return alias if isinstance(alias, str) else None
+
+
+def _main() -> None:
+    env = os.environ
+    rootDirectory = repository.repositoryRoot()
+
+    parser = argparse.ArgumentParser(
+        description=('Generate resources, test and upload problems, and '
+                     'upsert contests in a single pipeline.'))
+    parser.add_argument('--ci',
+                        action='store_true',
+                        help='Signal that this is being run from the CI.')
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help=('Consider all problems and contests, instead of only those '
+              'that have changed'))
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help='Verbose logging')
+    parser.add_argument('--stages',
+                        default=_STAGES,
+                        type=lambda x: tuple(x.split(',')),
+                        help=('Comma-separated list of stages to run. Should '
+                              'be a subset of '
+                              '{validate,resources,test,upload,contests}. '
+                              'Runs everything by default.'))
+    parser.add_argument('--problem',
+                        dest='problem_paths',
+                        metavar='PROBLEM',
+                        action='append',
+                        default=[],
+                        help='Only consider this problem. Can be repeated.')
+    parser.add_argument('--contest',
+                        dest='contest_paths',
+                        metavar='CONTEST',
+                        action='append',
+                        default=[],
+                        help='Only consider this contest. Can be repeated.')
+
+    resourcesGroup = parser.add_argument_group('resources')
+    resourcesGroup.add_argument(
+        '--generate',
+        default=generateresources.SUPPORTED_GENERATORS,
+        type=lambda x: set(x.split(',')),
+        help=('Comma-separated list of artifacts to generate. Should be a '
+              'subset of {png,testplan}. Generates everything by default.'))
+
+    testGroup = parser.add_argument_group('test')
+    testGroup.add_argument('--jobs',
+                           '-j',
+                           type=int,
+                           default=runtests.availableProcessors(),
+                           help='Number of problems to test concurrently')
+    testGroup.add_argument('--container-memory',
+                           default=None,
+                           help=('Memory limit of each test container, in '
+                                 '`docker run --memory` format'))
+    testGroup.add_argument('--results-directory',
+                           default=os.path.join(rootDirectory, 'results'),
+                           help='Directory to store the results of the runs')
+    testGroup.add_argument('--overwrite-outs',
+                           action='store_true',
+                           help=('Overwrite all .out files if a generator is '
+                                 'present'))
+
+    uploadGroup = parser.add_argument_group('upload')
+    uploadGroup.add_argument('--url',
+                             default='https://omegaup.com',
+                             help='URL of the omegaUp host.')
+    uploadGroup.add_argument('--api-token',
+                             type=str,
+                             default=env.get('OMEGAUP_API_TOKEN'))
+    uploadGroup.add_argument('-u',
+                             '--username',
+                             type=str,
+                             default=env.get('OMEGAUPUSER'))
+    uploadGroup.add_argument('-p',
+                             '--password',
+                             type=str,
+                             default=env.get('OMEGAUPPASS'))
+    uploadGroup.add_argument('--can-create',
+                             action='store_true',
+                             help=("Whether it's allowable to create "
+                                   "problems and contests that do not "
+                                   "exist."))
+    uploadGroup.add_argument("--timeout",
+                             type=int,
+                             default=60,
+                             help="Timeout for deploy API call (in seconds)")
+    uploadGroup.add_argument('--manifest',
+                             type=str,
+                             default=None,
+                             help=('Path of the deploy manifest that records '
+                                   'what was last deployed. Defaults to a '
+                                   'file in the state directory.'))
+    uploadGroup.add_argument('--force',
+                             action='store_true',
+                             help=('Upload the problems even if the deploy '
+                                   'manifest says they have not changed.'))
+    uploadGroup.add_argument('--verify-remote',
+                             action='store_true',
+                             help=('Read and reconcile every part of the '
+                                   'contests, even those that the deploy '
+                                   'manifest says have not changed. Without '
+                                   'it, changes made to the contests outside '
+                                   'of this repository are not undone.'))
+    uploadGroup.add_argument('--streaming',
+                             action='store_true',
+                             help=('Stream each problem .zip into the '
+                                   'request while it is being built. The '
+                                   'server must accept chunked request '
+                                   'bodies.'))
+    uploadGroup.add_argument('--contest-jobs',
+                             type=int,
+                             default=4,
+                             help=('Maximum number of contests upserted at a '
+                                   'time'))
+    uploadGroup.add_argument('--contestant-rate-limit',
+                             type=float,
+                             default=20.0,
+                             help=('Maximum number of contestant add/remove '
+                                   'calls per second, across all contests'))
+    headroom.addHeadroomArguments(parser)
+    admission.addAdmissionArguments(parser)
+    problempackage.addCompressionArguments(parser)
+    deployclient.addClientArguments(parser)
+    journal.addJournalArguments(parser)
+    problems.addAnnotationArguments(parser)
+
+    args = parser.parse_args()
+    problems.configureAnnotations(args)
+
+    logging.basicConfig(format='%(asctime)s: %(message)s',
+                        level=logging.DEBUG if args.verbose else logging.INFO)
+    logging.getLogger('urllib3').setLevel(logging.CRITICAL)
+
+    if set(args.stages) - set(_STAGES):
+        parser.error(f'Unsupported stages: {set(args.stages) - set(_STAGES)}')
+    unsupportedGenerators = (args.generate -
+                             generateresources.SUPPORTED_GENERATORS)
+    if unsupportedGenerators:
+        parser.error(f'Unsupported generators: {unsupportedGenerators}')
+
+    # Everything below is computed once and shared by all the stages.
+    commit = repository.currentCommit()
+    problemList: List[problems.Problem] = []
+    if {'resources', 'test', 'upload'} & set(args.stages):
+        problemList = problems.problems(allProblems=args.all,
+                                        rootDirectory=rootDirectory,
+                                        problemPaths=args.problem_paths)
+    contestList: List[contests.Contest] = []
+    if 'contests' in args.stages:
+        contestList = contests.contests(allContests=args.all,
+                                        rootDirectory=rootDirectory,
+                                        contestPaths=args.contest_paths)
+
+    # Broken configs are reported before anything slow happens.
+    if 'validate' in args.stages and not schemas.validate(
+            problemList=problemList,
+            contestList=contestList,
+            rootDirectory=rootDirectory,
+            ci=args.ci):
+        sys.exit(1)
+
+    client: Optional[deployclient.Client] = None
+    deployManifest: Optional[manifest.DeployManifest] = None
+    problemsJournal: Optional[journal.DeployJournal] = None
+    contestsJournal: Optional[journal.DeployJournal] = None
+    if {'upload', 'contests'} & set(args.stages):
+        if args.api_token is None and (args.username is None
+                                       or args.password is None):
+            parser.error('--api-token or --username and --password are '
+                         'required to upload')
+        client = deployclient.Client(username=args.username,
+                                     password=args.password,
+                                     api_token=args.api_token,
+                                     url=args.url,
+                                     poolSize=args.api_concurrency)
+        client.dumpMetricsAtExit(args.metrics_file)
+        stateDirectory = repository.stateDirectory(rootDirectory)
+        deployManifest = manifest.DeployManifest(
+            args.manifest
+            or os.path.join(stateDirectory, 'deploy-manifest.json'),
+            url=args.url)
+        problemsJournal = journal.DeployJournal(
+            os.path.join(stateDirectory, 'problems-journal.json'),
+            commit=commit,
+            url=args.url,
+            resume=args.resume)
+        contestsJournal = journal.DeployJournal(
+            os.path.join(stateDirectory, 'contests-journal.json'),
+            commit=commit,
+            url=args.url,
+            resume=args.resume)
+
+    if 'test' in args.stages:
+        # Pull the image once, before any of the tests need it.
+        container.getImageName(args.ci)
+        if os.path.isdir(args.results_directory):
+            shutil.rmtree(args.results_directory)
+        os.makedirs(args.results_directory)
+
+    # Tests run in their own pool, so that each one is pinned to a unique
+    # core, just like in runtests.py.
+    threadAffinityMapping: Dict[int, int] = {}
+    admissionController: Optional[admission.AdmissionController] = None
+    testExecutor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    if 'test' in args.stages:
+        cpus = topology.allocate(args.jobs)
+        admissionController = admission.admissionController(
+            args, maxWorkers=len(cpus))
+        testExecutor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(cpus),
+            initializer=runtests.threadInitializer,
+            initargs=(threadAffinityMapping, threading.Lock(), cpus))
+
+    def _problemPipeline(p: problems.Problem) -> None:
+        if _problemAlias(p) is None:
+            # Only the validate stage reports this otherwise.
+            problems.error(f'{p.title}: settings.json has no misc.alias',
+                           filename=os.path.join(p.path, 'settings.json'),
+                           ci=args.ci)
+            raise Exception('Missing misc.alias')
+        if 'resources' in args.stages:
+            if not generateresources.generateResources(
+                    p,
+                    rootDirectory=rootDirectory,
+                    generate=args.generate,
+                    force=False,
+                    ci=args.ci):
+                raise Exception('Failed generating resources')
+        if testExecutor is not None:
+            if args.overwrite_outs:
+                runtests.removeGeneratedOutputs(p, rootDirectory=rootDirectory)
+            result = testExecutor.submit(
+                contextvars.copy_context().run,
+                functools.partial(runtests.testProblem,
+                                  p,
+                                  threadAffinityMapping=threadAffinityMapping,
+                                  resultsDirectory=args.results_directory,
+                                  rootDirectory=rootDirectory,
+                                  ci=args.ci,
+                                  containerMemory=args.container_memory,
+                                  admissionController=admissionController)
+            ).result()
+            if result is None or not runtests.reportTestResult(
+                    p,
+                    result[1],
+                    resultsDirectory=args.results_directory,
+                    rootDirectory=rootDirectory,
+                    ci=args.ci):
+                raise Exception('Tests failed')
+            if not headroom.reportHeadroom(
+                    p,
+                    result[1],
+                    resultsDirectory=args.results_directory,
+                    warningMargin=args.headroom_warning_margin,
+                    failureMargin=args.headroom_failure_margin,
+                    ci=args.ci):
+                raise Exception('Not enough headroom')
+        if 'upload' in args.stages:
+            assert client is not None
+            uploadproblems.uploadProblem(
+                client,
+                os.path.join(rootDirectory, p.path),
+                commitMessage=f'Deployed automatically from commit {commit}',
+                canCreate=args.can_create,
+                timeout=datetime.timedelta(seconds=args.timeout),
+                deployManifest=deployManifest,
+                streaming=args.streaming,
+                compressionPolicy=problempackage.compressionPolicy(args),
+                concurrency=args.api_concurrency,
+                deployJournal=problemsJournal,
+                retries=args.retries,
+                force=args.force)
+
+    def _runProblem(p: problems.Problem) -> operations.TaskResult:
+        return operations.runTask(p.path,
+                                  functools.partial(_problemPipeline, p))
+
+    rateLimiter = operations.RateLimiter(args.contestant_rate_limit)
+
+    def _runContest(
+        c: contests.Contest,
+        dependencies: Mapping[
+            str, concurrent.futures.Future[operations.TaskResult]],
+    ) -> operations.TaskResult:
+        # Wait for the problems of this contest outside of the task, so
+        # that the time spent waiting is not attributed to it.
+        failed = sorted(alias for alias, future in dependencies.items()
+                        if future.result().error is not None)
+
+        def _upsert() -> None:
+            if failed:
+                raise Exception(f'Problems failed: {", ".join(failed)}')
+            assert client is not None and contestsJournal is not None
+            contestsJournal.run(
+                f'contest:{c.config["alias"]}',
+                'upsert',
+                lambda: contests.upsertContest(
+                    client,
+                    os.path.join(rootDirectory, c.path),
+                    canCreate=args.can_create,
+                    timeout=datetime.timedelta(seconds=args.timeout),
+                    concurrency=args.api_concurrency,
+                    rateLimiter=rateLimiter,
+                    deployManifest=deployManifest,
+                    verifyRemote=args.verify_remote),
+                default=None,
+                retries=args.retries)
+
+        return operations.runTask(c.path, _upsert)
+
+    results: Dict[str, operations.TaskResult] = {}
+    with contextlib.ExitStack() as stack:
+        if testExecutor is not None:
+            stack.enter_context(testExecutor)
+        problemExecutor = stack.enter_context(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, args.jobs)))
+        contestExecutor = stack.enter_context(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, args.contest_jobs)))
+        problemFutures = {
+            p.path: problemExecutor.submit(_runProblem, p)
+            for p in problemList
+        }
+        aliasFutures = {
+            alias.lower(): problemFutures[p.path]
+            for p, alias in ((p, _problemAlias(p)) for p in problemList)
+            if alias is not None
+        }
+        # A contest is upserted only after all the problems it references
+        # that are part of this deploy are done.
+        contestFutures = {
+            c.path: contestExecutor.submit(
+                _runContest, c, {
+                    alias: aliasFutures[alias]
+                    for alias in (str(problem.get('alias', '')).lower()
+                                  for problem in c.config.get('problems', []))
+                    if alias in aliasFutures
+                })
+            for c in contestList
+        }
+        for path, future in problemFutures.items():
+            results[path] = future.result()
+        for path, contestFuture in contestFutures.items():
+            results[path] = contestFuture.result()
+
+    operations.logTaskSummary(results)
+    operations.exitOnFailure(results)
+
+
+if __name__ == '__main__':
+    _main()
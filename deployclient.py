@@ -0,0 +1,344 @@
+import argparse
+import atexit
+import bisect
+import datetime
+import http.cookiejar
+import json
+import logging
+import secrets
+import threading
+import time
+import urllib.parse
+
+from typing import (Any, BinaryIO, Dict, Iterable, Iterator, Mapping, Optional,
+                    Tuple)
+
+import omegaup.api
+import requests
+import requests.adapters
+
+import operations
+
+_DEFAULT_TIMEOUT = datetime.timedelta(minutes=1)
+
+_logger = logging.getLogger('omegaup')
+
+# Upper bounds (in seconds) of the buckets of the latency histograms. The last
+# bucket holds everything slower than the last bound.
+_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _multipartBody(boundary: str, payload: Mapping[str, Any], fileField: str,
+                   filename: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Yields a multipart/form-data body with a single streamed file."""
+    for name, value in payload.items():
+        # Mirror how requests encodes form fields: skip None, and send one
+        # part per element in lists.
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for v in values:
+            if v is None:
+                continue
+            yield (f'--{boundary}\r\n'
+                   f'Content-Disposition: form-data; name="{name}"\r\n'
+                   '\r\n'
+                   f'{v}\r\n').encode('utf-8')
+    yield (f'--{boundary}\r\n'
+           f'Content-Disposition: form-data; name="{fileField}"; '
+           f'filename="{filename}"\r\n'
+           'Content-Type: application/zip\r\n'
+           '\r\n').encode('utf-8')
+    yield from chunks
+    yield f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+
+def addClientArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control the API client."""
+    parser.add_argument('--api-concurrency',
+                        type=int,
+                        default=operations.DEFAULT_CONCURRENCY,
+                        help=('Maximum number of concurrent API calls. Also '
+                              'the size of the connection pool.'))
+    parser.add_argument('--metrics-file',
+                        type=str,
+                        default=None,
+                        help=('Write per-endpoint request metrics as JSON to '
+                              'this file on exit.'))
+
+
+class _EndpointMetrics:
+    """Request counters for a single API endpoint."""
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.totalSeconds = 0.0
+        self.maxSeconds = 0.0
+        self.encodeSeconds = 0.0
+        self.serverSeconds = 0.0
+        self.decodeSeconds = 0.0
+        self.histogram = [0] * (len(_LATENCY_BUCKETS) + 1)
+
+    def percentile(self, q: float) -> float:
+        """Returns an upper bound of the q-th latency percentile."""
+        threshold = q * self.requests
+        seen = 0
+        for bound, count in zip(_LATENCY_BUCKETS, self.histogram):
+            seen += count
+            if seen >= threshold:
+                return min(bound, self.maxSeconds)
+        return self.maxSeconds
+
+    def asDict(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable version of the metrics."""
+        bounds = [f'<={bound:g}s' for bound in _LATENCY_BUCKETS]
+        bounds.append(f'>{_LATENCY_BUCKETS[-1]:g}s')
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'bytes_sent': self.bytesSent,
+            'bytes_received': self.bytesReceived,
+            'seconds': {
+                'total': self.totalSeconds,
+                'max': self.maxSeconds,
+                'encode': self.encodeSeconds,
+                'server': self.serverSeconds,
+                'decode': self.decodeSeconds,
+            },
+            'histogram': dict(zip(bounds, self.histogram)),
+        }
+
+
+class Client(omegaup.api.Client):
+    """An omegaUp API client with deploy-specific extensions.
+
+    All requests go through a single keep-alive connection pool, so this
+    client can be shared by threads that issue concurrent calls. It also
+    records per-endpoint request counts, bytes and latencies. Other
+    omegaup.api clients are not affected.
+    """
+    def __init__(self,
+                 *,
+                 username: Optional[str] = None,
+                 password: Optional[str] = None,
+                 api_token: Optional[str] = None,
+                 auth_token: Optional[str] = None,
+                 url: str = 'https://omegaup.com',
+                 poolSize: int = operations.DEFAULT_CONCURRENCY) -> None:
+        self.url = url
+        self._metricsLock = threading.Lock()
+        self._metrics: Dict[str, _EndpointMetrics] = {}
+        self._httpSession = requests.Session()
+        # Like omegaup.api.Client, do not keep cookies between requests. This
+        # also means the session holds no mutable state other than the pool.
+        self._httpSession.cookies.set_policy(
+            http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+        # Block instead of opening throwaway connections when more than
+        # `poolSize` requests are in flight.
+        self._adapter = requests.adapters.HTTPAdapter(pool_maxsize=poolSize,
+                                                      pool_block=True)
+        self._httpSession.mount('https://', self._adapter)
+        self._httpSession.mount('http://', self._adapter)
+        super().__init__(username=username,
+                         password=password,
+                         api_token=api_token,
+                         auth_token=auth_token,
+                         url=url)
+
+    def _send(self, call: '_Call', url: str, *, data: Mapping[str, Any],
+              headers: Mapping[str, str], files: Optional[Mapping[str, Any]],
+              timeout: float) -> requests.Response:
+        """Sends a request through the connection pool."""
+        start = time.monotonic()
+        if call.upload is None:
+            request = requests.Request('POST',
+                                       url,
+                                       data=data,
+                                       headers=headers,
+                                       files=files)
+        else:
+            fileField, filename, chunks = call.upload
+            boundary = secrets.token_hex(16)
+
+            def _countingBody() -> Iterator[bytes]:
+                for chunk in _multipartBody(boundary, data, fileField,
+                                            filename, chunks):
+                    call.bytesSent += len(chunk)
+                    yield chunk
+
+            request = requests.Request(
+                'POST',
+                url,
+                data=_countingBody(),
+                headers=dict(headers,
+                             **{
+                                 'Content-Type':
+                                 f'multipart/form-data; boundary={boundary}'
+                             }))
+        prepared = self._httpSession.prepare_request(request)
+        if isinstance(prepared.body, (bytes, str)):
+            call.bytesSent = len(prepared.body)
+        call.encodeSeconds = time.monotonic() - start
+
+        r = self._httpSession.send(prepared, timeout=timeout)
+        call.serverSeconds = r.elapsed.total_seconds()
+        call.bytesReceived = len(r.content)
+        call.respondedAt = time.monotonic()
+        return r
+
+    def _record(self, endpoint: str, *, seconds: float, encodeSeconds: float,
+                serverSeconds: float, decodeSeconds: float, bytesSent: int,
+                bytesReceived: int, failed: bool) -> None:
+        with self._metricsLock:
+            metrics = self._metrics.setdefault(endpoint, _EndpointMetrics())
+            metrics.requests += 1
+            metrics.errors += int(failed)
+            metrics.bytesSent += bytesSent
+            metrics.bytesReceived += bytesReceived
+            metrics.totalSeconds += seconds
+            metrics.maxSeconds = max(metrics.maxSeconds, seconds)
+            metrics.encodeSeconds += encodeSeconds
+            metrics.serverSeconds += serverSeconds
+            metrics.decodeSeconds += decodeSeconds
+            metrics.histogram[bisect.bisect_left(_LATENCY_BUCKETS,
+                                                 seconds)] += 1
+
+    def query(self,
+              endpoint: str,
+              payload: Optional[Mapping[str, str]] = None,
+              files_: Optional[Mapping[str, BinaryIO]] = None,
+              timeout_: datetime.timedelta = _DEFAULT_TIMEOUT,
+              check_: bool = True) -> omegaup.api.ApiReturnType:
+        """Issues a raw query to the omegaUp API."""
+        return self._query(_Call(), endpoint, payload, files_, timeout_,
+                           check_)
+
+    def queryStreaming(
+        self,
+        endpoint: str,
+        payload: Mapping[str, Any],
+        fileField: str,
+        filename: str,
+        chunks: Iterable[bytes],
+        timeout_: datetime.timedelta = _DEFAULT_TIMEOUT,
+        check_: bool = True,
+    ) -> omegaup.api.ApiReturnType:
+        """Issues a query that uploads a file as it is being produced.
+
+        The request body is sent with chunked transfer encoding, so neither
+        the file nor the whole body need to be kept in memory or on disk.
+        Not every server accepts chunked request bodies.
+        """
+        return self._query(_Call((fileField, filename, chunks)),
+                           endpoint, payload, None, timeout_, check_)
+
+    def _query(self, call: '_Call', endpoint: str,
+               payload: Optional[Mapping[str, str]],
+               files_: Optional[Mapping[str, BinaryIO]],
+               timeout_: datetime.timedelta,
+               check_: bool) -> omegaup.api.ApiReturnType:
+        """Issues a query through the connection pool, and records its metrics.
+
+        The authentication and the errors are handled like in
+        omegaup.api.Client.query.
+        """
+        start = time.monotonic()
+        failed = True
+        try:
+            data: Dict[str, Any] = {} if payload is None else dict(payload)
+            headers: Dict[str, str] = {}
+            if self.api_token is not None:
+                token = self.api_token
+                if self.username is not None:
+                    token = (f'Credential={self.api_token},'
+                             f'Username={self.username}')
+                headers['Authorization'] = f'token {token}'
+            elif self.auth_token is not None:
+                data['ouat'] = self.auth_token
+            _logger.debug('Calling endpoint: %s', endpoint)
+
+            r = self._send(call,
+                           urllib.parse.urljoin(self.url, endpoint),
+                           data=data,
+                           headers=headers,
+                           files=files_,
+                           timeout=timeout_.total_seconds())
+            try:
+                response: omegaup.api.ApiReturnType = r.json()
+            except ValueError:
+                _logger.exception(r.text)
+                raise
+            if check_ and r.status_code != 200:
+                raise Exception(response)
+            failed = False
+            return response
+        finally:
+            end = time.monotonic()
+            self._record(endpoint,
+                         seconds=end - start,
+                         encodeSeconds=call.encodeSeconds,
+                         serverSeconds=call.serverSeconds,
+                         decodeSeconds=(0.0 if call.respondedAt is None else
+                                        end - call.respondedAt),
+                         bytesSent=call.bytesSent,
+                         bytesReceived=call.bytesReceived,
+                         failed=failed)
+
+    def connectionsOpened(self) -> int:
+        """Returns how many connections (and TLS handshakes) were opened."""
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def metrics(self) -> Dict[str, Any]:
+        """Returns a JSON-serializable snapshot of the request metrics."""
+        with self._metricsLock:
+            endpoints = {
+                endpoint: metrics.asDict()
+                for endpoint, metrics in sorted(self._metrics.items())
+            }
+        return {
+            'connections_opened': self.connectionsOpened(),
+            'endpoints': endpoints,
+        }
+
+    def logMetrics(self) -> None:
+        """Logs a summary of the request metrics."""
+        with self._metricsLock:
+            if not self._metrics:
+                return
+            logging.info('%-40s %6s %6s %10s %10s %8s %8s %8s', 'Endpoint',
+                         'Calls', 'Errors', 'Sent', 'Received', 'p50',
+                         'p90', 'Max')
+            for endpoint, metrics in sorted(self._metrics.items()):
+                logging.info('%-40s %6d %6d %10d %10d %7.2fs %7.2fs %7.2fs',
+                             endpoint, metrics.requests, metrics.errors,
+                             metrics.bytesSent, metrics.bytesReceived,
+                             metrics.percentile(0.5),
+                             metrics.percentile(0.9), metrics.maxSeconds)
+        logging.info('%d connections opened', self.connectionsOpened())
+
+    def dumpMetricsAtExit(self, path: Optional[str] = None) -> None:
+        """Logs the request metrics on exit, and optionally writes them."""
+        def _dump() -> None:
+            self.logMetrics()
+            if path is None:
+                return
+            with open(path, 'w') as f:
+                json.dump(self.metrics(), f, indent=2)
+
+        atexit.register(_dump)
+
+
+class _Call:
+    """An omegaUp API call that is in progress, and its metrics."""
+    def __init__(
+            self,
+            upload: Optional[Tuple[str, str, Iterable[bytes]]] = None
+    ) -> None:
+        # The (field, filename, chunks) of a file that is streamed.
+        self.upload = upload
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.encodeSeconds = 0.0
+        self.serverSeconds = 0.0
+        self.respondedAt: Optional[float] = None
@@ -0,0 +1,146 @@
+import email.message
+import email.parser
+import email.policy
+import http.server
+import json
+import os
+import threading
+import unittest
+
+from typing import Any, Dict, List, Tuple
+
+import deployclient
+import problempackage
+import testutil
+
+_PROBLEM_CONFIG: Dict[str, Any] = {
+    'title': 'test',
+    'validator': {
+        'name': 'token'
+    },
+}
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Records every request, and replies with the status of the server."""
+    server: '_Server'
+
+    def do_POST(self) -> None:
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks: List[bytes] = []
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+                if size == 0:
+                    break
+            body = b''.join(chunks)
+        else:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.requests.append((self.path, self.headers, body))
+        response = json.dumps({'status': 'ok'}).encode('utf-8')
+        self.send_response(self.server.statusCode)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class _Server(http.server.ThreadingHTTPServer):
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.statusCode = 200
+        self.requests: List[Tuple[str, email.message.Message, bytes]] = []
+
+
+def _parseMultipart(contentType: str,
+                    body: bytes) -> email.message.EmailMessage:
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f'Content-Type: {contentType}\r\n\r\n'.encode('utf-8') + body)
+    assert isinstance(message, email.message.EmailMessage)
+    return message
+
+
+class ClientTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.server = _Server()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client = deployclient.Client(
+            username='user',
+            api_token='secret',
+            url=f'http://127.0.0.1:{self.server.server_port}')
+
+    def test_query(self) -> None:
+        self.assertEqual(
+            self.client.query('/api/problem/details/',
+                              {'problem_alias': 'sumas'}), {'status': 'ok'})
+        (path, headers, body), = self.server.requests
+        self.assertEqual(path, '/api/problem/details/')
+        self.assertEqual(headers['Authorization'],
+                         'token Credential=secret,Username=user')
+        self.assertEqual(body, b'problem_alias=sumas')
+
+        self.server.statusCode = 400
+        with self.assertRaises(Exception):
+            self.client.query('/api/problem/details/')
+        self.assertEqual(
+            self.client.query('/api/problem/details/', check_=False),
+            {'status': 'ok'})
+        metrics = self.client._metrics['/api/problem/details/']
+        self.assertEqual((metrics.requests, metrics.errors), (3, 1))
+
+    def test_queryStreaming(self) -> None:
+        self.writeFile('cases/1.in', os.urandom(3 << 20))
+        self.writeFile('cases/1.out', b'1\n')
+        zipPath = os.path.join(self.tempDirectory, 'problem.zip')
+        problempackage.createProblemZip(_PROBLEM_CONFIG, self.tempDirectory,
+                                        zipPath)
+        with open(zipPath, 'rb') as f:
+            expected = f.read()
+
+        with problempackage.ProblemZipStream(_PROBLEM_CONFIG,
+                                             self.tempDirectory) as stream:
+            self.assertEqual(
+                self.client.queryStreaming('/api/problem/create/', {
+                    'problem_alias': 'sumas',
+                    'languages': ['c11-gcc', 'py3'],
+                    'lang': None,
+                }, 'problem_contents', 'problem.zip', stream),
+                {'status': 'ok'})
+
+        (path, headers, body), = self.server.requests
+        self.assertEqual(path, '/api/problem/create/')
+        self.assertEqual(headers['Transfer-Encoding'], 'chunked')
+        self.assertEqual(headers['Authorization'],
+                         'token Credential=secret,Username=user')
+        contentType = headers['Content-Type']
+        self.assertRegex(contentType,
+                         r'^multipart/form-data; boundary=[0-9a-f]{32}$')
+        boundary = contentType.split('boundary=')[1]
+        self.assertTrue(body.startswith(f'--{boundary}\r\n'.encode()))
+        self.assertTrue(body.endswith(f'\r\n--{boundary}--\r\n'.encode()))
+
+        message = _parseMultipart(contentType, body)
+        parts = [(part.get_param('name', header='Content-Disposition'),
+                  part.get_filename(), part.get_payload(decode=True))
+                 for part in message.iter_parts()]
+        self.assertEqual(parts, [
+            ('problem_alias', None, b'sumas'),
+            ('languages', None, b'c11-gcc'),
+            ('languages', None, b'py3'),
+            ('problem_contents', 'problem.zip', expected),
+        ])
+        metrics = self.client._metrics['/api/problem/create/']
+        self.assertEqual(metrics.bytesSent, len(body))
+
+
+if __name__ == '__main__':
+    unittest.main()
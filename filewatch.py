@@ -0,0 +1,218 @@
+import abc
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import time
+
+from types import TracebackType
+from typing import Dict, Optional, Sequence, Set, Tuple, Type
+
+# From <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM
+               | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE)
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT_HEADER = struct.Struct('iIII')
+
+# Changes are reported once nothing else has changed for this long, so that
+# an editor saving several files (or a file in several steps) triggers a
+# single run.
+_DEBOUNCE_SECONDS = 0.1
+
+
+class Watcher(abc.ABC):
+    """Reports the files that change under a set of directories.
+
+    This is intended to be used as a context manager:
+
+    with filewatch.watcher(['problems/sumas']) as w:
+      while True:
+        changedPaths = w.wait()
+    """
+    def __enter__(self) -> 'Watcher':
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self.close()
+
+    @abc.abstractmethod
+    def wait(self) -> Set[str]:
+        """Blocks until at least one file changes, and returns the paths."""
+
+    def close(self) -> None:
+        """Releases the resources of the watcher."""
+
+
+class _InotifyWatcher(Watcher):
+    """A Watcher that uses Linux's inotify(7)."""
+    def __init__(self, directories: Sequence[str]) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                                 use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._directories: Dict[int, str] = {}
+        try:
+            for directory in directories:
+                self._addTree(directory)
+        except OSError:
+            self.close()
+            raise
+
+    def _addWatch(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory),
+                                          _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), directory)
+        self._directories[wd] = directory
+
+    def _addTree(self, directory: str) -> Set[str]:
+        """Watches a directory and its subdirectories.
+
+        Returns the files that are already there, since they could have been
+        created before the watch was added.
+        """
+        paths: Set[str] = set()
+        for root, _, filenames in os.walk(directory, followlinks=True):
+            self._addWatch(root)
+            paths.update(os.path.join(root, f) for f in filenames)
+        return paths
+
+    def _readEvents(self) -> Set[str]:
+        paths: Set[str] = set()
+        while True:
+            try:
+                buffer = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return paths
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(
+                    buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(
+                    b'\0'))
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    logging.warning('Too many changes, some were missed.')
+                    continue
+                if mask & _IN_IGNORED:
+                    self._directories.pop(wd, None)
+                    continue
+                directory = self._directories.get(wd)
+                if directory is None or not name:
+                    continue
+                path = os.path.join(directory, name)
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        try:
+                            paths.update(self._addTree(path))
+                        except OSError:
+                            # The directory was removed right away.
+                            pass
+                    continue
+                paths.add(path)
+
+    def wait(self) -> Set[str]:
+        paths: Set[str] = set()
+        timeout: Optional[float] = None
+        while True:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+            if not readable:
+                return paths
+            paths.update(self._readEvents())
+            if paths:
+                timeout = _DEBOUNCE_SECONDS
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+_Stat = Tuple[int, int]
+
+
+class _PollingWatcher(Watcher):
+    """A Watcher that periodically scans the directories."""
+    def __init__(self, directories: Sequence[str],
+                 pollInterval: float) -> None:
+        self._directories = list(directories)
+        self._pollInterval = pollInterval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, _Stat]:
+        snapshot: Dict[str, _Stat] = {}
+        for directory in self._directories:
+            for root, _, filenames in os.walk(directory, followlinks=True):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def _changes(self) -> Set[str]:
+        snapshot = self._scan()
+        paths = {
+            path
+            for path in snapshot.keys() | self._snapshot.keys()
+            if snapshot.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = snapshot
+        return paths
+
+    def wait(self) -> Set[str]:
+        while True:
+            time.sleep(self._pollInterval)
+            paths = self._changes()
+            if paths:
+                break
+        while True:
+            time.sleep(_DEBOUNCE_SECONDS)
+            morePaths = self._changes()
+            if not morePaths:
+                return paths
+            paths.update(morePaths)
+
+
+def watcher(directories: Sequence[str],
+            *,
+            pollInterval: float = 0.5) -> Watcher:
+    """Returns a Watcher for the directories.
+
+    inotify is used where it is available. Otherwise, or if the system has
+    run out of inotify watches, the directories are polled.
+    """
+    try:
+        return _InotifyWatcher(directories)
+    except (AttributeError, OSError) as e:
+        if isinstance(e, OSError) and e.errno not in (errno.ENOSPC,
+                                                      errno.EMFILE,
+                                                      errno.ENOSYS):
+            raise
+        logging.warning('inotify is not available (%s), polling instead.', e)
+        return _PollingWatcher(directories, pollInterval)
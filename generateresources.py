@@ -8,13 +8,14 @@ import re
 import subprocess
 import sys
 
-from typing import List, Optional
+from typing import AbstractSet, List, Optional
 
 import container
 import problems
 import repository
+import schemas
 
-_SUPPORTED_GENERATORS = frozenset(('png', 'testplan'))
+SUPPORTED_GENERATORS = frozenset(('png', 'testplan'))
 
 
 def _getSolution(p: problems.Problem, *, rootDirectory: str,
@@ -51,8 +52,8 @@ def _getInputs(p: problems.Problem, *, rootDirectory: str,
     return inFilenames
 
 
-def _generateTestplan(p: problems.Problem, *, rootDirectory: str, force: bool,
-                      ci: bool) -> bool:
+def generateTestplan(p: problems.Problem, *, rootDirectory: str, force: bool,
+                     ci: bool) -> bool:
     """Generate testplan files for the provided problem."""
     logging.info('%-30s: Generating testplan for problem', p.title)
 
@@ -76,8 +77,8 @@ def _generateTestplan(p: problems.Problem, *, rootDirectory: str, force: bool,
     return True
 
 
-def _generateImages(p: problems.Problem, *, rootDirectory: str, force: bool,
-                    ci: bool) -> bool:
+def generateImages(p: problems.Problem, *, rootDirectory: str, force: bool,
+                   ci: bool) -> bool:
     """Generate .png files for the provided problem."""
     logging.info('%-30s: Generating images for problem', p.title)
 
@@ -160,6 +161,27 @@ def _generateImages(p: problems.Problem, *, rootDirectory: str, force: bool,
     return True
 
 
+def generateResources(p: problems.Problem, *, rootDirectory: str,
+                      generate: AbstractSet[str], force: bool,
+                      ci: bool) -> bool:
+    """Generate the requested resources for the provided problem, in order.
+
+    Returns whether all of them were generated successfully.
+    """
+    success = True
+    if 'testplan' in generate:
+        success &= generateTestplan(p,
+                                    rootDirectory=rootDirectory,
+                                    force=force,
+                                    ci=ci)
+    if 'png' in generate:
+        success &= generateImages(p,
+                                  rootDirectory=rootDirectory,
+                                  force=force,
+                                  ci=ci)
+    return success
+
+
 def _main() -> None:
     parser = argparse.ArgumentParser('Generate resources')
     parser.add_argument(
@@ -177,7 +199,7 @@ def _main() -> None:
                         default=min(32, (os.cpu_count() or 2) + 4),
                         help='Number of threads to run concurrently')
     parser.add_argument('--generate',
-                        default=_SUPPORTED_GENERATORS,
+                        default=SUPPORTED_GENERATORS,
                         type=lambda x: set(x.split(',')),
                         help=('Comma-separated list of artifacts to generate. '
                               'Should be a subset of {png,testplan}. '
@@ -189,11 +211,14 @@ def _main() -> None:
                         metavar='PROBLEM',
                         type=str,
                         nargs='*')
+    problems.addAnnotationArguments(parser)
+
     args = parser.parse_args()
+    problems.configureAnnotations(args)
 
-    if args.generate - _SUPPORTED_GENERATORS:
+    if args.generate - SUPPORTED_GENERATORS:
         logging.error('Provided generators not supported: %r',
-                      args.generate - _SUPPORTED_GENERATORS)
+                      args.generate - SUPPORTED_GENERATORS)
         sys.exit(1)
 
     logging.basicConfig(format='%(asctime)s: %(message)s',
@@ -202,23 +227,29 @@ def _main() -> None:
 
     rootDirectory = repository.repositoryRoot()
 
+    problemList = problems.problems(allProblems=args.all,
+                                    rootDirectory=rootDirectory,
+                                    problemPaths=args.problem_paths)
+    if not schemas.validate(problemList=problemList,
+                            rootDirectory=rootDirectory,
+                            ci=args.ci):
+        sys.exit(1)
+
     with concurrent.futures.ThreadPoolExecutor(
             max_workers=args.jobs) as executor:
         futures: List[concurrent.futures.Future[bool]] = []
 
-        for p in problems.problems(allProblems=args.all,
-                                   rootDirectory=rootDirectory,
-                                   problemPaths=args.problem_paths):
+        for p in problemList:
             if 'testplan' in args.generate:
                 futures.append(
-                    executor.submit(_generateTestplan,
+                    executor.submit(generateTestplan,
                                     p,
                                     rootDirectory=rootDirectory,
                                     force=args.force,
                                     ci=args.ci))
             if 'png' in args.generate:
                 futures.append(
-                    executor.submit(_generateImages,
+                    executor.submit(generateImages,
                                     p,
                                     rootDirectory=rootDirectory,
                                     force=args.force,
@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+import os
+import re
+
+from typing import Any, Dict, List, Mapping, NamedTuple, Sequence
+
+import problems
+
+_DURATION_UNITS = {
+    'ns': 1e-9,
+    'us': 1e-6,
+    'µs': 1e-6,
+    'ms': 1e-3,
+    's': 1.0,
+    'm': 60.0,
+    'h': 3600.0,
+}
+_DURATION_PART = re.compile(r'(\d+(?:\.\d*)?|\.\d+)(ns|us|µs|ms|s|m|h)')
+
+HEADROOM_FILENAME = 'headroom.json'
+
+
+def addHeadroomArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control the resource headroom checks."""
+    parser.add_argument('--headroom-warning-margin',
+                        type=float,
+                        default=0.2,
+                        help=('Warn when a solution that is expected to be '
+                              'accepted leaves less than this fraction of a '
+                              'limit unused'))
+    parser.add_argument('--headroom-failure-margin',
+                        type=float,
+                        default=0.0,
+                        help=('Fail when a solution that is expected to be '
+                              'accepted leaves less than this fraction of a '
+                              'limit unused. Disabled by default'))
+
+
+def parseDuration(value: Any) -> float:
+    """Returns a duration from settings.json, in seconds.
+
+    Numbers are milliseconds, and strings use Go's duration format (`1s`,
+    `1.5s`, `500ms`).
+    """
+    if isinstance(value, (int, float)):
+        return float(value) / 1000
+    text = str(value).strip()
+    seconds = 0.0
+    position = 0
+    for match in _DURATION_PART.finditer(text):
+        if match.start() != position:
+            break
+        seconds += float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+        position = match.end()
+    if position != len(text) or not text:
+        raise ValueError(f'Invalid duration: {value!r}')
+    return seconds
+
+
+class CaseUsage(NamedTuple):
+    """The resources used by a solution in a single case."""
+    name: str
+    time: float
+    wallTime: float
+    memory: int
+
+
+class Headroom(NamedTuple):
+    """How close a solution gets to the limits of a problem.
+
+    Each usage is a fraction of the corresponding limit.
+    """
+    solution: str
+    time: float
+    memory: float
+    overallWallTime: float
+
+    def minimum(self) -> float:
+        """Returns the unused fraction of the tightest limit."""
+        return 1 - max(self.time, self.memory, self.overallWallTime)
+
+
+def caseUsages(testResult: Mapping[str, Any]) -> List[CaseUsage]:
+    """Returns the resources used in each case of a test result."""
+    usages: List[CaseUsage] = []
+    for group in (testResult.get('result') or {}).get('groups') or []:
+        for case in group.get('cases') or []:
+            meta = case.get('meta') or case
+            usages.append(
+                CaseUsage(name=case['name'],
+                          time=float(meta.get('time', 0)),
+                          wallTime=float(meta.get('wall_time', 0)),
+                          memory=int(meta.get('memory', 0))))
+    return usages
+
+
+def _expectsAccepted(testResult: Mapping[str, Any]) -> bool:
+    expected = {
+        k: v
+        for k, v in testResult.get('solution', {}).items() if k != 'filename'
+    }
+    verdict: str = expected.get('verdict', 'AC')
+    return verdict == 'AC'
+
+
+def _fraction(usage: float, limit: float) -> float:
+    """Returns the fraction of a limit that is used.
+
+    The schema allows limits of zero, which cannot be compared against, so
+    they are not checked.
+    """
+    if limit <= 0:
+        return 0.0
+    return usage / limit
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _summary(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        'p50': _percentile(values, 0.5),
+        'p90': _percentile(values, 0.9),
+        'max': max(values, default=0.0),
+    }
+
+
+def reportHeadroom(p: problems.Problem, report: Mapping[str, Any], *,
+                   resultsDirectory: str, warningMargin: float,
+                   failureMargin: float, ci: bool) -> bool:
+    """Reports how close the solutions get to the limits of a problem.
+
+    Only the solutions that are expected to be accepted are considered. The
+    per-case figures are written to the results directory. Returns whether
+    all of them leave at least `failureMargin` of every limit unused.
+    """
+    limits = p.config['limits']
+    timeLimit = parseDuration(limits['TimeLimit'])
+    memoryLimit = int(limits['MemoryLimit'])
+    overallWallTimeLimit = parseDuration(limits['OverallWallTimeLimit'])
+
+    passed = True
+    results: Dict[str, Any] = {
+        'limits': {
+            'time': timeLimit,
+            'memory': memoryLimit,
+            'overall_wall_time': overallWallTimeLimit,
+        },
+        'solutions': {},
+    }
+    for testResult in report.get('tests', []):
+        if testResult['type'] != 'solutions' or not _expectsAccepted(
+                testResult):
+            continue
+        usages = caseUsages(testResult)
+        if not usages:
+            continue
+        headroom = Headroom(
+            solution=testResult['filename'],
+            time=_fraction(max(u.time for u in usages), timeLimit),
+            memory=_fraction(max(u.memory for u in usages), memoryLimit),
+            overallWallTime=_fraction(sum(u.wallTime for u in usages),
+                                      overallWallTimeLimit))
+        results['solutions'][headroom.solution] = {
+            'time': _summary([u.time for u in usages]),
+            'wall_time': _summary([u.wallTime for u in usages]),
+            'memory': _summary([float(u.memory) for u in usages]),
+            'usage': {
+                'time': headroom.time,
+                'memory': headroom.memory,
+                'overall_wall_time': headroom.overallWallTime,
+            },
+            'cases': [u._asdict() for u in usages],
+        }
+
+        logging.info(
+            f'    headroom   | {headroom.solution[:40]:40} | '
+            f'time {headroom.time:6.1%} | memory {headroom.memory:6.1%} | '
+            f'wall {headroom.overallWallTime:6.1%}')
+        unused = headroom.minimum()
+        if unused >= warningMargin and unused >= failureMargin:
+            continue
+        message = (f'{headroom.solution} in {p.title} uses '
+                   f'{headroom.time:.0%} of TimeLimit, '
+                   f'{headroom.memory:.0%} of MemoryLimit and '
+                   f'{headroom.overallWallTime:.0%} of OverallWallTimeLimit')
+        filename = os.path.join(p.path, 'tests', headroom.solution)
+        if unused < failureMargin:
+            passed = False
+            problems.error(message, filename=filename, ci=ci)
+        else:
+            problems.warning(message, filename=filename, ci=ci)
+
+    problemResultsDirectory = os.path.join(resultsDirectory, p.path)
+    if os.path.isdir(problemResultsDirectory):
+        with open(os.path.join(problemResultsDirectory, HEADROOM_FILENAME),
+                  'w') as f:
+            json.dump(results, f, indent=2)
+    return passed
@@ -0,0 +1,190 @@
+import json
+import os
+import unittest
+import unittest.mock
+
+from typing import Any, Dict, Mapping, Optional
+
+import headroom
+import problems
+import testutil
+
+
+def _solutionResult(filename: str,
+                    cases: Mapping[str, Mapping[str, Any]],
+                    verdict: Optional[str] = None) -> Dict[str, Any]:
+    solution = {'filename': filename}
+    if verdict is not None:
+        solution['verdict'] = verdict
+    return {
+        'type': 'solutions',
+        'filename': filename,
+        'solution': solution,
+        'result': {
+            'groups': [{
+                'group': 'sample',
+                'cases': [{
+                    'name': name,
+                    'meta': meta
+                } for name, meta in cases.items()],
+            }],
+        },
+    }
+
+
+class ParseDurationTest(unittest.TestCase):
+    def test_parseDuration(self) -> None:
+        self.assertEqual(headroom.parseDuration(1500), 1.5)
+        self.assertEqual(headroom.parseDuration('1s'), 1.0)
+        self.assertEqual(headroom.parseDuration('1.5s'), 1.5)
+        self.assertEqual(headroom.parseDuration('500ms'), 0.5)
+        self.assertEqual(headroom.parseDuration('1m30s'), 90.0)
+        self.assertAlmostEqual(headroom.parseDuration('250us'), 250e-6)
+        self.assertAlmostEqual(headroom.parseDuration('.5h'), 1800.0)
+        for value in ('', '1', '1x', 's', '1s 2s'):
+            with self.assertRaises(ValueError, msg=value):
+                headroom.parseDuration(value)
+
+
+class CaseUsagesTest(unittest.TestCase):
+    def test_caseUsages(self) -> None:
+        self.assertEqual(
+            headroom.caseUsages(
+                _solutionResult(
+                    'solutions/ac.cpp', {
+                        'sample.1': {
+                            'time': 0.25,
+                            'wall_time': 0.5,
+                            'memory': 1024,
+                        },
+                        'sample.2': {},
+                    })), [
+                        headroom.CaseUsage(name='sample.1',
+                                           time=0.25,
+                                           wallTime=0.5,
+                                           memory=1024),
+                        headroom.CaseUsage(name='sample.2',
+                                           time=0.0,
+                                           wallTime=0.0,
+                                           memory=0),
+                    ])
+        self.assertEqual(headroom.caseUsages({'result': None}), [])
+
+
+class ReportHeadroomTest(testutil.TempDirectoryTestCase):
+    def _report(self, limits: Mapping[str, Any],
+                **kwargs: float) -> Dict[str, Any]:
+        """Reports the headroom, and returns the error and warning calls."""
+        p = problems.Problem(path='p', title='p', config={'limits': limits})
+        os.makedirs(os.path.join(self.tempDirectory, 'p'))
+        report = {
+            'tests': [
+                _solutionResult('solutions/ac.cpp', {
+                    'sample.1': {
+                        'time': 0.5,
+                        'wall_time': 0.75,
+                        'memory': 64 << 20,
+                    },
+                    'sample.2': {
+                        'time': 0.85,
+                        'wall_time': 1.0,
+                        'memory': 32 << 20,
+                    },
+                }),
+                # Only the solutions that are expected to be accepted are
+                # considered.
+                _solutionResult('solutions/tle.cpp', {
+                    'sample.1': {
+                        'time': 1.0,
+                        'wall_time': 1.0,
+                        'memory': 0,
+                    },
+                },
+                                verdict='TLE'),
+            ],
+        }
+        with unittest.mock.patch.object(
+                problems, 'error') as error, unittest.mock.patch.object(
+                    problems, 'warning') as warning:
+            passed = headroom.reportHeadroom(
+                p,
+                report,
+                resultsDirectory=self.tempDirectory,
+                ci=False,
+                **kwargs)
+        with open(
+                os.path.join(self.tempDirectory, 'p',
+                             headroom.HEADROOM_FILENAME)) as f:
+            results = json.load(f)
+        return {
+            'passed': passed,
+            'errors': len(error.call_args_list),
+            'warnings': len(warning.call_args_list),
+            'solutions': sorted(results['solutions']),
+            'usage': results['solutions']['solutions/ac.cpp']['usage'],
+        }
+
+    def test_margins(self) -> None:
+        limits = {
+            'TimeLimit': '1s',
+            'MemoryLimit': 128 << 20,
+            'OverallWallTimeLimit': '10s',
+        }
+        result = self._report(limits,
+                              warningMargin=0.2,
+                              failureMargin=0.0)
+        self.assertEqual(result['solutions'], ['solutions/ac.cpp'])
+        self.assertEqual(result['usage'], {
+            'time': 0.85,
+            'memory': 0.5,
+            'overall_wall_time': 0.175,
+        })
+        self.assertEqual(
+            (result['passed'], result['errors'], result['warnings']),
+            (True, 0, 1))
+
+    def test_failureMargin(self) -> None:
+        limits = {
+            'TimeLimit': '1s',
+            'MemoryLimit': 128 << 20,
+            'OverallWallTimeLimit': '10s',
+        }
+        result = self._report(limits,
+                              warningMargin=0.2,
+                              failureMargin=0.2)
+        self.assertEqual(
+            (result['passed'], result['errors'], result['warnings']),
+            (False, 1, 0))
+
+    def test_noMargin(self) -> None:
+        limits = {
+            'TimeLimit': '2s',
+            'MemoryLimit': 128 << 20,
+            'OverallWallTimeLimit': '10s',
+        }
+        result = self._report(limits,
+                              warningMargin=0.2,
+                              failureMargin=0.0)
+        self.assertEqual(
+            (result['passed'], result['errors'], result['warnings']),
+            (True, 0, 0))
+
+    def test_zeroLimits(self) -> None:
+        limits = {
+            'TimeLimit': 0,
+            'MemoryLimit': 0,
+            'OverallWallTimeLimit': '0s',
+        }
+        result = self._report(limits,
+                              warningMargin=0.2,
+                              failureMargin=0.2)
+        self.assertEqual(result['usage'], {
+            'time': 0.0,
+            'memory': 0.0,
+            'overall_wall_time': 0.0,
+        })
+        self.assertTrue(result['passed'])
+
+
+if __name__ == '__main__':
+    unittest.main()
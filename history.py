@@ -0,0 +1,479 @@
+#!/usr/bin/python3
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from typing import (AbstractSet, Any, Dict, Iterator, List, Mapping,
+                    NamedTuple, Optional, Sequence, Tuple)
+
+import problems
+import repository
+
+HISTORY_FILENAME = 'history.sqlite3'
+
+_SCHEMA_VERSION = 1
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    git_commit TEXT NOT NULL,
+    image TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_git_commit ON runs (git_commit);
+CREATE TABLE IF NOT EXISTS problem_results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    problem TEXT NOT NULL,
+    state TEXT NOT NULL,
+    duration REAL,
+    placement TEXT,
+    partial INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (run_id, problem)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS test_results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    problem TEXT NOT NULL,
+    type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    verdict TEXT,
+    score REAL
+);
+CREATE INDEX IF NOT EXISTS test_results_run ON test_results (run_id, problem);
+CREATE TABLE IF NOT EXISTS case_results (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    problem TEXT NOT NULL,
+    type TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    name TEXT NOT NULL,
+    verdict TEXT,
+    score REAL,
+    time REAL,
+    wall_time REAL,
+    memory INTEGER
+);
+CREATE INDEX IF NOT EXISTS case_results_run ON case_results (run_id, problem);
+'''
+
+# Time spent by the solutions of each problem in a run, added over all cases.
+_PROBLEM_TIMES = '''
+SELECT problem_results.problem,
+       problem_results.state,
+       problem_results.duration,
+       (SELECT SUM(case_results.time)
+        FROM case_results
+        WHERE case_results.run_id = problem_results.run_id
+          AND case_results.problem = problem_results.problem
+          AND case_results.type = 'solutions') AS time
+FROM problem_results
+WHERE problem_results.run_id = ?
+'''
+
+
+def addHistoryArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control where the results history is kept."""
+    parser.add_argument('--history-file',
+                        default=None,
+                        help=('SQLite database where the results of every run '
+                              'are kept. Defaults to one in the state '
+                              'directory'))
+    parser.add_argument('--no-history',
+                        action='store_true',
+                        help='Do not record the results of this run')
+
+
+def historyPath(args: argparse.Namespace, rootDirectory: str) -> str:
+    """Returns the path of the history database from the parsed arguments."""
+    if args.history_file is not None:
+        path: str = args.history_file
+        return path
+    return os.path.join(repository.stateDirectory(rootDirectory),
+                        HISTORY_FILENAME)
+
+
+@contextlib.contextmanager
+def _connect(path: str) -> Iterator[sqlite3.Connection]:
+    connection = sqlite3.connect(path)
+    try:
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, _SCHEMA_VERSION):
+            raise sqlite3.DatabaseError(
+                f'{path} has an unsupported schema version {version}')
+        with connection:
+            connection.executescript(_SCHEMA)
+            connection.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+        yield connection
+    finally:
+        connection.close()
+
+
+def _floatOrNone(value: Any) -> Optional[float]:
+    return None if value is None else float(value)
+
+
+def recordRun(path: str, results: Sequence[Tuple[problems.Problem,
+                                                 Mapping[str, Any]]], *,
+              commit: str, image: str,
+              partialProblems: AbstractSet[str] = frozenset()) -> int:
+    """Appends the results of a run to the history.
+
+    Every problem, test and case of the run is stored in a single
+    transaction, keyed by the commit and the container image that produced
+    it, along with the CPU each problem ran on. The problems in
+    `partialProblems` only tested some of their cases or solutions, so their
+    state does not apply to the whole problem. Returns the id of the run.
+    """
+    problemRows: List[Tuple[Any, ...]] = []
+    testRows: List[Tuple[Any, ...]] = []
+    caseRows: List[Tuple[Any, ...]] = []
+    for p, report in results:
+        placement = report.get('placement')
+        problemRows.append(
+            (p.path, report['state'], _floatOrNone(report.get('duration')),
+             None if placement is None else json.dumps(placement),
+             p.path in partialProblems))
+        for testResult in report.get('tests', []):
+            result = testResult.get('result') or {}
+            testRows.append((p.path, testResult['type'],
+                             testResult['filename'], result.get('verdict'),
+                             _floatOrNone(result.get('score'))))
+            for group in result.get('groups') or []:
+                for case in group.get('cases') or []:
+                    meta = case.get('meta') or case
+                    caseRows.append(
+                        (p.path, testResult['type'], testResult['filename'],
+                         case['name'], case.get('verdict'),
+                         _floatOrNone(case.get('score')),
+                         _floatOrNone(meta.get('time')),
+                         _floatOrNone(meta.get('wall_time')),
+                         meta.get('memory')))
+
+    with _connect(path) as connection, connection:
+        runId = connection.execute(
+            'INSERT INTO runs (timestamp, git_commit, image) '
+            'VALUES (?, ?, ?)', (time.time(), commit, image)).lastrowid
+        assert runId is not None
+        connection.executemany(
+            'INSERT INTO problem_results VALUES (?, ?, ?, ?, ?, ?)',
+            [(runId, ) + row for row in problemRows])
+        connection.executemany(
+            'INSERT INTO test_results VALUES (?, ?, ?, ?, ?, ?)',
+            [(runId, ) + row for row in testRows])
+        connection.executemany(
+            'INSERT INTO case_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(runId, ) + row for row in caseRows])
+    logging.info('Recorded %d problems and %d cases in %s', len(problemRows),
+                 len(caseRows), path)
+    return runId
+
+
+# The verdict and score of solutions, keyed by their filename and the case.
+CaseResults = Dict[Tuple[str, str], Tuple[Optional[str], Optional[float]]]
+
+
+class RecordedRun(NamedTuple):
+    """A recorded run of a problem."""
+    id: int
+    commit: str
+    state: str
+
+
+def lastFullRuns(path: str, *, image: str) -> Dict[str, RecordedRun]:
+    """Returns the latest recorded run of every problem that tested all of it.
+
+    Only the runs that used `image` are considered.
+    """
+    if not os.path.isfile(path):
+        return {}
+    with _connect(path) as connection:
+        # SQLite takes the bare columns from the row with the maximum.
+        return {
+            problem: RecordedRun(id=runId, commit=commit, state=state)
+            for problem, runId, commit, state, _ in connection.execute(
+                'SELECT problem_results.problem, runs.id, runs.git_commit, '
+                'problem_results.state, MAX(runs.timestamp) '
+                'FROM problem_results '
+                'JOIN runs ON runs.id = problem_results.run_id '
+                'WHERE runs.image = ? AND NOT problem_results.partial '
+                'GROUP BY problem_results.problem', (image, ))
+        }
+
+
+def caseResults(path: str, runId: int, problem: str) -> CaseResults:
+    """Returns the verdict and score of every solution in every case of a run.
+
+    The results are keyed by the solution's filename and the case's name.
+    """
+    with _connect(path) as connection:
+        return {(filename, name): (verdict, score)
+                for filename, name, verdict, score in connection.execute(
+                    'SELECT filename, name, verdict, score FROM case_results '
+                    'WHERE run_id = ? AND problem = ? AND type = ?',
+                    (runId, problem, 'solutions'))}
+
+
+def _resolveCommit(connection: sqlite3.Connection, ref: str) -> str:
+    """Returns the recorded commit that `ref` names.
+
+    `ref` can be anything that git understands, or a prefix of a recorded
+    commit that is no longer in the repository.
+    """
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--verify', '--quiet', f'{ref}^{{commit}}'],
+            universal_newlines=True,
+            stderr=subprocess.DEVNULL).strip()
+    except subprocess.CalledProcessError:
+        commit = ref
+    rows = connection.execute(
+        'SELECT DISTINCT git_commit FROM runs WHERE git_commit LIKE ?',
+        (f'{commit}%', )).fetchall()
+    if len(rows) != 1:
+        raise ValueError(f'{ref!r} matches {len(rows)} recorded commits')
+    recordedCommit: str = rows[0][0]
+    return recordedCommit
+
+
+def _latestRun(connection: sqlite3.Connection,
+               commit: Optional[str] = None) -> Optional[Tuple[int, str, str]]:
+    """Returns the id, commit and image of the latest run of a commit."""
+    if commit is None:
+        row = connection.execute(
+            'SELECT id, git_commit, image FROM runs '
+            'ORDER BY timestamp DESC LIMIT 1').fetchone()
+    else:
+        row = connection.execute(
+            'SELECT id, git_commit, image FROM runs WHERE git_commit = ? '
+            'ORDER BY timestamp DESC LIMIT 1', (commit, )).fetchone()
+    if row is None:
+        return None
+    return int(row[0]), str(row[1]), str(row[2])
+
+
+def _seconds(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value:.3f}s'
+
+
+def _placement(value: Optional[str]) -> str:
+    if value is None:
+        return '-'
+    placement = json.loads(value)
+    return (f'cpu {placement["cpu"]} (core {placement["core"]}, '
+            f'node {placement["node"]})')
+
+
+def _ratio(base: Optional[float], head: Optional[float]) -> Optional[float]:
+    if base is None or head is None or base <= 0:
+        return None
+    return head / base
+
+
+def _trend(connection: sqlite3.Connection, args: argparse.Namespace) -> None:
+    """Shows the duration and runtime of problems over the last runs."""
+    query = '''
+        SELECT runs.timestamp, runs.git_commit, runs.image,
+               problem_results.problem, problem_results.state,
+               problem_results.duration, problem_results.placement,
+               (SELECT SUM(case_results.time)
+                FROM case_results
+                WHERE case_results.run_id = runs.id
+                  AND case_results.problem = problem_results.problem
+                  AND case_results.type = 'solutions')
+        FROM runs
+        JOIN problem_results ON problem_results.run_id = runs.id
+        WHERE runs.id IN (SELECT id FROM runs
+                          ORDER BY timestamp DESC LIMIT ?)
+    '''
+    parameters: List[Any] = [args.runs]
+    if args.problem_paths:
+        query += (' AND problem_results.problem IN (' +
+                  ', '.join('?' for _ in args.problem_paths) + ')')
+        parameters.extend(
+            os.path.normpath(path) for path in args.problem_paths)
+    query += ' ORDER BY problem_results.problem, runs.timestamp'
+
+    print(f'{"problem":30} | {"date":16} | {"commit":10} | {"image":10} | '
+          f'{"state":8} | {"duration":>9} | {"time":>9} | placement')
+    for (timestamp, commit, image, problem, state, duration, placement,
+         solutionTime) in connection.execute(query, parameters):
+        print(f'{problem[:30]:30} | '
+              f'{time.strftime("%Y-%m-%d %H:%M", time.localtime(timestamp))} '
+              f'| {commit[:10]:10} | {image.rsplit(":", 1)[-1][:10]:10} | '
+              f'{state[:8]:8} | {_seconds(duration):>9} | '
+              f'{_seconds(solutionTime):>9} | {_placement(placement)}')
+
+
+def _compare(connection: sqlite3.Connection, args: argparse.Namespace) -> None:
+    """Shows the problems and solutions that got slower between two commits.
+
+    The latest run of each commit is used.
+    """
+    runs = []
+    for ref in (args.base, args.head):
+        run = _latestRun(connection, _resolveCommit(connection, ref))
+        assert run is not None
+        runs.append(run)
+    (baseRun, baseCommit, baseImage), (headRun, headCommit, headImage) = runs
+    print(f'base: {baseCommit[:10]} ({baseImage})')
+    print(f'head: {headCommit[:10]} ({headImage})')
+    if baseImage != headImage:
+        print('warning: the runs used different images')
+
+    base = {
+        row[0]: row[1:]
+        for row in connection.execute(_PROBLEM_TIMES, (baseRun, ))
+    }
+    rows = []
+    for problem, state, duration, solutionTime in connection.execute(
+            _PROBLEM_TIMES, (headRun, )):
+        if problem not in base:
+            continue
+        _, baseDuration, baseSolutionTime = base[problem]
+        rows.append((problem, state, baseDuration, duration,
+                     _ratio(baseDuration, duration), baseSolutionTime,
+                     solutionTime, _ratio(baseSolutionTime, solutionTime)))
+    rows.sort(key=lambda row: max(row[4] or 0, row[7] or 0), reverse=True)
+
+    print()
+    print(f'{"problem":30} | {"duration":>9} | {"":>9} | {"ratio":>6} | '
+          f'{"time":>9} | {"":>9} | {"ratio":>6}')
+    for (problem, state, baseDuration, duration, durationRatio,
+         baseSolutionTime, solutionTime, timeRatio) in rows:
+        regression = any(ratio is not None and ratio >= args.threshold
+                         for ratio in (durationRatio, timeRatio))
+        print(f'{problem[:30]:30} | {_seconds(baseDuration):>9} | '
+              f'{_seconds(duration):>9} | '
+              f'{"-" if durationRatio is None else f"{durationRatio:.2f}x":>6}'
+              f' | {_seconds(baseSolutionTime):>9} | '
+              f'{_seconds(solutionTime):>9} | '
+              f'{"-" if timeRatio is None else f"{timeRatio:.2f}x":>6}'
+              f'{"  REGRESSION" if regression else ""}')
+
+    print()
+    print('Slower solutions:')
+    for problem, filename, baseTime, headTime in connection.execute(
+            '''
+            SELECT head.problem, head.filename, base.time, head.time
+            FROM (SELECT problem, filename, SUM(time) AS time
+                  FROM case_results
+                  WHERE run_id = ? AND type = 'solutions'
+                  GROUP BY problem, filename) AS head
+            JOIN (SELECT problem, filename, SUM(time) AS time
+                  FROM case_results
+                  WHERE run_id = ? AND type = 'solutions'
+                  GROUP BY problem, filename) AS base
+            USING (problem, filename)
+            WHERE base.time > 0 AND head.time >= base.time * ?
+            ORDER BY head.time / base.time DESC
+            LIMIT ?
+            ''', (headRun, baseRun, args.threshold, args.limit)):
+        print(f'    {problem[:30]:30} | {filename[:40]:40} | '
+              f'{_seconds(baseTime):>9} | {_seconds(headTime):>9} | '
+              f'{headTime / baseTime:.2f}x')
+
+
+def _slowest(connection: sqlite3.Connection, args: argparse.Namespace) -> None:
+    """Shows the slowest problems and cases of a run."""
+    run = _latestRun(
+        connection, None
+        if args.commit is None else _resolveCommit(connection, args.commit))
+    if run is None:
+        print('No runs recorded')
+        return
+    runId, commit, image = run
+    print(f'{commit[:10]} ({image})')
+    print()
+    print(f'{"problem":30} | {"state":8} | {"duration":>9} | {"time":>9}')
+    for problem, state, duration, solutionTime in connection.execute(
+            _PROBLEM_TIMES +
+            ' ORDER BY problem_results.duration DESC LIMIT ?',
+            (runId, args.limit)):
+        print(f'{problem[:30]:30} | {state[:8]:8} | '
+              f'{_seconds(duration):>9} | {_seconds(solutionTime):>9}')
+    print()
+    print('Slowest cases:')
+    for problem, filename, name, caseTime, memory in connection.execute(
+            'SELECT problem, filename, name, time, memory FROM case_results '
+            'WHERE run_id = ? AND time IS NOT NULL '
+            'ORDER BY time DESC LIMIT ?', (runId, args.limit)):
+        print(f'    {problem[:30]:30} | {filename[:30]:30} | '
+              f'{name[:20]:20} | {_seconds(caseTime):>9} | '
+              f'{memory or 0:>10} bytes')
+
+
+def _main() -> None:
+    rootDirectory = repository.repositoryRoot()
+
+    parser = argparse.ArgumentParser(
+        description='Query the history of the test results')
+    parser.add_argument('--history-file',
+                        default=None,
+                        help=('SQLite database where the results are kept. '
+                              'Defaults to the one in the state directory'))
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help='Verbose logging')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    trendParser = subparsers.add_parser(
+        'trend', help='Show the duration and runtime of problems over time')
+    trendParser.add_argument('--runs',
+                             type=int,
+                             default=20,
+                             help='Number of recent runs to show')
+    trendParser.add_argument('problem_paths',
+                             metavar='PROBLEM',
+                             type=str,
+                             nargs='*')
+    trendParser.set_defaults(func=_trend)
+
+    compareParser = subparsers.add_parser(
+        'compare', help='Show the regressions between two commits')
+    compareParser.add_argument('base', help='Commit to compare against')
+    compareParser.add_argument('head', help='Commit to compare')
+    compareParser.add_argument('--threshold',
+                               type=float,
+                               default=1.2,
+                               help=('Ratio from which a slowdown is '
+                                     'considered a regression'))
+    compareParser.add_argument('--limit',
+                               type=int,
+                               default=20,
+                               help='Number of solutions to show')
+    compareParser.set_defaults(func=_compare)
+
+    slowestParser = subparsers.add_parser(
+        'slowest', help='Show the slowest problems and cases of a run')
+    slowestParser.add_argument('--commit',
+                               default=None,
+                               help=('Show the latest run of this commit, '
+                                     'instead of the latest run'))
+    slowestParser.add_argument('--limit',
+                               type=int,
+                               default=20,
+                               help='Number of problems and cases to show')
+    slowestParser.set_defaults(func=_slowest)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s: %(message)s',
+                        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    path = historyPath(args, rootDirectory)
+    if not os.path.isfile(path):
+        logging.error('No history found in %s', path)
+        sys.exit(1)
+    with _connect(path) as connection:
+        try:
+            args.func(connection, args)
+        except ValueError as e:
+            logging.error('%s', e)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    _main()
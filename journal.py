@@ -0,0 +1,165 @@
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, TypeVar
+
+import requests
+import urllib3.exceptions
+
+import manifest
+
+_T = TypeVar('_T')
+
+# Failures that are likely to go away if the call is retried: the network
+# went away, the server took too long, or a proxy in front of it returned an
+# HTML error page instead of the API's JSON.
+TRANSIENT_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.JSONDecodeError,
+)
+
+
+def isTransient(e: Exception) -> bool:
+    """Returns whether retrying the call that raised `e` might succeed."""
+    return isinstance(e, TRANSIENT_ERRORS)
+
+
+def isUnsent(e: Exception) -> bool:
+    """Returns whether `e` was raised before the request reached the server.
+
+    Only these failures can be retried for calls that are not idempotent:
+    after a timeout or a dropped connection, the server might have already
+    made the change.
+    """
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(e, requests.exceptions.ConnectionError) or not e.args:
+        return False
+    reason = e.args[0]
+    if isinstance(reason, urllib3.exceptions.MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, urllib3.exceptions.NewConnectionError)
+
+
+def retrying(fn: Callable[[], _T],
+             *,
+             description: str,
+             retries: int = 4,
+             retryable: Callable[[Exception], bool] = isTransient,
+             initialDelay: float = 1.0,
+             maxDelay: float = 60.0) -> _T:
+    """Calls `fn`, retrying the failures that are `retryable` with backoff.
+
+    The delay between attempts is chosen uniformly at random between zero and
+    an exponentially increasing cap ("full jitter"), so that concurrent
+    retries do not hit the server at the same time.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not retryable(e):
+                raise
+            delay = random.uniform(0, min(maxDelay,
+                                          initialDelay * 2**attempt))
+            attempt += 1
+            logging.warning('%s failed (%s). Retrying in %.1fs (%d/%d)...',
+                            description, e, delay, attempt, retries)
+            time.sleep(delay)
+
+
+def addJournalArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control retries and the deploy journal."""
+    parser.add_argument('--resume',
+                        action='store_true',
+                        help=('Skip the steps that were completed by a '
+                              'previous deploy of the same commit.'))
+    parser.add_argument('--retries',
+                        type=int,
+                        default=4,
+                        help=('Number of times a step is retried on '
+                              'transient network failures'))
+
+
+class DeployJournal:
+    """Records the deploy steps that completed successfully.
+
+    The journal is keyed by commit: steps that were completed while deploying
+    a different commit are not considered complete. When `resume` is false,
+    any previous journal is discarded.
+    """
+    def __init__(self, path: str, *, commit: str, url: str,
+                 resume: bool) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._contents: Dict[str, Any] = {
+            'commit': commit,
+            'url': url,
+            'completed': {},
+        }
+        if resume and os.path.isfile(path):
+            try:
+                with open(path, 'r') as f:
+                    contents = json.load(f)
+            except (OSError, ValueError):
+                logging.exception('Failed to load deploy journal %s', path)
+            else:
+                if (contents.get('commit') == commit
+                        and contents.get('url') == url):
+                    self._contents = contents
+                    logging.info('Resuming deploy of %s', commit)
+                else:
+                    logging.warning(
+                        'Deploy journal %s is for a different commit. '
+                        'Starting from scratch.', path)
+        with self._lock:
+            self._save()
+
+    def isComplete(self, key: str, step: str) -> bool:
+        """Returns whether `step` of `key` was completed."""
+        with self._lock:
+            completed: List[str] = self._contents['completed'].get(key, [])
+            return step in completed
+
+    def markComplete(self, key: str, step: str) -> None:
+        """Records that `step` of `key` was completed."""
+        with self._lock:
+            completed: List[str] = self._contents['completed'].setdefault(
+                key, [])
+            if step not in completed:
+                completed.append(step)
+            self._save()
+
+    def run(self,
+            key: str,
+            step: str,
+            fn: Callable[[], _T],
+            *,
+            default: _T,
+            retries: int = 4,
+            retryable: Callable[[Exception], bool] = isTransient) -> _T:
+        """Runs `step` of `key`, unless it was already completed.
+
+        Failures that are `retryable` are retried with backoff. Returns
+        `default` if the step was skipped.
+        """
+        if self.isComplete(key, step):
+            logging.info('%s: %s already completed. Skipping.', key, step)
+            return default
+        result = retrying(fn,
+                          description=f'{key}: {step}',
+                          retries=retries,
+                          retryable=retryable)
+        self.markComplete(key, step)
+        return result
+
+    def _save(self) -> None:
+        manifest.writeJson(self.path, self._contents)
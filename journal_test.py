@@ -0,0 +1,138 @@
+import os
+import unittest
+import unittest.mock
+
+from typing import Callable, List
+
+import requests
+import urllib3.exceptions
+
+import journal
+import testutil
+
+
+def _connectionError(
+        reason: Exception) -> requests.exceptions.ConnectionError:
+    """Returns the error that requests raises when urllib3 gives up."""
+    return requests.exceptions.ConnectionError(
+        urllib3.exceptions.MaxRetryError(
+            None,  # type: ignore
+            '/api/problem/update/',
+            reason))
+
+
+def _failing(errors: List[Exception]) -> Callable[[], str]:
+    """Returns a function that raises `errors` in order, then succeeds."""
+    def _fn() -> str:
+        if errors:
+            raise errors.pop(0)
+        return 'ok'
+
+    return _fn
+
+
+class ErrorsTest(unittest.TestCase):
+    def test_isTransient(self) -> None:
+        self.assertTrue(journal.isTransient(requests.exceptions.ReadTimeout()))
+        self.assertTrue(
+            journal.isTransient(requests.exceptions.JSONDecodeError(
+                'Expecting value', '<html>', 0)))
+        self.assertFalse(journal.isTransient(ValueError()))
+
+    def test_isUnsent(self) -> None:
+        self.assertTrue(
+            journal.isUnsent(requests.exceptions.ConnectTimeout()))
+        self.assertTrue(
+            journal.isUnsent(
+                _connectionError(
+                    urllib3.exceptions.NewConnectionError(
+                        None,  # type: ignore
+                        'Connection refused'))))
+        # The request might have reached the server in all of these.
+        self.assertFalse(journal.isUnsent(requests.exceptions.ReadTimeout()))
+        self.assertFalse(
+            journal.isUnsent(
+                _connectionError(
+                    urllib3.exceptions.ProtocolError(
+                        'Connection aborted.'))))
+        self.assertFalse(
+            journal.isUnsent(requests.exceptions.ConnectionError()))
+        self.assertFalse(journal.isUnsent(ValueError()))
+
+
+@unittest.mock.patch('time.sleep')
+class RetryingTest(unittest.TestCase):
+    def test_retries(self, sleep: unittest.mock.MagicMock) -> None:
+        fn = _failing([requests.exceptions.ReadTimeout()] * 2)
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(journal.retrying(fn, description='test'), 'ok')
+        self.assertEqual(sleep.call_count, 2)
+        for (delay, ), _ in sleep.call_args_list:
+            self.assertLessEqual(delay, 2.0)
+
+    def test_givesUp(self, sleep: unittest.mock.MagicMock) -> None:
+        fn = _failing([requests.exceptions.ReadTimeout()] * 3)
+        with self.assertLogs(level='WARNING'), self.assertRaises(
+                requests.exceptions.ReadTimeout):
+            journal.retrying(fn, description='test', retries=2)
+        self.assertEqual(sleep.call_count, 2)
+
+    def test_notRetryable(self, sleep: unittest.mock.MagicMock) -> None:
+        fn = _failing([requests.exceptions.ReadTimeout()])
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            journal.retrying(fn,
+                             description='test',
+                             retryable=journal.isUnsent)
+        with self.assertRaises(ValueError):
+            journal.retrying(_failing([ValueError()]), description='test')
+        sleep.assert_not_called()
+
+
+class DeployJournalTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.path = os.path.join(self.tempDirectory, 'journal.json')
+
+    def _journal(self,
+                 commit: str = 'abc',
+                 resume: bool = True) -> journal.DeployJournal:
+        return journal.DeployJournal(self.path,
+                                     commit=commit,
+                                     url='https://omegaup.com',
+                                     resume=resume)
+
+    def test_resume(self) -> None:
+        deployJournal = self._journal()
+        self.assertEqual(
+            deployJournal.run('sumas', 'contents', lambda: 1, default=0), 1)
+        self.assertTrue(deployJournal.isComplete('sumas', 'contents'))
+        self.assertFalse(deployJournal.isComplete('sumas', 'admins'))
+        self.assertFalse(deployJournal.isComplete('restas', 'contents'))
+
+        with self.assertLogs(level='INFO'):
+            deployJournal = self._journal()
+        self.assertEqual(
+            deployJournal.run('sumas', 'contents', lambda: 1, default=0), 0)
+
+    def test_discarded(self) -> None:
+        self._journal().markComplete('sumas', 'contents')
+        self.assertFalse(
+            self._journal(resume=False).isComplete('sumas', 'contents'))
+
+        self._journal().markComplete('sumas', 'contents')
+        with self.assertLogs(level='WARNING'):
+            deployJournal = self._journal(commit='def')
+        self.assertFalse(deployJournal.isComplete('sumas', 'contents'))
+
+    def test_failedStep(self) -> None:
+        deployJournal = self._journal()
+        with self.assertRaises(ValueError):
+            deployJournal.run('sumas',
+                              'contents',
+                              _failing([ValueError()]),
+                              default='')
+        self.assertFalse(deployJournal.isComplete('sumas', 'contents'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+_MANIFEST_VERSION = 1
+
+_CHUNK_SIZE = 1 << 20
+
+
+def hashJson(value: Any) -> str:
+    """Returns a stable hash of a JSON-serializable value."""
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True,
+                   separators=(',', ':')).encode('utf-8')).hexdigest()
+
+
+def writeJson(path: str, value: Any, *, compact: bool = False) -> None:
+    """Writes a JSON file atomically.
+
+    The file is written to a temporary file that then replaces `path`, so an
+    interrupted write never leaves a truncated file behind. The temporary
+    file is removed if the write fails. Large files that are not meant to be
+    read by people can be written `compact`, which is several times faster.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as f:
+        try:
+            if compact:
+                # json.dump() always uses the pure-Python encoder, but
+                # json.dumps() uses the C one when there is no indentation.
+                f.write(json.dumps(value, separators=(',', ':')))
+            else:
+                json.dump(value, f, indent=2, sort_keys=True)
+        except BaseException:
+            f.close()
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+
+
+def hashFile(path: str) -> str:
+    """Returns the hash of the contents of a file, read in chunks."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class DeployManifest:
+    """Records the hashes of what was last deployed to an omegaUp instance.
+
+    The manifest is keyed by the URL of the omegaUp instance, the kind of
+    object (e.g. `problems`) and its alias. Each entry is a mapping of section
+    names to hashes, so that callers can tell which parts of an object changed
+    since the last successful deploy.
+
+    Several processes can update the same manifest at once: each update
+    takes a lock on the file, and merges the entry into its latest contents.
+    """
+    def __init__(self, path: str, url: str) -> None:
+        self.path = path
+        self.url = url
+        self._lock = threading.Lock()
+        self._contents: Dict[str, Any] = {
+            'version': _MANIFEST_VERSION,
+            'hosts': {},
+        }
+        contents = self._load()
+        if contents is not None:
+            self._contents = contents
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Reads the manifest from disk, if it exists and is valid."""
+        if not os.path.isfile(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                contents: Dict[str, Any] = json.load(f)
+        except (OSError, ValueError):
+            logging.exception('Failed to load deploy manifest %s', self.path)
+            return None
+        if contents.get('version') != _MANIFEST_VERSION:
+            logging.warning('Ignoring outdated deploy manifest %s', self.path)
+            return None
+        return contents
+
+    @contextlib.contextmanager
+    def _fileLock(self) -> Iterator[None]:
+        """Holds an exclusive lock on the manifest across processes."""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with open(f'{self.path}.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _entries(self, kind: str) -> Dict[str, Dict[str, str]]:
+        host: Dict[str, Dict[str, Dict[str, str]]] = self._contents[
+            'hosts'].setdefault(self.url, {})
+        return host.setdefault(kind, {})
+
+    def get(self, kind: str, alias: str) -> Mapping[str, str]:
+        """Returns the section hashes of the last deploy of an object."""
+        with self._lock:
+            return dict(self._entries(kind).get(alias.lower(), {}))
+
+    def update(self, kind: str, alias: str,
+               hashes: Mapping[str, str]) -> None:
+        """Records the section hashes of a successful deploy and saves it.
+
+        The entries that other processes saved in the meantime are kept.
+        """
+        with self._lock, self._fileLock():
+            contents = self._load()
+            if contents is not None:
+                self._contents = contents
+            self._entries(kind).setdefault(alias.lower(), {}).update(hashes)
+            self._save()
+
+    def _save(self) -> None:
+        writeJson(self.path, self._contents)
@@ -0,0 +1,115 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import manifest
+import testutil
+
+_URL = 'https://omegaup.com'
+
+
+def _updateManifest(path: str, alias: str) -> None:
+    manifest.DeployManifest(path, _URL).update('problems', alias,
+                                               {'settings': alias})
+
+
+class HashTest(unittest.TestCase):
+    def test_hashJson(self) -> None:
+        self.assertEqual(manifest.hashJson({
+            'a': 1,
+            'b': [1, 2]
+        }), manifest.hashJson({
+            'b': [1, 2],
+            'a': 1
+        }))
+        self.assertNotEqual(manifest.hashJson({'a': 1}),
+                            manifest.hashJson({'a': 2}))
+
+    def test_hashFile(self) -> None:
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'x' * (3 << 20))
+            f.flush()
+            # Larger than a chunk, so that it is read in several.
+            self.assertEqual(manifest.hashFile(f.name),
+                             hashlib.sha256(b'x' * (3 << 20)).hexdigest())
+
+
+class WriteJsonTest(testutil.TempDirectoryTestCase):
+    def test_writeJson(self) -> None:
+        path = os.path.join(self.tempDirectory, 'state', 'file.json')
+        manifest.writeJson(path, {'a': [1, 2]})
+        with open(path) as f:
+            self.assertEqual(json.load(f), {'a': [1, 2]})
+
+        # A value that cannot be serialized leaves the file untouched, and no
+        # temporary file behind.
+        with self.assertRaises(TypeError):
+            manifest.writeJson(path, {'a': object()})
+        with open(path) as f:
+            self.assertEqual(json.load(f), {'a': [1, 2]})
+        self.assertEqual(os.listdir(os.path.dirname(path)), ['file.json'])
+
+
+class DeployManifestTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.path = os.path.join(self.tempDirectory, 'state',
+                                 'deploy-manifest.json')
+
+    def test_roundTrip(self) -> None:
+        deployManifest = manifest.DeployManifest(self.path, _URL)
+        self.assertEqual(deployManifest.get('problems', 'sumas'), {})
+        deployManifest.update('problems', 'Sumas', {'settings': 'a'})
+        deployManifest.update('problems', 'sumas', {'cases': 'b'})
+
+        reloaded = manifest.DeployManifest(self.path, _URL)
+        self.assertEqual(reloaded.get('problems', 'SUMAS'), {
+            'settings': 'a',
+            'cases': 'b',
+        })
+        self.assertEqual(reloaded.get('contests', 'sumas'), {})
+        self.assertEqual(
+            manifest.DeployManifest(self.path,
+                                    'https://omegaup.org').get(
+                                        'problems', 'sumas'), {})
+
+    def test_outdatedVersion(self) -> None:
+        self.writeFile(self.path,
+                       json.dumps({
+                           'version': 0,
+                           'hosts': {
+                               _URL: {}
+                           }
+                       }))
+        with self.assertLogs(level='WARNING'):
+            deployManifest = manifest.DeployManifest(self.path, _URL)
+        self.assertEqual(deployManifest.get('problems', 'sumas'), {})
+
+    def test_corrupt(self) -> None:
+        self.writeFile(self.path, '{"version": 1, ')
+        with self.assertLogs(level='ERROR'):
+            deployManifest = manifest.DeployManifest(self.path, _URL)
+        deployManifest.update('problems', 'sumas', {'settings': 'a'})
+        self.assertEqual(
+            manifest.DeployManifest(self.path,
+                                    _URL).get('problems', 'sumas'),
+            {'settings': 'a'})
+
+    def test_concurrentProcesses(self) -> None:
+        # Every process starts from the same empty manifest, so an update
+        # that did not merge would drop the entries of the others.
+        aliases = [f'problem{i}' for i in range(40)]
+        with multiprocessing.Pool(8) as pool:
+            pool.starmap(_updateManifest,
+                         [(self.path, alias) for alias in aliases])
+        deployManifest = manifest.DeployManifest(self.path, _URL)
+        for alias in aliases:
+            self.assertEqual(deployManifest.get('problems', alias),
+                             {'settings': alias})
+
+
+if __name__ == '__main__':
+    unittest.main()
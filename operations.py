@@ -0,0 +1,300 @@
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import datetime
+import logging
+import sys
+import threading
+import time
+
+from typing import (Any, Callable, Dict, Iterator, List, Mapping, NamedTuple,
+                    Optional, Sequence, TypeVar, Union)
+
+import omegaup.api
+
+_T = TypeVar('_T')
+
+DEFAULT_CONCURRENCY = 8
+
+
+class Operation(NamedTuple):
+    """A single mutating omegaUp API call."""
+    endpoint: str
+    payload: Mapping[str, Any]
+    description: str
+
+
+class Plan(NamedTuple):
+    """The API calls that deploying a single problem or contest would make."""
+    title: str
+    # One of 'create', 'update', 'metadata', 'unchanged' or 'missing' (does
+    # not exist and cannot be created).
+    action: str
+    reads: int
+    operations: Sequence[Operation]
+    # For problems, the uncompressed size of the package unless the exact
+    # size of the .zip was requested.
+    uploadBytes: int = 0
+
+
+# The log records of the task that is running in the current context, if its
+# logs are being buffered.
+_logBuffer: contextvars.ContextVar[Optional[List[logging.LogRecord]]] = (
+    contextvars.ContextVar('_logBuffer', default=None))
+_logBufferLock = threading.Lock()
+
+
+class _BufferingFilter(logging.Filter):
+    """Diverts the records of tasks with buffered logs into their buffer."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        buffer = _logBuffer.get()
+        if buffer is None or getattr(record, 'unbuffered', False):
+            return True
+        buffer.append(record)
+        return False
+
+
+_bufferingFilter = _BufferingFilter()
+
+
+@contextlib.contextmanager
+def bufferedLogs() -> Iterator[None]:
+    """Holds the logs of the current context until it finishes.
+
+    The logs are then emitted together, so that the output of tasks that run
+    concurrently is not interleaved. The logs of API calls made through this
+    module's helpers are included.
+    """
+    with _logBufferLock:
+        for handler in logging.getLogger().handlers:
+            if _bufferingFilter not in handler.filters:
+                handler.addFilter(_bufferingFilter)
+    buffer: List[logging.LogRecord] = []
+    token = _logBuffer.set(buffer)
+    try:
+        yield
+    finally:
+        _logBuffer.reset(token)
+        with _logBufferLock:
+            for record in buffer:
+                logging.getLogger(record.name).handle(record)
+
+
+class TaskResult(NamedTuple):
+    """The outcome of a task run by runTasks."""
+    # A SystemExit if the task exited, e.g. through problems.fatal().
+    error: Optional[Union[Exception, SystemExit]]
+    seconds: float
+
+
+def runTask(name: str, task: Callable[[], None]) -> TaskResult:
+    """Runs a task, buffering its logs. Failures are logged and returned.
+
+    A task that exits only fails itself. The exit is returned, so that the
+    caller can exit with the same status once all the tasks are done.
+    """
+    start = time.monotonic()
+    with bufferedLogs():
+        try:
+            task()
+        except SystemExit as e:
+            logging.error('%s exited with status %s', name, e.code)
+            return TaskResult(error=e, seconds=time.monotonic() - start)
+        except Exception as e:
+            logging.exception('%s failed', name)
+            return TaskResult(error=e, seconds=time.monotonic() - start)
+    return TaskResult(error=None, seconds=time.monotonic() - start)
+
+
+def logTaskSummary(results: Mapping[str, TaskResult]) -> None:
+    """Logs whether each task succeeded, and how long it took."""
+    for name, result in results.items():
+        if result.error is None:
+            logging.info('%-30s: OK (%.1fs)', name, result.seconds)
+        elif isinstance(result.error, SystemExit):
+            logging.error('%-30s: FAILED (%.1fs): exited with status %s',
+                          name, result.seconds, result.error.code)
+        else:
+            logging.error('%-30s: FAILED (%.1fs): %s', name, result.seconds,
+                          result.error)
+    failed = sum(result.error is not None for result in results.values())
+    logging.info('%d succeeded, %d failed', len(results) - failed, failed)
+
+
+def exitOnFailure(results: Mapping[str, TaskResult]) -> None:
+    """Exits if any task failed.
+
+    If a task exited, the process exits with the same status, like it would
+    have if the task had been run on its own.
+    """
+    for result in results.values():
+        if isinstance(result.error, SystemExit):
+            sys.exit(result.error.code)
+    if any(result.error is not None for result in results.values()):
+        sys.exit(1)
+
+
+def runTasks(
+    tasks: Mapping[str, Callable[[], None]],
+    *,
+    concurrency: int,
+) -> Dict[str, TaskResult]:
+    """Runs independent tasks concurrently, buffering the logs of each one.
+
+    A failing task does not stop the others. Returns the outcome of each
+    task, and logs a summary of them.
+    """
+    results: Dict[str, TaskResult] = {}
+    if tasks:
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, min(concurrency, len(tasks)))) as executor:
+            futures = {
+                name: executor.submit(runTask, name, task)
+                for name, task in tasks.items()
+            }
+            results = {
+                name: future.result()
+                for name, future in futures.items()
+            }
+    logTaskSummary(results)
+    return results
+
+
+# The number of operations listed for each plan. The rest are only counted,
+# unless verbose logging is enabled.
+_PLAN_OPERATIONS_SHOWN = 20
+
+
+def readConcurrently(
+    reads: Mapping[str, Callable[[], _T]],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+) -> Dict[str, _T]:
+    """Issues independent read calls concurrently.
+
+    Returns a mapping from the names of the reads to their results.
+    """
+    if not reads:
+        return {}
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(concurrency, len(reads)))) as executor:
+        futures = {
+            name: executor.submit(contextvars.copy_context().run, read)
+            for name, read in reads.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+class RateLimiter:
+    """Spaces out calls that are shared by several threads."""
+    def __init__(self, callsPerSecond: float) -> None:
+        self._interval = 1.0 / callsPerSecond
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self) -> None:
+        """Blocks until the next call is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            scheduled = max(now, self._next)
+            self._next = scheduled + self._interval
+        time.sleep(scheduled - now)
+
+
+# How often the progress of a long list of operations is reported.
+_PROGRESS_INTERVAL = datetime.timedelta(seconds=5)
+
+
+def applyOperations(
+    client: omegaup.api.Client,
+    operations: Sequence[Operation],
+    *,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    rateLimiter: Optional[RateLimiter] = None,
+    progress: Optional[str] = None,
+) -> None:
+    """Executes mutating API calls concurrently, with a bounded limit.
+
+    All operations are attempted even if some of them fail, so that as much
+    of the desired state as possible is applied. The first failure is raised
+    once all of them finish.
+
+    If `progress` is provided, the individual operations are only logged when
+    verbose, and instead the number of completed operations is periodically
+    reported with that label. These reports bypass `bufferedLogs`.
+    """
+    if not operations:
+        return
+
+    def _apply(operation: Operation) -> None:
+        if rateLimiter is not None:
+            rateLimiter.wait()
+        logging.log(logging.INFO if progress is None else logging.DEBUG,
+                    '%s', operation.description)
+        client.query(operation.endpoint, operation.payload)
+
+    errors: Dict[int, BaseException] = {}
+    completed = 0
+    lastReport = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, min(concurrency,
+                                   len(operations)))) as executor:
+        futures = {
+            executor.submit(contextvars.copy_context().run, _apply, operation):
+            index
+            for index, operation in enumerate(operations)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            completed += 1
+            index = futures[future]
+            error = future.exception()
+            if error is not None:
+                logging.error('Failed: %s: %s',
+                              operations[index].description, error)
+                errors[index] = error
+            if progress is not None and (
+                    completed == len(operations) or time.monotonic() -
+                    lastReport >= _PROGRESS_INTERVAL.total_seconds()):
+                lastReport = time.monotonic()
+                logging.info('%s: %d/%d (%.0f%%), %d failed',
+                             progress,
+                             completed,
+                             len(operations),
+                             100.0 * completed / len(operations),
+                             len(errors),
+                             extra={'unbuffered': True})
+    if errors:
+        raise errors[min(errors)]
+
+
+def logPlans(plans: Sequence[Plan]) -> None:
+    """Logs what executing the plans would do, and what it would cost."""
+    verbose = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for plan in plans:
+        logging.info('%-30s: %s (%d reads, %d calls, %d bytes to upload)',
+                     plan.title, plan.action, plan.reads,
+                     len(plan.operations), plan.uploadBytes)
+        shown = (plan.operations if verbose else
+                 plan.operations[:_PLAN_OPERATIONS_SHOWN])
+        for operation in shown:
+            logging.info('%-30s:     %s', plan.title, operation.description)
+        if len(shown) < len(plan.operations):
+            logging.info('%-30s:     ... and %d more', plan.title,
+                         len(plan.operations) - len(shown))
+
+    endpoints = collections.Counter(operation.endpoint for plan in plans
+                                    for operation in plan.operations)
+    for endpoint, count in sorted(endpoints.items()):
+        logging.info('%-40s %6d calls', endpoint, count)
+    actions = collections.Counter(plan.action for plan in plans)
+    logging.info(
+        'Plan: %s. %d mutating calls, %d read calls, %d bytes to upload.',
+        ', '.join(f'{count} {action}'
+                  for action, count in sorted(actions.items())) or 'nothing',
+        sum(endpoints.values()), sum(plan.reads for plan in plans),
+        sum(plan.uploadBytes for plan in plans))
+    for plan in plans:
+        if plan.action == 'missing':
+            logging.warning('%s does not exist and cannot be created',
+                            plan.title)
@@ -0,0 +1,151 @@
+import functools
+import logging
+import threading
+import unittest
+import unittest.mock
+
+from typing import Any, List, Mapping
+
+import operations
+
+
+def _messages(records: List[logging.LogRecord]) -> List[str]:
+    return [record.getMessage() for record in records]
+
+
+class RunTasksTest(unittest.TestCase):
+    def test_bufferedLogs(self) -> None:
+        firstStarted = threading.Event()
+        secondFinished = threading.Event()
+
+        def _first() -> None:
+            logging.info('first: 1')
+            firstStarted.set()
+            self.assertTrue(secondFinished.wait(timeout=5))
+            logging.info('first: 2')
+
+        def _second() -> None:
+            self.assertTrue(firstStarted.wait(timeout=5))
+            logging.info('second: 1')
+            logging.info('second: progress', extra={'unbuffered': True})
+            secondFinished.set()
+
+        with self.assertLogs(level='INFO') as logs:
+            results = operations.runTasks(
+                {
+                    'first': _first,
+                    'second': _second,
+                }, concurrency=2)
+        self.assertEqual(
+            [result.error for result in results.values()], [None, None])
+        # The second task logged in between the logs of the first one, but
+        # the logs of each task are emitted together once it finishes. The
+        # ones that bypass the buffer are emitted right away.
+        messages = _messages(logs.records)
+        self.assertEqual(messages[0], 'second: progress')
+        self.assertIn(messages[1:4], ([
+            'second: 1',
+            'first: 1',
+            'first: 2',
+        ], [
+            'first: 1',
+            'first: 2',
+            'second: 1',
+        ]))
+        self.assertEqual(messages[-1], '2 succeeded, 0 failed')
+
+    def test_failures(self) -> None:
+        calls: List[str] = []
+
+        def _task(name: str) -> None:
+            calls.append(name)
+            if name == 'error':
+                raise ValueError('error')
+            if name == 'exit':
+                raise SystemExit(3)
+
+        with self.assertLogs(level='INFO') as logs:
+            results = operations.runTasks(
+                {
+                    name: functools.partial(_task, name)
+                    for name in ('error', 'exit', 'ok')
+                },
+                concurrency=1)
+        self.assertEqual(calls, ['error', 'exit', 'ok'])
+        self.assertIsInstance(results['error'].error, ValueError)
+        self.assertIsInstance(results['exit'].error, SystemExit)
+        self.assertIsNone(results['ok'].error)
+        self.assertEqual(_messages(logs.records)[-1], '1 succeeded, 2 failed')
+
+        # The status of the task that exited is kept.
+        with self.assertRaises(SystemExit) as cm:
+            operations.exitOnFailure(results)
+        self.assertEqual(cm.exception.code, 3)
+        del results['exit']
+        with self.assertRaises(SystemExit) as cm:
+            operations.exitOnFailure(results)
+        self.assertEqual(cm.exception.code, 1)
+        del results['error']
+        operations.exitOnFailure(results)
+
+
+class ApplyOperationsTest(unittest.TestCase):
+    def test_applyOperations(self) -> None:
+        queried: List[str] = []
+        lock = threading.Lock()
+
+        def _query(endpoint: str, payload: Mapping[str, Any]) -> None:
+            with lock:
+                queried.append(payload['name'])
+            if payload['name'] in ('b', 'd'):
+                raise ValueError(payload['name'])
+
+        client = unittest.mock.Mock()
+        client.query.side_effect = _query
+        operationList = [
+            operations.Operation(endpoint='/api/test/',
+                                 payload={'name': name},
+                                 description=name)
+            for name in ('a', 'b', 'c', 'd', 'e')
+        ]
+        with self.assertLogs(level='ERROR') as logs:
+            with self.assertRaises(ValueError) as cm:
+                operations.applyOperations(client,
+                                           operationList,
+                                           concurrency=3)
+        # Every operation is attempted, and the first failure is raised.
+        self.assertEqual(sorted(queried), ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(str(cm.exception), 'b')
+        self.assertEqual(sorted(_messages(logs.records)),
+                         ['Failed: b: b', 'Failed: d: d'])
+
+    def test_progress(self) -> None:
+        client = unittest.mock.Mock()
+        operationList = [
+            operations.Operation(endpoint='/api/test/',
+                                 payload={},
+                                 description='operation')
+        ] * 2
+        with self.assertLogs(level='INFO') as logs:
+            operations.applyOperations(client,
+                                       operationList,
+                                       progress='Operations')
+        self.assertEqual(client.query.call_count, 2)
+        self.assertEqual(_messages(logs.records)[-1],
+                         'Operations: 2/2 (100%), 0 failed')
+        self.assertNotIn('operation', _messages(logs.records))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def test_wait(self) -> None:
+        with unittest.mock.patch('time.monotonic', return_value=100.0), \
+                unittest.mock.patch('time.sleep') as sleep:
+            rateLimiter = operations.RateLimiter(4)
+            for _ in range(3):
+                rateLimiter.wait()
+        self.assertEqual([call.args[0] for call in sleep.call_args_list],
+                         [0.0, 0.25, 0.5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+#!/usr/bin/python3
+import argparse
+import json
+import logging
+import os
+
+import problempackage
+import problems
+import repository
+
+
+def _packageProblem(p: problems.Problem, *, rootDirectory: str,
+                    outputDirectory: str,
+                    policy: problempackage.CompressionPolicy) -> None:
+    """Builds the reproducible package of a problem, unless it is cached."""
+    problemPath = os.path.join(rootDirectory, p.path)
+    alias = p.config['misc']['alias']
+    zipPath = os.path.join(outputDirectory, f'{alias}.zip')
+    manifestPath = os.path.join(outputDirectory, f'{alias}.manifest.json')
+
+    contentsHash = problempackage.manifestHash(
+        problempackage.packageManifest(p.config, problemPath))
+
+    if os.path.isfile(zipPath) and os.path.isfile(manifestPath):
+        with open(manifestPath, 'r') as f:
+            previous = json.load(f)
+        if (previous.get('sha256') == contentsHash
+                and previous.get('compression') == policy.settings()):
+            logging.info('%-30s: Package %s is up to date', p.title,
+                         contentsHash)
+            return
+
+    logging.info('%-30s: Packaging problem...', p.title)
+    entries = problempackage.createProblemZip(p.config, problemPath,
+                                              zipPath, policy)
+    problempackage.writePackageManifest(entries, manifestPath, policy)
+    logging.info('%-30s: Package %s written to %s', p.title,
+                 problempackage.manifestHash(entries), zipPath)
+
+
+def _main() -> None:
+    rootDirectory = repository.repositoryRoot()
+
+    parser = argparse.ArgumentParser(
+        description='Build reproducible problem packages.')
+    parser.add_argument(
+        '--all',
+        action='store_true',
+        help='Consider all problems, instead of only those that have changed')
+    parser.add_argument('--verbose',
+                        action='store_true',
+                        help='Verbose logging')
+    parser.add_argument('--output-directory',
+                        default=os.path.join(
+                            repository.stateDirectory(rootDirectory),
+                            'packages'),
+                        help=('Directory to store the packages and their '
+                              'manifests'))
+    problempackage.addCompressionArguments(parser)
+    parser.add_argument('problem_paths',
+                        metavar='PROBLEM',
+                        type=str,
+                        nargs='*')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s: %(message)s',
+                        level=logging.DEBUG if args.verbose else logging.INFO)
+
+    os.makedirs(args.output_directory, exist_ok=True)
+
+    for p in problems.problems(allProblems=args.all,
+                               rootDirectory=rootDirectory,
+                               problemPaths=args.problem_paths):
+        _packageProblem(p,
+                        rootDirectory=rootDirectory,
+                        outputDirectory=args.output_directory,
+                        policy=problempackage.compressionPolicy(args))
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,64 @@
+import os
+import unittest
+import unittest.mock
+
+import packageproblems
+import problempackage
+import problems
+import testutil
+
+
+class PackageProblemTest(testutil.TempDirectoryTestCase):
+    def _package(self, policy: problempackage.CompressionPolicy) -> bool:
+        """Packages the problem, and returns whether the .zip was built."""
+        p = problems.Problem(path='p',
+                             title='p',
+                             config={
+                                 'title': 'p',
+                                 'validator': {
+                                     'name': 'token'
+                                 },
+                                 'misc': {
+                                     'alias': 'p'
+                                 },
+                             })
+        with unittest.mock.patch.object(
+                problempackage,
+                'createProblemZip',
+                wraps=problempackage.createProblemZip) as createProblemZip:
+            packageproblems._packageProblem(p,
+                                            rootDirectory=self.tempDirectory,
+                                            outputDirectory=os.path.join(
+                                                self.tempDirectory, 'out'),
+                                            policy=policy)
+        return createProblemZip.called
+
+    def test_upToDate(self) -> None:
+        self.writeFile('p/cases/1.in', b'1\n')
+        os.makedirs(os.path.join(self.tempDirectory, 'out'))
+        self.assertTrue(self._package(problempackage.CompressionPolicy()))
+        self.assertFalse(self._package(problempackage.CompressionPolicy()))
+        # The number of jobs does not change the package.
+        self.assertFalse(
+            self._package(problempackage.CompressionPolicy(jobs=2)))
+
+        self.assertTrue(
+            self._package(problempackage.CompressionPolicy(level=9)))
+        self.assertTrue(
+            self._package(
+                problempackage.CompressionPolicy(level=9,
+                                                 largeFileThreshold=1)))
+        self.assertFalse(
+            self._package(
+                problempackage.CompressionPolicy(level=9,
+                                                 largeFileThreshold=1)))
+
+        self.writeFile('p/cases/1.in', b'2\n')
+        self.assertTrue(
+            self._package(
+                problempackage.CompressionPolicy(level=9,
+                                                 largeFileThreshold=1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,561 @@
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import queue
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+from types import TracebackType
+from typing import (Any, BinaryIO, Callable, Deque, Dict, Iterable, Iterator,
+                    List, Mapping, NamedTuple, Optional, Tuple, Type, cast)
+
+import manifest
+
+# All entries get the same timestamp, the earliest one that the .zip format
+# can represent (1980-01-01 00:00:00 in MS-DOS format). This makes the
+# archive independent of the checkout time.
+_ZIP_DATE = (1 << 5) | 1
+_ZIP_TIME = 0
+_ZIP_SYSTEM_UNIX = 3
+_ZIP_STORED = 0
+_ZIP_DEFLATED = 8
+# Like zipfile, switch to ZIP64 records before reaching the 32-bit limit,
+# since some readers treat the sizes as signed.
+_ZIP64_LIMIT = (1 << 31) - 1
+_ZIP64_MARKER = 0xFFFFFFFF
+_UTF8_FLAG = 0x800
+_CHUNK_SIZE = 1 << 20
+
+# Files that are already compressed are stored as-is, since deflating them
+# again costs time and saves almost nothing.
+_STORED_EXTENSIONS = frozenset((
+    '.7z',
+    '.bz2',
+    '.gif',
+    '.gz',
+    '.jpeg',
+    '.jpg',
+    '.mp3',
+    '.mp4',
+    '.pdf',
+    '.png',
+    '.webp',
+    '.xz',
+    '.zip',
+))
+
+
+class PackageEntry(NamedTuple):
+    """Represents a single file in a problem package."""
+    name: str
+    size: int
+    sha256: str
+
+
+def problemZipEntries(problemConfig: Mapping[str, Any],
+                      problemPath: str) -> List[Tuple[str, str]]:
+    """Returns the (path, archive name) pairs that make up a problem .zip.
+
+    The entries are sorted by archive name, so the order does not depend on
+    the order in which the filesystem lists the directories.
+    """
+    entries: List[Tuple[str, str]] = []
+
+    def _addFile(f: str) -> None:
+        entries.append((f, os.path.relpath(f, problemPath)))
+
+    def _recursiveAdd(directory: str) -> None:
+        for (root, _,
+             filenames) in os.walk(os.path.join(problemPath, directory)):
+            for f in filenames:
+                _addFile(os.path.join(root, f))
+
+    testplan = os.path.join(problemPath, 'testplan')
+
+    if os.path.isfile(testplan):
+        _addFile(testplan)
+
+    if problemConfig['validator']['name'] == 'custom':
+        validators = [
+            x for x in os.listdir(problemPath) if x.startswith('validator')
+        ]
+
+        if not validators:
+            raise Exception('Custom validator missing!')
+        if len(validators) != 1:
+            raise Exception('More than one validator found!')
+
+        validator = os.path.join(problemPath, validators[0])
+
+        _addFile(validator)
+
+    for directory in ('statements', 'solutions', 'cases'):
+        _recursiveAdd(directory)
+
+    for directory in ('examples', 'interactive'):
+        if not os.path.isdir(os.path.join(problemPath, directory)):
+            continue
+        _recursiveAdd(directory)
+
+    return sorted(entries, key=lambda entry: entry[1])
+
+
+def packageManifest(problemConfig: Mapping[str, Any],
+                    problemPath: str) -> List[PackageEntry]:
+    """Returns the manifest of a problem package without building it."""
+    return [
+        PackageEntry(name=arcname,
+                     size=os.path.getsize(path),
+                     sha256=manifest.hashFile(path))
+        for path, arcname in problemZipEntries(problemConfig, problemPath)
+    ]
+
+
+def manifestHash(entries: Iterable[PackageEntry]) -> str:
+    """Returns a hash that identifies the contents of a package."""
+    hasher = hashlib.sha256()
+    for entry in entries:
+        hasher.update(
+            f'{entry.name}\0{entry.size}\0{entry.sha256}\n'.encode('utf-8'))
+    return hasher.hexdigest()
+
+
+def writePackageManifest(entries: Iterable[PackageEntry], path: str,
+                         policy: 'CompressionPolicy') -> None:
+    """Writes a package manifest as JSON.
+
+    The compression settings are recorded too, since the same contents
+    compressed differently make a different package.
+    """
+    entries = list(entries)
+    with open(path, 'w') as f:
+        json.dump(
+            {
+                'sha256': manifestHash(entries),
+                'compression': policy.settings(),
+                'entries': [entry._asdict() for entry in entries],
+            },
+            f,
+            indent=2)
+
+
+class CompressionPolicy(NamedTuple):
+    """Decides how the entries of a problem package are compressed."""
+    # The DEFLATE level used for most files.
+    level: int = 6
+    # The DEFLATE level used for files of at least `largeFileThreshold`
+    # bytes, which are almost always the .in/.out files of the cases.
+    largeFileLevel: int = 6
+    largeFileThreshold: int = 1 << 20
+    # The number of threads used to compress entries. Defaults to the number
+    # of cores.
+    jobs: Optional[int] = None
+
+    def levelFor(self, arcname: str, size: int) -> Optional[int]:
+        """Returns the DEFLATE level for an entry, or None to store it."""
+        if os.path.splitext(arcname)[1].lower() in _STORED_EXTENSIONS:
+            return None
+        if size >= self.largeFileThreshold:
+            return self.largeFileLevel
+        return self.level
+
+    def settings(self) -> Dict[str, int]:
+        """Returns the settings that change the bytes of a package.
+
+        The number of jobs is not one of them.
+        """
+        return {
+            'level': self.level,
+            'largeFileLevel': self.largeFileLevel,
+            'largeFileThreshold': self.largeFileThreshold,
+        }
+
+
+def addCompressionArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control the CompressionPolicy to a parser."""
+    default = CompressionPolicy()
+    parser.add_argument('--compression-level',
+                        type=int,
+                        default=default.level,
+                        help='DEFLATE level for the problem .zip entries')
+    parser.add_argument('--large-file-compression-level',
+                        type=int,
+                        default=default.largeFileLevel,
+                        help=('DEFLATE level for the problem .zip entries '
+                              'of at least --large-file-threshold bytes'))
+    parser.add_argument('--large-file-threshold',
+                        type=int,
+                        default=default.largeFileThreshold,
+                        help='Size in bytes of the large .zip entries')
+    parser.add_argument('--compression-jobs',
+                        type=int,
+                        default=default.jobs,
+                        help=('Number of threads used to compress the '
+                              'problem .zip entries'))
+
+
+def compressionPolicy(args: argparse.Namespace) -> CompressionPolicy:
+    """Returns the CompressionPolicy from the flags of a parser."""
+    return CompressionPolicy(level=args.compression_level,
+                             largeFileLevel=args.large_file_compression_level,
+                             largeFileThreshold=args.large_file_threshold,
+                             jobs=args.compression_jobs)
+
+
+class _CompressedEntry(NamedTuple):
+    """An entry whose contents have been compressed ahead of time."""
+    name: str
+    mode: int
+    method: int
+    crc: int
+    size: int
+    sha256: str
+    compressedSize: int
+    # The contents as they are stored in the archive. Small entries are kept
+    # in memory, larger ones are spilled to a temporary file.
+    data: BinaryIO
+
+
+def _compressEntry(path: str, arcname: str,
+                   level: Optional[int]) -> _CompressedEntry:
+    """Reads, hashes and (optionally) compresses a file.
+
+    zlib releases the GIL while compressing and computing CRCs, so this can
+    run in parallel in several threads.
+    """
+    hasher = hashlib.sha256()
+    crc = 0
+    size = 0
+    compressor = None
+    if level is not None:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    data = cast(BinaryIO,
+                tempfile.SpooledTemporaryFile(max_size=_CHUNK_SIZE))
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                crc = zlib.crc32(chunk, crc)
+                size += len(chunk)
+                if compressor is not None:
+                    chunk = compressor.compress(chunk)
+                data.write(chunk)
+        if compressor is not None:
+            data.write(compressor.flush())
+        compressedSize = data.tell()
+        data.seek(0)
+    except BaseException:
+        data.close()
+        raise
+    # Like git, only keep track of whether the file is executable.
+    if os.stat(path).st_mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH):
+        mode = 0o755
+    else:
+        mode = 0o644
+    return _CompressedEntry(
+        name=arcname,
+        mode=mode,
+        method=_ZIP_STORED if compressor is None else _ZIP_DEFLATED,
+        crc=crc,
+        size=size,
+        sha256=hasher.hexdigest(),
+        compressedSize=compressedSize,
+        data=data)
+
+
+class _ZipWriter:
+    """Writes a .zip archive out of entries that were compressed ahead of time.
+
+    Since the CRC and sizes of each entry are known before it is written, the
+    archive is produced strictly sequentially, without seeking back or using
+    data descriptors. This makes it suitable for streaming.
+    """
+    def __init__(self, write: Callable[[bytes], Any]) -> None:
+        self._write = write
+        self._offset = 0
+        self._centralDirectory: List[bytes] = []
+        self.size = 0
+        self.compressedSize = 0
+
+    def _emit(self, data: bytes) -> None:
+        self._write(data)
+        self._offset += len(data)
+
+    def add(self, entry: _CompressedEntry) -> None:
+        """Appends an entry to the archive."""
+        name = entry.name.encode('utf-8')
+        flags = 0 if entry.name.isascii() else _UTF8_FLAG
+        headerOffset = self._offset
+
+        zip64 = (entry.size >= _ZIP64_LIMIT
+                 or entry.compressedSize >= _ZIP64_LIMIT)
+        if zip64:
+            size, compressedSize = _ZIP64_MARKER, _ZIP64_MARKER
+            localExtra = struct.pack('<2H2Q', 1, 16, entry.size,
+                                     entry.compressedSize)
+            centralFields = [entry.size, entry.compressedSize]
+        else:
+            size, compressedSize = entry.size, entry.compressedSize
+            localExtra = b''
+            centralFields = []
+        if headerOffset >= _ZIP64_LIMIT:
+            centralFields.append(headerOffset)
+            headerOffset = _ZIP64_MARKER
+        centralExtra = b''
+        if centralFields:
+            centralExtra = struct.pack(f'<2H{len(centralFields)}Q', 1,
+                                       8 * len(centralFields), *centralFields)
+        version = 45 if centralFields else 20
+
+        self._emit(
+            struct.pack('<4s2B4HL2L2H', b'PK\x03\x04', version, 0, flags,
+                        entry.method, _ZIP_TIME, _ZIP_DATE, entry.crc,
+                        compressedSize, size, len(name), len(localExtra)) +
+            name + localExtra)
+        with entry.data:
+            for chunk in iter(lambda: entry.data.read(_CHUNK_SIZE), b''):
+                self._emit(chunk)
+
+        self._centralDirectory.append(
+            struct.pack('<4s4B4HL2L5H2L', b'PK\x01\x02', version,
+                        _ZIP_SYSTEM_UNIX, version, 0, flags, entry.method,
+                        _ZIP_TIME, _ZIP_DATE, entry.crc, compressedSize, size,
+                        len(name), len(centralExtra), 0, 0, 0,
+                        (stat.S_IFREG | entry.mode) << 16, headerOffset) +
+            name + centralExtra)
+        self.size += entry.size
+        self.compressedSize += entry.compressedSize
+
+    def close(self) -> None:
+        """Writes the central directory and the end of the archive."""
+        centralDirectoryOffset = self._offset
+        for header in self._centralDirectory:
+            self._emit(header)
+        centralDirectorySize = self._offset - centralDirectoryOffset
+        count = len(self._centralDirectory)
+
+        if (count >= 0xFFFF or centralDirectoryOffset >= _ZIP64_LIMIT
+                or centralDirectorySize >= _ZIP64_LIMIT):
+            zip64EndOffset = self._offset
+            self._emit(
+                struct.pack('<4sQ2H2L4Q', b'PK\x06\x06', 44, 45, 45, 0, 0,
+                            count, count, centralDirectorySize,
+                            centralDirectoryOffset))
+            self._emit(
+                struct.pack('<4sLQL', b'PK\x06\x07', 0, zip64EndOffset, 1))
+            count = min(count, 0xFFFF)
+            centralDirectorySize = min(centralDirectorySize, _ZIP64_MARKER)
+            centralDirectoryOffset = min(centralDirectoryOffset,
+                                         _ZIP64_MARKER)
+        self._emit(
+            struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, count, count,
+                        centralDirectorySize, centralDirectoryOffset, 0))
+
+
+def writeProblemZip(
+    problemConfig: Mapping[str, Any],
+    problemPath: str,
+    f: BinaryIO,
+    policy: CompressionPolicy = CompressionPolicy()
+) -> List[PackageEntry]:
+    """Writes a reproducible problem .zip to the provided file object.
+
+    Entries are sorted, and have normalized timestamps and permissions, so
+    that two builds of the same tree with the same compression policy
+    produce the same bytes. Returns the manifest of the package.
+    """
+    return _writeProblemZip(problemConfig, problemPath, f.write, policy)
+
+
+def _writeProblemZip(problemConfig: Mapping[str, Any], problemPath: str,
+                     write: Callable[[bytes], Any],
+                     policy: CompressionPolicy) -> List[PackageEntry]:
+    start = time.monotonic()
+    jobs = policy.jobs or os.cpu_count() or 1
+    writer = _ZipWriter(write)
+    entries: List[PackageEntry] = []
+
+    def _add(entry: _CompressedEntry) -> None:
+        logging.debug('writing %s', entry.name)
+        writer.add(entry)
+        entries.append(
+            PackageEntry(name=entry.name,
+                         size=entry.size,
+                         sha256=entry.sha256))
+
+    # Entries are compressed in parallel, but written in order. Only a
+    # bounded number of them is in flight, and each one keeps at most
+    # _CHUNK_SIZE bytes of compressed data in memory.
+    pending: Deque['concurrent.futures.Future[_CompressedEntry]'] = (
+        collections.deque())
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        try:
+            for path, arcname in problemZipEntries(problemConfig,
+                                                   problemPath):
+                pending.append(
+                    executor.submit(
+                        _compressEntry, path, arcname,
+                        policy.levelFor(arcname, os.path.getsize(path))))
+                if len(pending) >= 2 * jobs:
+                    _add(pending.popleft().result())
+            while pending:
+                _add(pending.popleft().result())
+        except BaseException:
+            for future in pending:
+                if not future.cancel() and future.exception() is None:
+                    future.result().data.close()
+            raise
+    writer.close()
+
+    logging.info(
+        '%-30s: Packaged %d files, %d -> %d bytes (%.1f%%) in %.2fs',
+        problemConfig['title'], len(entries), writer.size,
+        writer.compressedSize,
+        100.0 * writer.compressedSize / max(1, writer.size),
+        time.monotonic() - start)
+    return entries
+
+
+def createProblemZip(
+    problemConfig: Mapping[str, Any],
+    problemPath: str,
+    zipPath: str,
+    policy: CompressionPolicy = CompressionPolicy()
+) -> List[PackageEntry]:
+    """Creates a reproducible problem .zip on the provided path.
+
+    Returns the manifest of the package.
+    """
+    with open(zipPath, 'wb') as f:
+        return writeProblemZip(problemConfig, problemPath, f, policy)
+
+
+def problemZipSize(
+    problemConfig: Mapping[str, Any],
+    problemPath: str,
+    policy: CompressionPolicy = CompressionPolicy()
+) -> int:
+    """Returns the size of the problem .zip, without storing it."""
+    size = 0
+
+    def _count(data: bytes) -> None:
+        nonlocal size
+        size += len(data)
+
+    _writeProblemZip(problemConfig, problemPath, _count, policy)
+    return size
+
+
+class _StreamCancelled(Exception):
+    """Raised in the packaging thread when the consumer goes away."""
+
+
+class _QueueWriter:
+    """A write-only file-like object that sends fixed-size chunks to a queue.
+
+    The queue is bounded, so the packaging thread blocks when the consumer
+    falls behind instead of buffering the whole package in memory.
+    """
+    def __init__(self, chunks: 'queue.Queue[Optional[bytes]]',
+                 cancelled: threading.Event) -> None:
+        self._chunks = chunks
+        self._cancelled = cancelled
+        self._buffer = bytearray()
+
+    def write(self, data: bytes, /) -> int:
+        self._buffer += data
+        while len(self._buffer) >= _CHUNK_SIZE:
+            self._put(bytes(self._buffer[:_CHUNK_SIZE]))
+            del self._buffer[:_CHUNK_SIZE]
+        return len(data)
+
+    def close(self) -> None:
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _put(self, chunk: Optional[bytes]) -> None:
+        while True:
+            if self._cancelled.is_set():
+                raise _StreamCancelled()
+            try:
+                self._chunks.put(chunk, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class ProblemZipStream:
+    """Builds a problem .zip in a background thread and yields its bytes.
+
+    This is intended to be used as a context manager, and the object itself
+    is an iterable of chunks that can be used as a streaming request body:
+
+    with ProblemZipStream(problemConfig, problemPath) as stream:
+      for chunk in stream:
+        ...
+
+    At most `maxBufferedChunks` chunks are kept in memory at any time. The
+    bytes are identical to the ones written by createProblemZip.
+    """
+    def __init__(self,
+                 problemConfig: Mapping[str, Any],
+                 problemPath: str,
+                 *,
+                 policy: CompressionPolicy = CompressionPolicy(),
+                 maxBufferedChunks: int = 16) -> None:
+        self._problemConfig = problemConfig
+        self._problemPath = problemPath
+        self._policy = policy
+        self._chunks: 'queue.Queue[Optional[bytes]]' = queue.Queue(
+            maxsize=maxBufferedChunks)
+        self._cancelled = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._error: Optional[Exception] = None
+        self.entries: List[PackageEntry] = []
+        self.size = 0
+
+    def _run(self) -> None:
+        writer = _QueueWriter(self._chunks, self._cancelled)
+        try:
+            self.entries = _writeProblemZip(self._problemConfig,
+                                            self._problemPath, writer.write,
+                                            self._policy)
+            writer.close()
+        except _StreamCancelled:
+            return
+        except Exception as e:
+            # Re-raised in the consumer's thread.
+            self._error = e
+        try:
+            writer._put(None)
+        except _StreamCancelled:
+            pass
+
+    def __enter__(self) -> 'ProblemZipStream':
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type: Optional[Type[BaseException]],
+                 exc_value: Optional[BaseException],
+                 traceback: Optional[TracebackType]) -> None:
+        self._cancelled.set()
+        self._thread.join()
+
+    def __iter__(self) -> Iterator[bytes]:
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            self.size += len(chunk)
+            yield chunk
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,164 @@
+import io
+import os
+import stat
+import tempfile
+import unittest
+import unittest.mock
+import zipfile
+
+from typing import Any, Dict, List
+
+import problempackage
+import testutil
+
+# Tests that take a long time or a lot of disk only run when this is set.
+_SLOW_TESTS = bool(os.environ.get('OMEGAUP_DEPLOY_SLOW_TESTS'))
+
+_PROBLEM_CONFIG: Dict[str, Any] = {
+    'title': 'test',
+    'validator': {
+        'name': 'token'
+    },
+}
+
+
+class _NonSeekableWriter:
+    """A write-only file object, like a socket or a pipe."""
+    def __init__(self) -> None:
+        self.chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        return b''.join(self.chunks)
+
+
+class ProblemZipTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.problemPath = self.tempDirectory
+
+    def _writeFile(self,
+                   name: str,
+                   contents: bytes,
+                   executable: bool = False) -> None:
+        # The modes are fixed so that they do not depend on the umask.
+        self.writeFile(name, contents, mode=0o775 if executable else 0o664)
+
+    def _build(self,
+               policy: problempackage.CompressionPolicy = (
+                   problempackage.CompressionPolicy())
+               ) -> bytes:
+        writer = _NonSeekableWriter()
+        problempackage._writeProblemZip(_PROBLEM_CONFIG, self.problemPath,
+                                        writer.write, policy)
+        return writer.getvalue()
+
+    def test_roundTrip(self) -> None:
+        self._writeFile('cases/b.in', b'1 2\n' * 1000)
+        self._writeFile('cases/b.out', b'3\n')
+        self._writeFile('cases/a.in', b'')
+        self._writeFile('statements/es.markdown', 'áé'.encode('utf-8'))
+        self._writeFile('statements/image.png', os.urandom(4096))
+        self._writeFile('solutions/generator.sh',
+                        b'#!/bin/sh\n',
+                        executable=True)
+
+        with zipfile.ZipFile(io.BytesIO(self._build())) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.namelist(), [
+                'cases/a.in',
+                'cases/b.in',
+                'cases/b.out',
+                'solutions/generator.sh',
+                'statements/es.markdown',
+                'statements/image.png',
+            ])
+            for info in z.infolist():
+                with open(os.path.join(self.problemPath, info.filename),
+                          'rb') as f:
+                    self.assertEqual(z.read(info), f.read())
+                self.assertEqual(info.date_time, (1980, 1, 1, 0, 0, 0))
+            self.assertEqual(
+                z.getinfo('solutions/generator.sh').external_attr >> 16,
+                stat.S_IFREG | 0o755)
+            self.assertEqual(
+                z.getinfo('cases/b.in').external_attr >> 16,
+                stat.S_IFREG | 0o644)
+            self.assertEqual(
+                z.getinfo('statements/image.png').compress_type,
+                zipfile.ZIP_STORED)
+            self.assertEqual(
+                z.getinfo('cases/b.in').compress_type, zipfile.ZIP_DEFLATED)
+
+    def test_reproducible(self) -> None:
+        self._writeFile('cases/1.in', b'1\n')
+        self._writeFile('cases/1.out', b'2\n')
+        first = self._build()
+        os.utime(os.path.join(self.problemPath, 'cases/1.in'), (0, 0))
+        self.assertEqual(
+            self._build(problempackage.CompressionPolicy(jobs=4)), first)
+
+    def test_stream(self) -> None:
+        self._writeFile('cases/1.in', os.urandom(3 << 20))
+        expected = self._build()
+        with problempackage.ProblemZipStream(_PROBLEM_CONFIG,
+                                             self.problemPath) as stream:
+            self.assertEqual(b''.join(stream), expected)
+        self.assertEqual(stream.size, len(expected))
+
+    def test_manifest(self) -> None:
+        self._writeFile('cases/1.in', b'1\n')
+        writer = _NonSeekableWriter()
+        entries = problempackage._writeProblemZip(
+            _PROBLEM_CONFIG, self.problemPath, writer.write,
+            problempackage.CompressionPolicy())
+        self.assertEqual(
+            entries,
+            problempackage.packageManifest(_PROBLEM_CONFIG, self.problemPath))
+
+    def test_zip64Records(self) -> None:
+        # Lowering the limit makes every entry, offset and the central
+        # directory use the ZIP64 records.
+        for i in range(3):
+            self._writeFile(f'cases/{i}.in', b'%d\n' % i * 100)
+        with unittest.mock.patch.object(problempackage, '_ZIP64_LIMIT', 16):
+            contents = self._build()
+        with zipfile.ZipFile(io.BytesIO(contents)) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(z.read('cases/2.in'), b'2\n' * 100)
+
+    @unittest.skipUnless(_SLOW_TESTS, 'OMEGAUP_DEPLOY_SLOW_TESTS is not set')
+    def test_manyEntries(self) -> None:
+        count = 0x10000 + 10
+        os.makedirs(os.path.join(self.problemPath, 'cases'))
+        for i in range(count):
+            self._writeFile(f'cases/{i:05}.in', b'%d' % i)
+        with zipfile.ZipFile(io.BytesIO(self._build())) as z:
+            self.assertIsNone(z.testzip())
+            self.assertEqual(len(z.infolist()), count)
+            self.assertEqual(z.read('cases/65545.in'), b'65545')
+
+    @unittest.skipUnless(_SLOW_TESTS, 'OMEGAUP_DEPLOY_SLOW_TESTS is not set')
+    def test_largeEntry(self) -> None:
+        size = (4 << 30) + (100 << 20)
+        os.makedirs(os.path.join(self.problemPath, 'cases'))
+        with open(os.path.join(self.problemPath, 'cases/large.in'),
+                  'wb') as f:
+            f.truncate(size)
+        self._writeFile('cases/large.out', b'0\n')
+        with tempfile.TemporaryFile() as f:
+            problempackage.writeProblemZip(
+                _PROBLEM_CONFIG, self.problemPath, f,
+                problempackage.CompressionPolicy(level=1, largeFileLevel=1))
+            f.seek(0)
+            with zipfile.ZipFile(f) as z:
+                self.assertEqual(z.getinfo('cases/large.in').file_size, size)
+                self.assertIsNone(z.testzip())
+                self.assertEqual(z.read('cases/large.out'), b'0\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
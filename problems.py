@@ -1,10 +1,16 @@
+import argparse
+import atexit
+import collections
 import logging
 import os
 import sys
-import json
+import threading
 
-from typing import Any, List, Mapping, NamedTuple, NoReturn, Optional, Sequence
+from typing import (Any, Counter, List, Mapping, NamedTuple, NoReturn,
+                    Optional, Sequence, Tuple)
 
+import configindex
+import dependencies
 import repository
 
 
@@ -17,12 +23,11 @@ class Problem(NamedTuple):
     @staticmethod
     def load(problemPath: str, rootDirectory: str) -> 'Problem':
         """Load a single problem from the path."""
-        with open(os.path.join(rootDirectory, problemPath,
-                               'settings.json')) as f:
-            problemConfig = json.load(f)
+        problemConfig = configindex.loadConfig(
+            os.path.join(problemPath, 'settings.json'), rootDirectory)
 
         return Problem(path=problemPath,
-                       title=problemConfig['title'],
+                       title=problemConfig.get('title', problemPath),
                        config=problemConfig)
 
     def shouldGenerateOutputs(self, *, rootDirectory: str) -> bool:
@@ -48,25 +53,140 @@ def enumerateFullPath(path: str) -> List[str]:
     return [os.path.join(path, f) for f in os.listdir(path)]
 
 
+_ANNOTATIONS_BATCH_SIZE = 32
+# Number of recently emitted annotations that are remembered to drop their
+# duplicates.
+_ANNOTATIONS_DEDUPLICATION_WINDOW = 1024
+
+_AnnotationKey = Tuple[str, Optional[str], Optional[int], str]
+
+
+class _AnnotationSink:
+    """Buffers, deduplicates and optionally caps the CI annotations.
+
+    Annotations are written in batches, either to stderr or to a file. The
+    pending ones, and a summary of the ones that were dropped, are written
+    when the process exits. Only the duplicates of recently emitted
+    annotations are dropped, so that memory does not grow with the number of
+    annotations.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seen: 'collections.OrderedDict[_AnnotationKey, None]' = (
+            collections.OrderedDict())
+        self._perFile: Counter[Optional[str]] = collections.Counter()
+        self._dropped: Counter[Optional[str]] = collections.Counter()
+        self._pending: List[str] = []
+        self._emitted = 0
+        self.maxPerFile: Optional[int] = None
+        self.maxTotal: Optional[int] = None
+        self.path: Optional[str] = None
+        atexit.register(self.close)
+
+    def add(self, kind: str, message: str, *, filename: Optional[str],
+            line: Optional[int], col: Optional[int]) -> None:
+        """Queues an annotation, unless it is a duplicate or over the cap."""
+        key = (kind, filename, line, message)
+        location = []
+        if filename is not None:
+            location.append(f'file={filename}')
+        if line is not None:
+            location.append(f'line={line}')
+        if col is not None:
+            location.append(f'col={col}')
+        with self._lock:
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                return
+            if ((self.maxTotal is not None and self._emitted >= self.maxTotal)
+                    or (self.maxPerFile is not None
+                        and self._perFile[filename] >= self.maxPerFile)):
+                self._dropped[filename] += 1
+                return
+            self._seen[key] = None
+            if len(self._seen) > _ANNOTATIONS_DEDUPLICATION_WINDOW:
+                self._seen.popitem(last=False)
+            self._emitted += 1
+            self._perFile[filename] += 1
+            self._pending.append(
+                f'::{kind} {",".join(location)}::' + message.replace(
+                    '%', '%25').replace('\r', '%0D').replace('\n', '%0A'))
+            if len(self._pending) < _ANNOTATIONS_BATCH_SIZE:
+                return
+            self._flushLocked()
+
+    def _flushLocked(self) -> None:
+        if not self._pending:
+            return
+        contents = ''.join(f'{line}\n' for line in self._pending)
+        self._pending.clear()
+        if self.path is None:
+            sys.stderr.write(contents)
+            sys.stderr.flush()
+        else:
+            with open(self.path, 'a') as f:
+                f.write(contents)
+
+    def flush(self) -> None:
+        """Writes the pending annotations."""
+        with self._lock:
+            self._flushLocked()
+
+    def close(self) -> None:
+        """Writes the pending annotations and a summary of the dropped ones."""
+        with self._lock:
+            if self._dropped:
+                files = ', '.join(
+                    f'{filename or "(no file)"}: {count}'
+                    for filename, count in self._dropped.most_common(5))
+                self._pending.append(
+                    f'::notice ::Dropped {sum(self._dropped.values())} '
+                    f'annotations over the limit ({files})')
+                self._dropped.clear()
+            self._flushLocked()
+
+
+_annotations = _AnnotationSink()
+
+
+def addAnnotationArguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the flags that control the CI annotations."""
+    parser.add_argument('--max-annotations',
+                        type=int,
+                        default=None,
+                        help=('Maximum number of CI annotations to emit. '
+                              'Unlimited by default'))
+    parser.add_argument('--max-annotations-per-file',
+                        type=int,
+                        default=None,
+                        help=('Maximum number of CI annotations to emit for '
+                              'a single file. Unlimited by default'))
+    parser.add_argument('--annotations-file',
+                        type=str,
+                        default=None,
+                        help=('Write the CI annotations to this file instead '
+                              'of stderr'))
+
+
+def configureAnnotations(args: argparse.Namespace) -> None:
+    """Configures the CI annotations from the parsed arguments."""
+    _annotations.flush()
+    _annotations.maxTotal = args.max_annotations
+    _annotations.maxPerFile = args.max_annotations_per_file
+    _annotations.path = args.annotations_file
+
+
 def ci_message(kind: str,
                message: str,
                *,
                filename: Optional[str] = None,
                line: Optional[int] = None,
                col: Optional[int] = None) -> None:
-    """Show an error message, only on the CI."""
-    location = []
-    if filename is not None:
-        location.append(f'file={filename}')
-    if line is not None:
-        location.append(f'line={line}')
-    if col is not None:
-        location.append(f'col={col}')
-    print(
-        f'::{kind} {",".join(location)}::' +
-        message.replace('%', '%25').replace('\r', '%0D').replace('\n', '%0A'),
-        file=sys.stderr,
-        flush=True)
+    """Show an error message, only on the CI.
+
+    Messages are buffered, and repeats of recent ones are only shown once.
+    """
+    _annotations.add(kind, message, filename=filename, line=line, col=col)
 
 
 def error(message: str,
@@ -103,9 +223,26 @@ def fatal(message: str,
           ci: bool = False) -> NoReturn:
     """Show a fatal message and exit."""
     error(message, filename=filename, line=line, col=col, ci=ci)
+    _annotations.flush()
     sys.exit(1)
 
 
+def _loadProblems(problemPaths: Sequence[str],
+                  rootDirectory: str) -> List[Problem]:
+    """Loads several problems, parsing their settings in parallel."""
+    problemConfigs = configindex.configIndex(rootDirectory).loadAll([
+        os.path.join(rootDirectory, problemPath, 'settings.json')
+        for problemPath in problemPaths
+    ])
+    return [
+        Problem(path=problemPath,
+                # A missing title is reported by the schema validation.
+                title=problemConfig.get('title', problemPath),
+                config=problemConfig)
+        for problemPath, problemConfig in zip(problemPaths, problemConfigs)
+    ]
+
+
 def problems(allProblems: bool = False,
              problemPaths: Sequence[str] = (),
              rootDirectory: Optional[str] = None) -> List[Problem]:
@@ -124,36 +261,42 @@ def problems(allProblems: bool = False,
         # Generate the Problem objects from just the path. The title is ignored
         # anyways, since it's read from the configuration file in the problem
         # directory for anything important.
-        return [
-            Problem.load(problemPath=problemPath, rootDirectory=rootDirectory)
-            for problemPath in problemPaths
-        ]
+        return _loadProblems(problemPaths, rootDirectory)
 
-    with open(os.path.join(rootDirectory, 'problems.json'), 'r') as p:
-        config = json.load(p)
+    config = configindex.loadConfig('problems.json', rootDirectory)
 
-    configProblems: List[Problem] = []
+    enabledProblems: List[Mapping[str, Any]] = []
     for problem in config['problems']:
         if problem.get('disabled', False):
             logging.warning('Problem %s disabled. Skipping.', problem['title'])
             continue
-        configProblems.append(
-            Problem.load(problemPath=problem['path'],
-                         rootDirectory=rootDirectory))
+        enabledProblems.append(problem)
 
     if allProblems:
         logging.info('Loading everything as requested.')
-        return configProblems
+        return _loadProblems([problem['path'] for problem in enabledProblems],
+                             rootDirectory)
 
-    changes = repository.gitDiff(rootDirectory)
+    changes = repository.changedFiles(rootDirectory)
+    affected = dependencies.dependencyIndex(
+        rootDirectory,
+        [problem['path'] for problem in enabledProblems]).affected(changes)
 
-    problems: List[Problem] = []
-    for problem in configProblems:
-        logging.info('Loading %s.', problem.title)
+    changedPaths: List[str] = []
+    for problem in enabledProblems:
+        logging.info('Loading %s.', problem['title'])
 
-        if problem.path not in changes:
-            logging.info('No changes to %s. Skipping.', problem.title)
+        changedFiles = affected.get(problem['path'])
+        if not changedFiles:
+            logging.info('No changes to %s. Skipping.', problem['title'])
             continue
-        problems.append(problem)
+        sharedFiles = [
+            path for path in changedFiles
+            if not repository.isWithin(path, problem['path'])
+        ]
+        if sharedFiles:
+            logging.info('%s depends on changed files: %s', problem['title'],
+                         ', '.join(sorted(sharedFiles)))
+        changedPaths.append(problem['path'])
 
-    return problems
+    return _loadProblems(changedPaths, rootDirectory)
@@ -1,8 +1,13 @@
+import functools
 import subprocess
 import os
 import logging
+import posixpath
 
+from typing import Dict, Iterable, Iterator, List, Optional
 
+
+@functools.lru_cache(maxsize=None)
 def repositoryRoot() -> str:
     """Returns the root directory of the project.
 
@@ -15,8 +20,13 @@ def repositoryRoot() -> str:
                                    universal_newlines=True).strip().split()[0]
 
 
+@functools.lru_cache(maxsize=None)
 def gitDiff(rootDirectory: str) -> str:
-    """Returns the git diff of the current commit."""
+    """Returns the git diff of the current commit.
+
+    The diff is computed only once per process, so that all the stages of a
+    deploy see the same set of changes.
+    """
     env = os.environ
     logging.info('Loading git diff.')
 
@@ -33,3 +43,138 @@ def gitDiff(rootDirectory: str) -> str:
         ['git', 'diff', '--name-only', '--diff-filter=AMDR', commitRange],
         cwd=rootDirectory,
         universal_newlines=True)
+
+
+def _pathComponents(path: str) -> List[str]:
+    path = posixpath.normpath(path.replace(os.sep, '/')).strip('/')
+    if path in ('', '.'):
+        return []
+    return path.split('/')
+
+
+def isWithin(path: str, directory: str) -> bool:
+    """Returns whether `path` is `directory` or is contained in it."""
+    directoryComponents = _pathComponents(directory)
+    return _pathComponents(path)[:len(directoryComponents)] == (
+        directoryComponents)
+
+
+class _PathTrieNode:
+    __slots__ = ('children', 'path')
+
+    def __init__(self) -> None:
+        self.children: Dict[str, '_PathTrieNode'] = {}
+        self.path: Optional[str] = None
+
+
+class PathTrie:
+    """A set of repository-relative paths, indexed by their components.
+
+    Lookups take time proportional to the depth of the queried path, and
+    only whole components are matched, so `p/abc` is not a prefix of
+    `p/abcd`.
+    """
+    def __init__(self, paths: Iterable[str] = ()) -> None:
+        self._root = _PathTrieNode()
+        self._size = 0
+        for path in paths:
+            self.add(path)
+
+    def add(self, path: str) -> None:
+        """Adds a path to the trie."""
+        node = self._root
+        for component in _pathComponents(path):
+            node = node.children.setdefault(component, _PathTrieNode())
+        if node.path is None:
+            self._size += 1
+            node.path = path
+
+    def _find(self, path: str) -> Optional[_PathTrieNode]:
+        node = self._root
+        for component in _pathComponents(path):
+            child = node.children.get(component)
+            if child is None:
+                return None
+            node = child
+        return node
+
+    def containsPrefix(self, prefix: str) -> bool:
+        """Returns whether any path is, or is contained in, `prefix`."""
+        node = self._find(prefix)
+        return node is not None and (node.path is not None
+                                     or bool(node.children))
+
+    def ancestors(self, path: str) -> List[str]:
+        """Returns all the paths in the trie that contain `path`.
+
+        The paths are sorted from the shallowest to the deepest.
+        """
+        node = self._root
+        result = [] if node.path is None else [node.path]
+        for component in _pathComponents(path):
+            child = node.children.get(component)
+            if child is None:
+                break
+            node = child
+            if node.path is not None:
+                result.append(node.path)
+        return result
+
+    def owner(self, path: str) -> Optional[str]:
+        """Returns the longest path in the trie that contains `path`."""
+        ancestors = self.ancestors(path)
+        return ancestors[-1] if ancestors else None
+
+    def __iter__(self) -> Iterator[str]:
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node.path is not None:
+                yield node.path
+            stack.extend(node.children.values())
+
+    def __len__(self) -> int:
+        return self._size
+
+
+@functools.lru_cache(maxsize=None)
+def changedFiles(rootDirectory: str) -> PathTrie:
+    """Returns the files that changed in the current commit."""
+    return PathTrie(line for line in gitDiff(rootDirectory).splitlines()
+                    if line)
+
+
+def stateDirectory(rootDirectory: str) -> str:
+    """Returns the directory where the deploy scripts keep their local state.
+
+    The directory is created on demand, and it contains a .gitignore so that
+    its contents are never accidentally committed. Since it is not part of
+    the checkout, CI workflows need to cache it between runs, e.g.:
+
+    - uses: actions/cache@v4
+      with:
+        path: .omegaup-deploy
+        key: omegaup-deploy-${{ github.sha }}
+        restore-keys: omegaup-deploy-
+    """
+    path = os.environ.get('OMEGAUP_DEPLOY_STATE_DIRECTORY',
+                          os.path.join(rootDirectory, '.omegaup-deploy'))
+    os.makedirs(path, exist_ok=True)
+    gitignorePath = os.path.join(path, '.gitignore')
+    if not os.path.isfile(gitignorePath):
+        if os.environ.get('GITHUB_ACTIONS'):
+            logging.warning(
+                'The state directory %s is empty, so nothing is known about '
+                'the last deploy. Cache it between runs to skip the problems '
+                'and contests that did not change.', path)
+        with open(gitignorePath, 'w') as f:
+            f.write('*\n')
+    return path
+
+
+def currentCommit() -> str:
+    """Returns the commit that is being deployed."""
+    if os.environ.get('GITHUB_ACTIONS'):
+        return os.environ['GITHUB_SHA']
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                   universal_newlines=True).strip()
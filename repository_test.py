@@ -0,0 +1,48 @@
+import unittest
+
+import repository
+
+
+class IsWithinTest(unittest.TestCase):
+    def test_isWithin(self) -> None:
+        self.assertTrue(repository.isWithin('p/sumas', 'p/sumas'))
+        self.assertTrue(
+            repository.isWithin('p/sumas/cases/1.in', 'p/sumas/'))
+        self.assertTrue(repository.isWithin('./p/sumas/../sumas/x', 'p'))
+        self.assertTrue(repository.isWithin('p/sumas', '.'))
+        self.assertFalse(repository.isWithin('p/sumas2', 'p/sumas'))
+        self.assertFalse(repository.isWithin('p', 'p/sumas'))
+        self.assertTrue(repository.isWithin('/src/p/sumas', '/src'))
+        self.assertFalse(repository.isWithin('/srcs/p', '/src'))
+
+
+class PathTrieTest(unittest.TestCase):
+    def test_containsPrefix(self) -> None:
+        trie = repository.PathTrie(['p/abc/settings.json', 'contests/x'])
+        self.assertTrue(trie.containsPrefix('p/abc'))
+        self.assertTrue(trie.containsPrefix('p'))
+        self.assertTrue(trie.containsPrefix('p/abc/settings.json'))
+        self.assertFalse(trie.containsPrefix('p/ab'))
+        self.assertFalse(trie.containsPrefix('p/abcd'))
+        self.assertFalse(trie.containsPrefix('p/abc/settings.json/x'))
+        self.assertFalse(repository.PathTrie().containsPrefix(''))
+
+    def test_ancestors(self) -> None:
+        trie = repository.PathTrie(['p', 'p/abc', 'p/abc/cases', 'q'])
+        self.assertEqual(trie.ancestors('p/abc/cases/1.in'),
+                         ['p', 'p/abc', 'p/abc/cases'])
+        self.assertEqual(trie.ancestors('p/abcd'), ['p'])
+        self.assertEqual(trie.ancestors('r'), [])
+        self.assertEqual(trie.owner('p/abc/statements/es.markdown'), 'p/abc')
+        self.assertIsNone(trie.owner('r/abc'))
+
+    def test_paths(self) -> None:
+        trie = repository.PathTrie(['p/abc', 'p/abc/', './p/def'])
+        self.assertEqual(len(trie), 2)
+        # The paths are kept as they were first added.
+        self.assertEqual(sorted(trie), ['./p/def', 'p/abc'])
+        self.assertEqual(trie.owner('p/def/x'), './p/def')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,52 +2,86 @@
 import argparse
 import collections
 import concurrent.futures
+import contextlib
 import decimal
+import functools
 import json
 import logging
+import math
 import os
 import os.path
 import shlex
 import shutil
+import sqlite3
 import subprocess
 import sys
 import textwrap
 import threading
+import time
 
-from typing import Any, DefaultDict, Dict, List, Mapping, Optional, Tuple
+from typing import (Any, Callable, DefaultDict, Dict, FrozenSet, Iterable,
+                    List, Mapping, NamedTuple, Optional, Sequence, Tuple)
 
+import admission
+import configindex
 import container
+import dependencies
+import filewatch
+import headroom
+import history
+import manifest
 import problems
 import repository
+import schemas
+import topology
 
 TestResult = Tuple[problems.Problem, Mapping[str, Any]]
 
 _SANDBOX_DISABLED_WARNING = 'WARNING: Running with --disable-sandboxing'
 
 
-def _availableProcessors() -> int:
-    """Returns the number of available processors."""
-    try:
-        return len(os.sched_getaffinity(0))
-    except AttributeError:
-        # os.sched_setaffinity() is not available in all OSs. Since we don't
-        # want to speculate how many cores there are, let's be paranoid and
-        # return 1.
-        return 1
+def availableProcessors() -> int:
+    """Returns the number of available physical cores.
+
+    Hyperthread siblings are not counted, since tests that share a physical
+    core have noisier timings.
+    """
+    return topology.physicalCoreCount()
+
 
+def threadInitializer(threadAffinityMapping: Dict[int, int],
+                      lock: threading.Lock,
+                      cpus: Sequence[topology.Cpu]) -> None:
+    """Set the thread affinity mapping for the current thread.
 
-def _threadInitializer(threadAffinityMapping: Dict[int, int],
-                       lock: threading.Lock) -> None:
-    """Set the thread affinity mapping for the current thread."""
+    Each thread gets the next CPU from `cpus`, which should come from
+    topology.allocate().
+    """
     with lock:
-        threadAffinityMapping[threading.get_ident()] = len(
-            threadAffinityMapping)
+        threadAffinityMapping[threading.get_ident()] = cpus[len(
+            threadAffinityMapping)].id
 
 
-def _testProblem(p: problems.Problem, *, threadAffinityMapping: Dict[int, int],
-                 resultsDirectory: str, rootDirectory: str,
-                 ci: bool) -> Optional[TestResult]:
-    """Run the CI on a single problem."""
+def testProblem(p: problems.Problem,
+                *,
+                threadAffinityMapping: Dict[int, int],
+                resultsDirectory: str,
+                rootDirectory: str,
+                ci: bool,
+                runner: Optional[container.Runner] = None,
+                containerMemory: Optional[str] = None,
+                admissionController: Optional[
+                    admission.AdmissionController] = None
+                ) -> Optional[TestResult]:
+    """Run the CI on a single problem.
+
+    If `runner` is provided, the CI runs in that container instead of in a
+    new one. Otherwise, the container is confined to the CPU that
+    `threadAffinityMapping` assigns to the current thread, and the placement
+    is added to the report. `containerMemory` limits the memory of the
+    container, in `docker run --memory` format. If `admissionController`
+    is provided, the container only starts once it admits the problem.
+    """
     logging.info('[%2d] %-30s: Testing problem...',
                  threadAffinityMapping[threading.get_ident()], p.title)
 
@@ -73,28 +107,7 @@ def _testProblem(p: problems.Problem, *, threadAffinityMapping: Dict[int, int],
     else:
         outputsArgs = []
 
-    if len(threadAffinityMapping) == 1:
-        # No need to involve taskset. Just run the container normally.
-        tasksetArgs = [
-            container.getImageName(ci),
-        ]
-    else:
-        # Mark the entrypoint as only being able to run in a single core.
-        tasksetArgs = [
-            '--entrypoint',
-            '/usr/bin/taskset',
-            container.getImageName(ci),
-            f'0x{2**threadAffinityMapping[threading.get_ident()]:x}',
-            '/usr/bin/omegaup-runner',
-        ]
-
-    args = [
-        'docker',
-        'run',
-        '--rm',
-        '--volume',
-        f'{rootDirectory}:/src',
-    ] + tasksetArgs + [
+    runnerArgs = [
         '-oneshot=ci',
         '-input',
         p.path,
@@ -102,14 +115,41 @@ def _testProblem(p: problems.Problem, *, threadAffinityMapping: Dict[int, int],
         os.path.relpath(problemResultsDirectory, rootDirectory),
     ] + outputsArgs
 
+    cpu = topology.cpus().get(threadAffinityMapping[threading.get_ident()])
+    if runner is not None:
+        args = runner.command(runnerArgs)
+        cpu = None
+    else:
+        dockerArgs = [
+            'docker',
+            'run',
+            '--rm',
+            '--volume',
+            f'{rootDirectory}:/src',
+        ]
+        if cpu is not None:
+            # Pin the container to a CPU that no other worker uses, on its
+            # NUMA node. This mimics how the production container works
+            # (except for I/O).
+            dockerArgs += topology.dockerArguments(cpu, memory=containerMemory)
+        elif containerMemory is not None:
+            dockerArgs += ['--memory', containerMemory]
+        args = dockerArgs + [container.getImageName(ci)] + runnerArgs
+
     logging.debug('[%2d] %-30s: Running `%s`...',
                   threadAffinityMapping[threading.get_ident()], p.title,
                   shlex.join(args))
-    processResult = subprocess.run(args,
-                                   universal_newlines=True,
-                                   stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE,
-                                   cwd=rootDirectory)
+    with contextlib.ExitStack() as stack:
+        if admissionController is not None:
+            stack.enter_context(
+                admissionController.admitted(
+                    admission.estimateMemory(p, rootDirectory=rootDirectory)))
+        start = time.monotonic()
+        processResult = subprocess.run(args,
+                                       universal_newlines=True,
+                                       stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE,
+                                       cwd=rootDirectory)
 
     if processResult.returncode != 0:
         problems.error(f'Failed to run {p.title}:\n{processResult.stderr}',
@@ -132,12 +172,743 @@ def _testProblem(p: problems.Problem, *, threadAffinityMapping: Dict[int, int],
                                     problemOutputsDirectory)))
 
     report = json.loads(processResult.stdout)
-    logging.info('[%2d] %-30s: %s',
+    # Also keep how long the whole run took, and where, to track it over
+    # time.
+    report['duration'] = time.monotonic() - start
+    report['placement'] = cpu.placement() if cpu is not None else None
+    logging.info('[%2d] %-30s: %s in %.2fs',
                  threadAffinityMapping[threading.get_ident()], p.title,
-                 report['state'])
+                 report['state'], report['duration'])
     return p, report
 
 
+def removeGeneratedOutputs(p: problems.Problem, *, rootDirectory: str) -> None:
+    """Removes the .out files of a problem, if they are generated."""
+    if not p.shouldGenerateOutputs(rootDirectory=rootDirectory):
+        return
+    logging.info('[  ] %-30s: Removing old .out files...', p.title)
+    for filename in os.listdir(os.path.join(rootDirectory, p.path, 'cases')):
+        if not filename.endswith('.out'):
+            continue
+        os.unlink(os.path.join(rootDirectory, p.path, 'cases', filename))
+
+
+def reportTestResult(p: problems.Problem, report: Mapping[str, Any], *,
+                     resultsDirectory: str, rootDirectory: str,
+                     ci: bool) -> bool:
+    """Reports the result of testing a problem.
+
+    Returns whether all the tests passed.
+    """
+    problemResultsDirectory = os.path.join(resultsDirectory, p.path)
+
+    passed: bool = report['state'] == 'passed'
+
+    if report['state'] in ['error', 'skipped']:
+        errorString = report.get('error',
+                                 'tests/tests.json, settings.json, outs, '
+                                 'or testplan are probably missing '
+                                 'or invalid.')
+        problems.error(f'{report["state"]} {p.title}: {errorString}',
+                       filename=os.path.join(p.path, 'settings.json'),
+                       ci=ci)
+        if report['state'] == 'skipped':
+            return False
+
+    foundInvalidInputs = False
+
+    for testResult in report.get('tests', []):
+        if testResult['type'] == 'solutions':
+            testedFile = os.path.normpath(
+                os.path.join(p.path, 'tests', testResult['filename']))
+
+            expected = dict(testResult['solution'])
+            del (expected['filename'])
+            if not expected:
+                # If there are no constraints, by default expect the run to
+                # be accepted.
+                expected['verdict'] = 'AC'
+        elif testResult['type'] == 'invalid-inputs':
+            testedFile = os.path.normpath(
+                os.path.join(p.path,
+                             'tests',
+                             'invalid-inputs',
+                             testResult['filename']))
+            expected = {'verdict': 'WA'}
+            foundInvalidInputs = True
+        else:
+            testedFile = os.path.normpath(
+                os.path.join(p.path,
+                             'cases',
+                             testResult['filename']))
+            expected = {'verdict': 'AC'}
+
+        logsDirectory = os.path.join(problemResultsDirectory,
+                                     str(testResult['index']))
+
+        if os.path.isdir(os.path.join(logsDirectory, 'validator')):
+            logsDirectory = os.path.join(logsDirectory, 'validator')
+
+        got = {
+            'verdict': testResult.get('result', {}).get('verdict', 'JE'),
+            'score': testResult.get('result', {}).get('score', 0),
+        }
+
+        logging.info(
+            f'    {testResult["type"][:10]:10} | '
+            f'{testResult["filename"][:40]:40} | '
+            f'{testResult["state"]:8} | '
+            f'expected={expected} got={got} | '
+            f'logs at {os.path.relpath(logsDirectory, rootDirectory)}')
+
+        failureMessages: DefaultDict[
+            str, List[str]] = collections.defaultdict(list)
+
+        normalizedScore = decimal.Decimal(got['score'])
+        scaledScore = round(normalizedScore, 15) * 100
+
+        if testResult['state'] == 'error':
+            failureMessages[testedFile].append(testResult['error'])
+        elif testResult['state'] != 'passed':
+            # Build a table that reports groups and case verdicts.
+            groupReportTable = [
+                f'{"group":20} | {"case":20} | {"score":7} | {"verdict"}',
+                f'{"-"*20}-+-{"-"*20}-+-{"-"*7}-+-{"-"*7}',
+            ]
+            if 'compile_error' in testResult['result']:
+                failureMessage = f"{testedFile}:\n" + textwrap.indent(
+                    testResult['result']['compile_error'], '    ')
+                failureMessages[testedFile].append(failureMessage)
+            if testResult['result']['groups'] is not None:
+                for group in testResult['result']['groups']:
+                    groupReportTable.append(
+                        f'{group["group"][:20]:20} | {"":20} | '
+                        f'{group["score"]*100:6.2f}% |')
+                    for c in group['cases']:
+                        groupReportTable.append(
+                            f'{"":20} | {c["name"][:20]:20} | '
+                            f'{c["score"]*100:6.2f}% | {c["verdict"]:3}')
+                    groupReportTable.append(
+                        f'{"-"*20}-+-{"-"*20}-+-{"-"*7}-+-{"-"*7}')
+
+                failureMessages[testedFile].append(
+                    '\n'.join(groupReportTable))
+
+                failedCases = {
+                    c['name']
+                    for g in testResult['result']['groups']
+                    for c in g['cases']
+                    if c['verdict'] != expected['verdict']
+                }
+            else:
+                failedCases = set()
+
+            if os.path.isdir(logsDirectory):
+                for stderrFilename in sorted(os.listdir(logsDirectory)):
+                    caseName = os.path.splitext(stderrFilename)[0]
+
+                    if not stderrFilename.endswith('.err'):
+                        continue
+                    if caseName not in failedCases:
+                        continue
+
+                    expectedFailure = None
+
+                    if testResult['type'] == 'solutions':
+                        associatedFile = testedFile
+                    elif testResult['type'] == 'inputs':
+                        associatedFile = os.path.join(
+                            p.path, 'cases', f'{caseName}.in')
+                    elif testResult['type'] == 'invalid-inputs':
+                        caseLocation = os.path.join(
+                            p.path, 'tests', 'invalid-cases')
+                        associatedFile = os.path.join(
+                            caseLocation, f'{caseName}.in')
+                        expectedFailurePath = os.path.join(
+                            caseLocation, f'{caseName}.expected-failure')
+                        if not os.path.isfile(expectedFailurePath):
+                            logging.error('Missing file: ' +
+                                          f'{expectedFailurePath}')
+                        else:
+                            with open(expectedFailurePath, 'r') as err:
+                                expectedFailure = err.read().strip()
+                    else:
+                        logging.error('Unexpected test result type: '
+                                      f'{testResult["type"]}')
+
+                    with open(os.path.join(logsDirectory, stderrFilename),
+                              'r') as out:
+                        contents = out.read().strip()
+
+                        if contents.startswith(_SANDBOX_DISABLED_WARNING):
+                            contents = contents[
+                                len(_SANDBOX_DISABLED_WARNING):].strip()
+
+                        if not contents:
+                            continue
+
+                        failureMessage = (
+                            f'{stderrFilename}:\n'
+                            f'{textwrap.indent(contents, "    ")}')
+
+                        if expectedFailure:
+                            formattedFailure = textwrap.indent(
+                                expectedFailure, "    ")
+
+                            failureMessage = (
+                                'Expected the following string in '
+                                'stderr:\n'
+                                f'{formattedFailure}\n\n'
+                                f'{failureMessage}')
+
+                        failureMessages[associatedFile].append(
+                            failureMessage)
+            else:
+                logging.warning('Logs directory %r not found.',
+                                logsDirectory)
+
+        for (path, messages) in failureMessages.items():
+            problems.error(
+                (f'Validation failed for problem: {p.title}\n'
+                 f'Related file: {path}\n') + '\n'.join(messages),
+                filename=path,
+                ci=ci)
+
+    if not foundInvalidInputs:
+        problems.warning(f'Missing invalid inputs for problem: {p.title}',
+                         ci=ci)
+
+    logging.info(f'Results for {p.title}: {report["state"]}')
+    logging.info(f'    Full logs and report in {problemResultsDirectory}')
+    return passed
+
+
+class ProblemScope(NamedTuple):
+    """The parts of a problem that are tested.
+
+    `None` means all of them.
+    """
+    cases: Optional[FrozenSet[str]]
+    solutions: Optional[FrozenSet[str]]
+
+
+FULL_SCOPE = ProblemScope(cases=None, solutions=None)
+
+# The (st_mtime_ns, st_size, hash) of a file in a watched problem.
+_FileState = Tuple[int, int, str]
+
+
+def _updateFileStates(states: Dict[str, _FileState], directory: str,
+                      paths: Iterable[str]) -> List[str]:
+    """Updates the states of the files, and returns those that changed.
+
+    Files are only hashed if their modification time or size changed, and
+    they are considered changed only if their contents did, so that editors
+    that touch files without modifying them do not trigger a run. The
+    returned paths are relative to `directory`.
+    """
+    changed: List[str] = []
+    for path in paths:
+        relativePath = os.path.relpath(path, directory).replace(os.sep, '/')
+        previous = states.get(relativePath)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            if states.pop(relativePath, None) is not None:
+                changed.append(relativePath)
+            continue
+        if previous is not None and previous[:2] == (st.st_mtime_ns,
+                                                     st.st_size):
+            continue
+        state = (st.st_mtime_ns, st.st_size, manifest.hashFile(path))
+        states[relativePath] = state
+        if previous is None or previous[2] != state[2]:
+            changed.append(relativePath)
+    return changed
+
+
+def _problemFiles(directory: str) -> List[str]:
+    return [
+        os.path.join(root, filename)
+        for root, _, filenames in os.walk(directory, followlinks=True)
+        for filename in filenames
+    ]
+
+
+def _expectsAccepted(solution: Mapping[str, Any]) -> bool:
+    """Returns whether a solution is expected to be accepted in every case.
+
+    Only the verdicts of those solutions can be checked by running a subset
+    of the cases.
+    """
+    expected = {k: v for k, v in solution.items() if k != 'filename'}
+    if set(expected) - {'verdict', 'score_range'}:
+        return False
+    if expected.get('verdict', 'AC') != 'AC':
+        return False
+    return [float(x) for x in expected.get('score_range', [1, 1])] == [1, 1]
+
+
+def _watchScope(changedFiles: Iterable[str],
+                testsConfig: Mapping[str, Any]) -> Optional[ProblemScope]:
+    """Maps the changed files of a problem to the parts that are affected.
+
+    Returns None if nothing needs to be tested again.
+    """
+    solutionFilenames = {
+        solution['filename']
+        for solution in testsConfig.get('solutions', [])
+    }
+    cases = set()
+    solutions = set()
+    for path in changedFiles:
+        if repository.isWithin(path, 'statements'):
+            continue
+        if repository.isWithin(path, 'cases') and path.endswith(
+                ('.in', '.out')):
+            cases.add(os.path.splitext(path[len('cases/'):])[0])
+            continue
+        if path.startswith('tests/') and path[len('tests/'):] in (
+                solutionFilenames):
+            solutions.add(path[len('tests/'):])
+            continue
+        # Settings, validators, testplans, etc. could affect everything.
+        return FULL_SCOPE
+    if cases and solutions:
+        return FULL_SCOPE
+    if cases:
+        return ProblemScope(cases=frozenset(cases), solutions=None)
+    if solutions:
+        return ProblemScope(cases=None, solutions=frozenset(solutions))
+    return None
+
+
+def _linkOrCopy(source: str, destination: str) -> None:
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def problemView(p: problems.Problem,
+                scope: ProblemScope,
+                testsConfig: Mapping[str, Any],
+                *,
+                rootDirectory: str,
+                viewDirectory: str,
+                linkOutputs: bool = True) -> problems.Problem:
+    """Builds a copy of a problem that only has the parts in `scope`.
+
+    The copy has the solutions of `testsConfig`, which are expected to get
+    the same verdicts in the cases of `scope` as in the whole problem.
+    Files are hard-linked when possible. If `linkOutputs` is true, that
+    includes the .out files, so that the ones that the CI generates are also
+    written to the original problem. The settings.json of the copy comes
+    from `p.config`.
+    """
+    problemDirectory = os.path.join(rootDirectory, p.path)
+    shutil.rmtree(viewDirectory, ignore_errors=True)
+    os.makedirs(viewDirectory)
+
+    viewConfig = dict(p.config)
+    viewTestsConfig = dict(testsConfig)
+    if scope.cases is not None:
+        if 'cases' in p.config:
+            viewConfig['cases'] = [
+                dict(group,
+                     cases=[
+                         case for case in group['cases']
+                         if case['name'] in scope.cases
+                     ]) for group in p.config['cases']
+                if any(case['name'] in scope.cases
+                       for case in group['cases'])
+            ]
+    if scope.solutions is not None:
+        viewTestsConfig['solutions'] = [
+            solution for solution in testsConfig.get('solutions', [])
+            if solution['filename'] in scope.solutions
+        ]
+
+    for path in _problemFiles(problemDirectory):
+        relativePath = os.path.relpath(path,
+                                       problemDirectory).replace(os.sep, '/')
+        destination = os.path.join(viewDirectory, relativePath)
+        if relativePath in ('settings.json', 'tests/tests.json'):
+            continue
+        if scope.cases is not None:
+            if repository.isWithin(relativePath, 'cases') and (
+                    os.path.splitext(relativePath[len('cases/'):])[0]
+                    not in scope.cases):
+                continue
+            if relativePath == 'testplan':
+                with open(path, 'r') as source, open(destination,
+                                                     'w') as f:
+                    for line in source:
+                        if line.split()[:1] and (line.split()[0]
+                                                 in scope.cases):
+                            f.write(line)
+                continue
+        if linkOutputs or not relativePath.endswith('.out'):
+            _linkOrCopy(path, destination)
+        else:
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copy2(path, destination)
+
+    for relativePath, config in (('settings.json', viewConfig),
+                                 ('tests/tests.json', viewTestsConfig)):
+        if relativePath == 'tests/tests.json' and not testsConfig:
+            continue
+        os.makedirs(os.path.dirname(os.path.join(viewDirectory,
+                                                 relativePath)),
+                    exist_ok=True)
+        with open(os.path.join(viewDirectory, relativePath), 'w') as f:
+            json.dump(config, f, indent=2)
+
+    return p._replace(path=os.path.relpath(viewDirectory, rootDirectory),
+                      config=viewConfig)
+
+
+def loadTestsConfig(p: problems.Problem, *,
+                    rootDirectory: str) -> Mapping[str, Any]:
+    """Returns the contents of the problem's tests/tests.json, if any."""
+    testsPath = os.path.join(p.path, 'tests', 'tests.json')
+    if not os.path.isfile(os.path.join(rootDirectory, testsPath)):
+        return {}
+    testsConfig: Mapping[str, Any] = configindex.loadConfig(
+        testsPath, rootDirectory)
+    return testsConfig
+
+
+def _watchRun(p: problems.Problem, scope: ProblemScope, *,
+              runner: container.Runner, resultsDirectory: str,
+              rootDirectory: str, ci: bool) -> None:
+    """Tests the parts of a problem in `scope`, and reports the results."""
+    start = time.monotonic()
+    target = p
+    if scope != FULL_SCOPE:
+        testsConfig = loadTestsConfig(p, rootDirectory=rootDirectory)
+        if scope.cases is not None and testsConfig:
+            # Without the rest of the cases, only the solutions that are
+            # accepted in every case can be checked.
+            testsConfig = dict(testsConfig,
+                               solutions=[
+                                   solution for solution in testsConfig.get(
+                                       'solutions', [])
+                                   if _expectsAccepted(solution)
+                               ])
+        target = problemView(p,
+                             scope,
+                             testsConfig,
+                             rootDirectory=rootDirectory,
+                             viewDirectory=os.path.join(
+                                 resultsDirectory, 'watch', p.path))
+        logging.info('[ 0] %-30s: Testing only %s...', p.title,
+                     ', '.join(sorted(scope.cases or scope.solutions or ())))
+
+    shutil.rmtree(os.path.join(resultsDirectory, target.path),
+                  ignore_errors=True)
+    result = testProblem(target,
+                         threadAffinityMapping={threading.get_ident(): 0},
+                         resultsDirectory=resultsDirectory,
+                         rootDirectory=rootDirectory,
+                         ci=ci,
+                         runner=runner)
+    passed = result is not None and reportTestResult(
+        target,
+        result[1],
+        resultsDirectory=resultsDirectory,
+        rootDirectory=rootDirectory,
+        ci=ci)
+
+    if target is not p and p.shouldGenerateOutputs(
+            rootDirectory=rootDirectory):
+        # Outputs of new cases are not hard-linked to the original problem.
+        viewCasesDirectory = os.path.join(rootDirectory, target.path, 'cases')
+        for path in _problemFiles(viewCasesDirectory):
+            if not path.endswith('.out'):
+                continue
+            destination = os.path.join(
+                rootDirectory, p.path, 'cases',
+                os.path.relpath(path, viewCasesDirectory))
+            if not os.path.exists(destination) or not os.path.samefile(
+                    path, destination):
+                shutil.copy(path, destination)
+
+    logging.info('[ 0] %-30s: %s in %.1fs', p.title,
+                 'passed' if passed else 'FAILED',
+                 time.monotonic() - start)
+
+
+def watchProblems(problemList: List[problems.Problem], *, rootDirectory: str,
+                  resultsDirectory: str, ci: bool) -> None:
+    """Tests the problems, and then tests them again whenever they change.
+
+    All the runs share a single container, and only the cases or solutions
+    that were modified are tested again, when possible. This returns when
+    interrupted.
+    """
+    directories = {
+        p.path: os.path.join(rootDirectory, p.path)
+        for p in problemList
+    }
+    states: Dict[str, Dict[str, _FileState]] = {}
+    for p in problemList:
+        states[p.path] = {}
+        _updateFileStates(states[p.path], directories[p.path],
+                          _problemFiles(directories[p.path]))
+
+    def _run(p: problems.Problem, scope: ProblemScope) -> None:
+        _watchRun(p,
+                  scope,
+                  runner=runner,
+                  resultsDirectory=resultsDirectory,
+                  rootDirectory=rootDirectory,
+                  ci=ci)
+        # Generated .out files are not changes made by the user.
+        _updateFileStates(
+            states[p.path], directories[p.path],
+            (path
+             for path in _problemFiles(
+                 os.path.join(directories[p.path], 'cases'))
+             if path.endswith('.out')))
+
+    try:
+        with container.Runner(rootDirectory, ci) as runner, \
+                filewatch.watcher(list(directories.values())) as watcher:
+            for p in problemList:
+                _run(p, FULL_SCOPE)
+            while True:
+                logging.info('Watching %d problems for changes...',
+                             len(problemList))
+                changedPaths = watcher.wait()
+                for i, p in enumerate(problemList):
+                    changedFiles = _updateFileStates(
+                        states[p.path], directories[p.path],
+                        (path for path in changedPaths
+                         if repository.isWithin(path, directories[p.path])))
+                    if not changedFiles:
+                        continue
+                    logging.info('[ 0] %-30s: Changed %s', p.title,
+                                 ', '.join(sorted(changedFiles)))
+                    if 'settings.json' in changedFiles:
+                        p = problems.Problem.load(p.path, rootDirectory)
+                        problemList[i] = p
+                    scope = _watchScope(
+                        changedFiles,
+                        loadTestsConfig(p, rootDirectory=rootDirectory))
+                    if scope is None:
+                        continue
+                    _run(p, scope)
+    except KeyboardInterrupt:
+        logging.info('Stopped watching.')
+
+
+FAILURES_FILENAME = 'failures.json'
+
+# The tests of a problem that failed, or None if the whole problem did.
+_FailedTests = Optional[List[Dict[str, str]]]
+
+
+def _failedTests(report: Mapping[str, Any]) -> _FailedTests:
+    """Returns the tests of a report that did not pass.
+
+    Returns None if the failure cannot be narrowed down to any of them.
+    """
+    failedTests = [
+        {
+            'type': testResult['type'],
+            'filename': testResult['filename'],
+        } for testResult in report.get('tests', [])
+        if testResult['state'] != 'passed'
+    ]
+    if report['state'] in ('error', 'skipped') or not failedTests:
+        return None
+    return failedTests
+
+
+def loadFailures(rootDirectory: str) -> Dict[str, _FailedTests]:
+    """Returns the failures of the last run, keyed by problem path."""
+    path = os.path.join(repository.stateDirectory(rootDirectory),
+                        FAILURES_FILENAME)
+    if not os.path.isfile(path):
+        return {}
+    with open(path, 'r') as f:
+        failures: Dict[str, _FailedTests] = json.load(f)['problems']
+    return failures
+
+
+def writeFailures(failures: Mapping[str, _FailedTests], *,
+                  rootDirectory: str) -> None:
+    """Records the failures of a run, so that --rerun-failed can use them."""
+    path = os.path.join(repository.stateDirectory(rootDirectory),
+                        FAILURES_FILENAME)
+    manifest.writeJson(path, {'problems': failures})
+
+
+def _rerunScope(failedTests: _FailedTests) -> ProblemScope:
+    """Returns the parts of a problem that need to run to retry its failures.
+
+    Inputs and invalid inputs are always validated, so only the failed
+    solutions are added to them.
+    """
+    if failedTests is None or any(
+            test['type'] not in ('solutions', 'inputs', 'invalid-inputs')
+            for test in failedTests):
+        return FULL_SCOPE
+    return ProblemScope(cases=None,
+                        solutions=frozenset(test['filename']
+                                            for test in failedTests
+                                            if test['type'] == 'solutions'))
+
+
+def _caseNames(p: problems.Problem, *, rootDirectory: str) -> List[str]:
+    casesDirectory = os.path.join(rootDirectory, p.path, 'cases')
+    return [
+        os.path.splitext(os.path.relpath(path, casesDirectory))[0].replace(
+            os.sep, '/') for path in _problemFiles(casesDirectory)
+        if path.endswith('.in')
+    ]
+
+
+def _incrementalScope(p: problems.Problem, changedFiles: Iterable[str], *,
+                      rootDirectory: str) -> ProblemScope:
+    """Maps the changed files of a problem to the parts that need testing.
+
+    Changed cases bring in the rest of their group, so that the group scores
+    are meaningful. Changed solutions run against all the cases, and any
+    other change tests the whole problem.
+    """
+    scope = _watchScope(changedFiles,
+                        loadTestsConfig(p, rootDirectory=rootDirectory))
+    if scope is None or scope.cases is None:
+        return scope or FULL_SCOPE
+    caseNames = _caseNames(p, rootDirectory=rootDirectory)
+    if not scope.cases <= set(caseNames):
+        # Removed cases change the groups and their weights.
+        return FULL_SCOPE
+    if 'cases' in p.config:
+        groups = {
+            case['name']: group['name']
+            for group in p.config['cases'] for case in group['cases']
+        }
+    else:
+        # Without explicit groups, cases are grouped by their name's prefix.
+        groups = {name: name.split('.', 1)[0] for name in caseNames}
+    changedGroups = {groups.get(name, name) for name in scope.cases}
+    cases = frozenset(name for name in caseNames
+                      if groups.get(name, name) in changedGroups)
+    return ProblemScope(cases=cases, solutions=None)
+
+
+def _incrementalScopes(
+        problemList: Iterable[problems.Problem], *, rootDirectory: str,
+        historyFile: str,
+        image: str) -> Dict[str, Tuple[ProblemScope, history.RecordedRun]]:
+    """Returns the parts of each problem that changed since upstream.
+
+    Only problems whose last recorded full run passed are narrowed down,
+    since that run provides the verdicts of the parts that are not tested
+    again. That run is returned along with the scope.
+    """
+    problemList = list(problemList)
+    affected = dependencies.dependencyIndex(
+        rootDirectory, [p.path for p in problemList]).affected(
+            repository.changedFiles(rootDirectory))
+    lastFullRuns = history.lastFullRuns(historyFile, image=image)
+    scopes: Dict[str, Tuple[ProblemScope, history.RecordedRun]] = {}
+    for p in problemList:
+        changedFiles = affected.get(p.path)
+        if not changedFiles or not all(
+                repository.isWithin(path, p.path) for path in changedFiles):
+            continue
+        lastFullRun = lastFullRuns.get(p.path)
+        if lastFullRun is None or lastFullRun.state != 'passed':
+            logging.info(
+                '%-30s: No passing full run recorded, testing everything',
+                p.title)
+            continue
+        scopes[p.path] = (_incrementalScope(
+            p, [
+                os.path.relpath(path, p.path).replace(os.sep, '/')
+                for path in changedFiles
+            ],
+            rootDirectory=rootDirectory), lastFullRun)
+    return scopes
+
+
+def _sameCaseResults(testResult: Mapping[str, Any],
+                     baseline: history.CaseResults) -> bool:
+    """Returns whether a solution got the same results as in `baseline`."""
+    cases = [
+        case for group in (testResult.get('result') or {}).get('groups') or []
+        for case in group['cases']
+    ]
+    if not cases:
+        return False
+    for case in cases:
+        expected = baseline.get((testResult['filename'], case['name']))
+        if expected is None or expected[0] != case.get('verdict'):
+            return False
+        if not math.isclose(expected[1] or 0,
+                            case.get('score') or 0,
+                            abs_tol=1e-9):
+            return False
+    return True
+
+
+def _judgeWithBaseline(
+        report: Mapping[str, Any], testsConfig: Mapping[str, Any],
+        baseline: history.CaseResults) -> Optional[Mapping[str, Any]]:
+    """Judges the solutions of a report on a subset of the cases.
+
+    The solutions that are not expected to be accepted in every case pass
+    if they got the same verdict and score in every case as in `baseline`,
+    the last full run, which passed. Returns the report with those
+    solutions judged, or None if any of them got different results.
+    """
+    accepted = {
+        solution['filename']
+        for solution in testsConfig.get('solutions', [])
+        if _expectsAccepted(solution)
+    }
+    tests = []
+    for testResult in report.get('tests', []):
+        if testResult['type'] == 'solutions' and testResult[
+                'filename'] not in accepted:
+            if not _sameCaseResults(testResult, baseline):
+                return None
+            testResult = dict(testResult, state='passed')
+        tests.append(testResult)
+    state = report['state']
+    if state == 'failed' and all(testResult['state'] == 'passed'
+                                 for testResult in tests):
+        state = 'passed'
+    return dict(report, tests=tests, state=state)
+
+
+def _testCaseSubset(p: problems.Problem, view: problems.Problem,
+                    testsConfig: Mapping[str, Any],
+                    baseline: history.CaseResults, *,
+                    test: Callable[[problems.Problem], Optional[TestResult]],
+                    resultsDirectory: str) -> Optional[TestResult]:
+    """Tests a view of a problem with a subset of its cases.
+
+    If the verdicts of the solutions that are not always accepted cannot be
+    judged from `baseline`, the whole problem is tested instead.
+    """
+    result = test(view)
+    if result is None:
+        return None
+    report = _judgeWithBaseline(result[1], testsConfig, baseline)
+    if report is not None:
+        return view, report
+    logging.info('%-30s: Verdicts changed since the last full run, testing '
+                 'everything', p.title)
+    shutil.rmtree(os.path.join(resultsDirectory, p.path), ignore_errors=True)
+    return test(p)
+
+
 def _main() -> None:
     rootDirectory = repository.repositoryRoot()
 
@@ -152,8 +923,13 @@ def _main() -> None:
     parser.add_argument('--jobs',
                         '-j',
                         type=int,
-                        default=_availableProcessors(),
+                        default=availableProcessors(),
                         help='Number of threads to run concurrently')
+    parser.add_argument('--container-memory',
+                        default=None,
+                        help=('Memory limit of each test container, in '
+                              '`docker run --memory` format'))
+    admission.addAdmissionArguments(parser)
     parser.add_argument('--verbose',
                         action='store_true',
                         help='Verbose logging')
@@ -168,11 +944,31 @@ def _main() -> None:
                         action='store_true',
                         help=('Don\'t run tests: '
                               'only download the Docker container'))
+    headroom.addHeadroomArguments(parser)
+    history.addHistoryArguments(parser)
+    parser.add_argument('--watch',
+                        action='store_true',
+                        help=('Keep running, and test the problems again '
+                              'whenever they change'))
+    parser.add_argument('--rerun-failed',
+                        action='store_true',
+                        help=('Only test again the problems, and when '
+                              'possible the solutions, that failed in the '
+                              'last run. The results of everything else are '
+                              'kept'))
+    parser.add_argument('--incremental-cases',
+                        action='store_true',
+                        help=('Only test the cases and solutions that '
+                              'changed, and reuse the last recorded results '
+                              'for the rest'))
     parser.add_argument('problem_paths',
                         metavar='PROBLEM',
                         type=str,
                         nargs='*')
+    problems.addAnnotationArguments(parser)
+
     args = parser.parse_args()
+    problems.configureAnnotations(args)
 
     logging.basicConfig(format='%(asctime)s: %(message)s',
                         level=logging.DEBUG if args.verbose else logging.INFO)
@@ -184,233 +980,176 @@ def _main() -> None:
 
     anyFailure = False
 
-    if os.path.isdir(args.results_directory):
-        shutil.rmtree(args.results_directory)
-    os.makedirs(args.results_directory)
+    failures: Dict[str, _FailedTests] = {}
+    if args.rerun_failed:
+        if args.watch or args.all or args.problem_paths:
+            parser.error('--rerun-failed cannot be used with --watch, --all '
+                         'or a list of problems')
+        failures = loadFailures(rootDirectory)
+        if not failures:
+            logging.info('No failures recorded in the last run.')
+            return
+        # Only the results of the problems that run again are replaced.
+        for problemPath in failures:
+            for path in (os.path.join(args.results_directory, problemPath),
+                         os.path.join(args.results_directory, 'views',
+                                      problemPath)):
+                shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(args.results_directory, exist_ok=True)
+    else:
+        if os.path.isdir(args.results_directory):
+            shutil.rmtree(args.results_directory)
+        os.makedirs(args.results_directory)
+
+    problemList = problems.problems(allProblems=args.all,
+                                    rootDirectory=rootDirectory,
+                                    problemPaths=args.problem_paths
+                                    or sorted(failures))
+    # This is done before the image is pulled, so that broken configs are
+    # reported right away.
+    if not schemas.validate(problemList=problemList,
+                            rootDirectory=rootDirectory,
+                            ci=args.ci):
+        sys.exit(1)
+
+    if args.watch:
+        if not repository.isWithin(os.path.abspath(args.results_directory),
+                                   rootDirectory):
+            parser.error('--results-directory must be inside the repository '
+                         'to use --watch')
+        watchProblems(problemList,
+                      rootDirectory=rootDirectory,
+                      resultsDirectory=args.results_directory,
+                      ci=args.ci)
+        return
 
-    # Run all the tests in parallel, but set the CPU affinity mask to a unique
-    # core for each thread in the pool. This mimics how the production
-    # container works (except for I/O).
-    futures: List[concurrent.futures.Future[Optional[TestResult]]] = []
+    # Run all the tests in parallel, but confine each thread in the pool to a
+    # unique CPU, on its own physical core when possible. This mimics how the
+    # production container works (except for I/O).
+    futures: Dict[concurrent.futures.Future[Optional[TestResult]],
+                  problems.Problem] = {}
     threadAffinityMapping: Dict[int, int] = {}
     threadAffinityMappingLock = threading.Lock()
+    scopes: Dict[str, ProblemScope] = {}
+    baselineRuns: Dict[str, history.RecordedRun] = {}
+    if args.rerun_failed:
+        scopes = {
+            p.path: _rerunScope(failures.get(p.path))
+            for p in problemList
+        }
+    elif args.incremental_cases:
+        for path, (scope, baselineRun) in _incrementalScopes(
+                problemList,
+                rootDirectory=rootDirectory,
+                historyFile=history.historyPath(args, rootDirectory),
+                image=container.imageName(args.ci)).items():
+            scopes[path] = scope
+            baselineRuns[path] = baselineRun
+    # Problems are only narrowed down through a view, which the runner can
+    # only see inside the repository.
+    canNarrow = repository.isWithin(os.path.abspath(args.results_directory),
+                                    rootDirectory)
+    cpus = topology.allocate(args.jobs)
+    admissionController = admission.admissionController(
+        args, maxWorkers=len(cpus))
     with concurrent.futures.ThreadPoolExecutor(
-            max_workers=min(os.cpu_count() or 1, args.jobs),
-            initializer=_threadInitializer,
-            initargs=(threadAffinityMapping,
-                      threadAffinityMappingLock)) as executor:
-        for p in problems.problems(allProblems=args.all,
-                                   rootDirectory=rootDirectory,
-                                   problemPaths=args.problem_paths):
-            if (p.shouldGenerateOutputs(rootDirectory=rootDirectory)
-                    and args.overwrite_outs):
-                logging.info('[  ] %-30s: Removing old .out files...', p.title)
-                for filename in os.listdir(
-                        os.path.join(rootDirectory, p.path, 'cases')):
-                    if not filename.endswith('.out'):
-                        continue
-                    os.unlink(
-                        os.path.join(rootDirectory, p.path, 'cases', filename))
+            max_workers=len(cpus),
+            initializer=threadInitializer,
+            initargs=(threadAffinityMapping, threadAffinityMappingLock,
+                      cpus)) as executor:
+        for p in problemList:
+            if args.overwrite_outs:
+                removeGeneratedOutputs(p, rootDirectory=rootDirectory)
 
-            futures.append(
-                executor.submit(_testProblem,
-                                p,
-                                resultsDirectory=args.results_directory,
-                                rootDirectory=rootDirectory,
-                                threadAffinityMapping=threadAffinityMapping,
-                                ci=args.ci))
+            test = functools.partial(
+                testProblem,
+                resultsDirectory=args.results_directory,
+                rootDirectory=rootDirectory,
+                threadAffinityMapping=threadAffinityMapping,
+                ci=args.ci,
+                containerMemory=args.container_memory,
+                admissionController=admissionController)
+            scope = scopes.get(p.path, FULL_SCOPE)
+            if not canNarrow or scope == FULL_SCOPE:
+                futures[executor.submit(test, p)] = p
+                continue
+
+            testsConfig = loadTestsConfig(p, rootDirectory=rootDirectory)
+            target = problemView(p,
+                                 scope,
+                                 testsConfig,
+                                 rootDirectory=rootDirectory,
+                                 viewDirectory=os.path.join(
+                                     args.results_directory, 'views',
+                                     p.path))
+            logging.info('%-30s: Testing only %s', p.title,
+                         ', '.join(sorted(scope.cases or scope.solutions
+                                          or ())))
+            shutil.rmtree(os.path.join(args.results_directory, target.path),
+                          ignore_errors=True)
+            if scope.cases is None:
+                futures[executor.submit(test, target)] = p
+                continue
+            futures[executor.submit(
+                _testCaseSubset,
+                p,
+                target,
+                testsConfig,
+                history.caseResults(history.historyPath(args, rootDirectory),
+                                    baselineRuns[p.path].id, p.path),
+                test=test,
+                resultsDirectory=args.results_directory)] = p
 
     # Once the results are gathered, display the results all at once. This
     # limits the interleaving to make the output less confusing.
+    results: List[TestResult] = []
+    partialProblems = set()
+    failures = {}
     for future in concurrent.futures.as_completed(futures):
+        p = futures[future]
         futureResult = future.result()
         if futureResult is None:
             anyFailure = True
+            failures[p.path] = None
             continue
 
-        p, report = futureResult
-
-        problemResultsDirectory = os.path.join(args.results_directory, p.path)
+        target, report = futureResult
+        results.append((p, report))
+        if target is not p:
+            partialProblems.add(p.path)
 
-        if report['state'] != 'passed':
+        passed = reportTestResult(target,
+                                  report,
+                                  resultsDirectory=args.results_directory,
+                                  rootDirectory=rootDirectory,
+                                  ci=args.ci)
+        if not passed:
+            failures[p.path] = _failedTests(report)
+        if not headroom.reportHeadroom(
+                target,
+                report,
+                resultsDirectory=args.results_directory,
+                warningMargin=args.headroom_warning_margin,
+                failureMargin=args.headroom_failure_margin,
+                ci=args.ci):
+            passed = False
+            failures.setdefault(p.path, None)
+        if not passed:
             anyFailure = True
 
-        if report['state'] in ['error', 'skipped']:
-            errorString = report.get('error',
-                                     'tests/tests.json, settings.json, outs, '
-                                     'or testplan are probably missing '
-                                     'or invalid.')
-            problems.error(f'{report["state"]} {p.title}: {errorString}',
-                           filename=os.path.join(p.path, 'settings.json'),
-                           ci=args.ci)
-            if report['state'] == 'skipped':
-                continue
-
-        foundInvalidInputs = False
-
-        for testResult in report.get('tests', []):
-            if testResult['type'] == 'solutions':
-                testedFile = os.path.normpath(
-                    os.path.join(p.path, 'tests', testResult['filename']))
-
-                expected = dict(testResult['solution'])
-                del (expected['filename'])
-                if not expected:
-                    # If there are no constraints, by default expect the run to
-                    # be accepted.
-                    expected['verdict'] = 'AC'
-            elif testResult['type'] == 'invalid-inputs':
-                testedFile = os.path.normpath(
-                    os.path.join(p.path,
-                                 'tests',
-                                 'invalid-inputs',
-                                 testResult['filename']))
-                expected = {'verdict': 'WA'}
-                foundInvalidInputs = True
-            else:
-                testedFile = os.path.normpath(
-                    os.path.join(p.path,
-                                 'cases',
-                                 testResult['filename']))
-                expected = {'verdict': 'AC'}
-
-            logsDirectory = os.path.join(problemResultsDirectory,
-                                         str(testResult['index']))
-
-            if os.path.isdir(os.path.join(logsDirectory, 'validator')):
-                logsDirectory = os.path.join(logsDirectory, 'validator')
-
-            got = {
-                'verdict': testResult.get('result', {}).get('verdict', 'JE'),
-                'score': testResult.get('result', {}).get('score', 0),
-            }
-
-            logging.info(
-                f'    {testResult["type"][:10]:10} | '
-                f'{testResult["filename"][:40]:40} | '
-                f'{testResult["state"]:8} | '
-                f'expected={expected} got={got} | '
-                f'logs at {os.path.relpath(logsDirectory, rootDirectory)}')
-
-            failureMessages: DefaultDict[
-                str, List[str]] = collections.defaultdict(list)
-
-            normalizedScore = decimal.Decimal(got['score'])
-            scaledScore = round(normalizedScore, 15) * 100
-
-            if testResult['state'] == 'error':
-                failureMessages[testedFile].append(testResult['error'])
-            elif testResult['state'] != 'passed':
-                # Build a table that reports groups and case verdicts.
-                groupReportTable = [
-                    f'{"group":20} | {"case":20} | {"score":7} | {"verdict"}',
-                    f'{"-"*20}-+-{"-"*20}-+-{"-"*7}-+-{"-"*7}',
-                ]
-                if 'compile_error' in testResult['result']:
-                    failureMessage = f"{testedFile}:\n" + textwrap.indent(
-                        testResult['result']['compile_error'], '    ')
-                    failureMessages[testedFile].append(failureMessage)
-                if testResult['result']['groups'] is not None:
-                    for group in testResult['result']['groups']:
-                        groupReportTable.append(
-                            f'{group["group"][:20]:20} | {"":20} | '
-                            f'{group["score"]*100:6.2f}% |')
-                        for c in group['cases']:
-                            groupReportTable.append(
-                                f'{"":20} | {c["name"][:20]:20} | '
-                                f'{c["score"]*100:6.2f}% | {c["verdict"]:3}')
-                        groupReportTable.append(
-                            f'{"-"*20}-+-{"-"*20}-+-{"-"*7}-+-{"-"*7}')
-
-                    failureMessages[testedFile].append(
-                        '\n'.join(groupReportTable))
+    writeFailures(failures, rootDirectory=rootDirectory)
 
-                    failedCases = {
-                        c['name']
-                        for g in testResult['result']['groups']
-                        for c in g['cases']
-                        if c['verdict'] != expected['verdict']
-                    }
-                else:
-                    failedCases = set()
-
-                if os.path.isdir(logsDirectory):
-                    for stderrFilename in sorted(os.listdir(logsDirectory)):
-                        caseName = os.path.splitext(stderrFilename)[0]
-
-                        if not stderrFilename.endswith('.err'):
-                            continue
-                        if caseName not in failedCases:
-                            continue
-
-                        expectedFailure = None
-
-                        if testResult['type'] == 'solutions':
-                            associatedFile = testedFile
-                        elif testResult['type'] == 'inputs':
-                            associatedFile = os.path.join(
-                                p.path, 'cases', f'{caseName}.in')
-                        elif testResult['type'] == 'invalid-inputs':
-                            caseLocation = os.path.join(
-                                p.path, 'tests', 'invalid-cases')
-                            associatedFile = os.path.join(
-                                caseLocation, f'{caseName}.in')
-                            expectedFailurePath = os.path.join(
-                                caseLocation, f'{caseName}.expected-failure')
-                            if not os.path.isfile(expectedFailurePath):
-                                logging.error('Missing file: ' +
-                                              f'{expectedFailurePath}')
-                            else:
-                                with open(expectedFailurePath, 'r') as err:
-                                    expectedFailure = err.read().strip()
-                        else:
-                            logging.error('Unexpected test result type: '
-                                          f'{testResult["type"]}')
-
-                        with open(os.path.join(logsDirectory, stderrFilename),
-                                  'r') as out:
-                            contents = out.read().strip()
-
-                            if contents.startswith(_SANDBOX_DISABLED_WARNING):
-                                contents = contents[
-                                    len(_SANDBOX_DISABLED_WARNING):].strip()
-
-                            if not contents:
-                                continue
-
-                            failureMessage = (
-                                f'{stderrFilename}:\n'
-                                f'{textwrap.indent(contents, "    ")}')
-
-                            if expectedFailure:
-                                formattedFailure = textwrap.indent(
-                                    expectedFailure, "    ")
-
-                                failureMessage = (
-                                    'Expected the following string in '
-                                    'stderr:\n'
-                                    f'{formattedFailure}\n\n'
-                                    f'{failureMessage}')
-
-                            failureMessages[associatedFile].append(
-                                failureMessage)
-                else:
-                    logging.warning('Logs directory %r not found.',
-                                    logsDirectory)
-
-            for (path, messages) in failureMessages.items():
-                problems.error(
-                    (f'Validation failed for problem: {p.title}\n'
-                     f'Related file: {path}\n') + '\n'.join(messages),
-                    filename=path,
-                    ci=args.ci)
-
-        if not foundInvalidInputs:
-            problems.warning(f'Missing invalid inputs for problem: {p.title}',
-                             ci=args.ci)
-
-        logging.info(f'Results for {p.title}: {report["state"]}')
-        logging.info(f'    Full logs and report in {problemResultsDirectory}')
+    if not args.no_history and results:
+        # The results directory is cleared on every run, so the history is
+        # kept elsewhere.
+        try:
+            history.recordRun(history.historyPath(args, rootDirectory),
+                              results,
+                              commit=repository.currentCommit(),
+                              image=container.imageName(args.ci),
+                              partialProblems=partialProblems)
+        except sqlite3.Error:
+            logging.exception('Failed to record the results history')
 
     if anyFailure:
         logging.info('')
@@ -0,0 +1,182 @@
+import json
+import os
+import unittest
+
+from typing import Any, Dict, List, Mapping
+
+import history
+import problems
+import runtests
+import testutil
+
+_TESTS_CONFIG = {
+    'solutions': [{
+        'filename': 'solutions/ac.cpp',
+    }, {
+        'filename': 'solutions/tle.cpp',
+        'verdict': 'TLE',
+    }],
+}
+
+
+def _solutionResult(filename: str, state: str,
+                    verdicts: Mapping[str, str]) -> Dict[str, Any]:
+    return {
+        'type': 'solutions',
+        'filename': filename,
+        'state': state,
+        'result': {
+            'groups': [{
+                'group': name.split('.')[0],
+                'cases': [{
+                    'name': name,
+                    'verdict': verdict,
+                    'score': 1.0 if verdict == 'AC' else 0.0,
+                }],
+            } for name, verdict in verdicts.items()],
+        },
+    }
+
+
+class IncrementalScopeTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.rootDirectory = self.tempDirectory
+
+    def _problem(self, path: str, caseNames: List[str],
+                 config: Mapping[str, Any]) -> problems.Problem:
+        for name in caseNames:
+            for extension in ('.in', '.out'):
+                self.writeFile(os.path.join(path, 'cases', name + extension),
+                               '1\n')
+        self.writeFile(os.path.join(path, 'settings.json'),
+                       json.dumps(dict(config, title=path)))
+        self.writeFile(os.path.join(path, 'tests', 'tests.json'),
+                       json.dumps(_TESTS_CONFIG))
+        return problems.Problem.load(path, self.rootDirectory)
+
+    def _scope(self, p: problems.Problem,
+               changedFiles: List[str]) -> runtests.ProblemScope:
+        return runtests._incrementalScope(p,
+                                          changedFiles,
+                                          rootDirectory=self.rootDirectory)
+
+    def test_implicitGroups(self) -> None:
+        p = self._problem('p/sumas', ['easy.1', 'easy.2', 'hard.1', 'single'],
+                          {})
+        self.assertEqual(
+            self._scope(p, ['cases/easy.2.in']),
+            runtests.ProblemScope(cases=frozenset({'easy.1', 'easy.2'}),
+                                  solutions=None))
+        self.assertEqual(
+            self._scope(p, ['cases/single.out', 'cases/hard.1.in']),
+            runtests.ProblemScope(cases=frozenset({'single', 'hard.1'}),
+                                  solutions=None))
+
+    def test_explicitGroups(self) -> None:
+        p = self._problem(
+            'p/sumas', ['a', 'b', 'c'], {
+                'cases': [{
+                    'name': 'first',
+                    'cases': [{
+                        'name': 'a',
+                        'weight': 0.5
+                    }, {
+                        'name': 'c',
+                        'weight': 0.5
+                    }],
+                }, {
+                    'name': 'second',
+                    'cases': [{
+                        'name': 'b',
+                        'weight': 1
+                    }],
+                }],
+            })
+        self.assertEqual(
+            self._scope(p, ['cases/c.in']),
+            runtests.ProblemScope(cases=frozenset({'a', 'c'}),
+                                  solutions=None))
+
+    def test_fullScope(self) -> None:
+        p = self._problem('p/sumas', ['easy.1', 'easy.2'], {})
+        # Removed cases change the weights of the rest.
+        self.assertEqual(self._scope(p, ['cases/easy.3.in']),
+                         runtests.FULL_SCOPE)
+        self.assertEqual(
+            self._scope(p, ['cases/easy.1.in', 'tests/solutions/ac.cpp']),
+            runtests.FULL_SCOPE)
+        self.assertEqual(self._scope(p, ['settings.json']),
+                         runtests.FULL_SCOPE)
+        self.assertEqual(self._scope(p, ['statements/es.markdown']),
+                         runtests.FULL_SCOPE)
+
+    def test_solutions(self) -> None:
+        p = self._problem('p/sumas', ['easy.1'], {})
+        self.assertEqual(
+            self._scope(p, ['tests/solutions/tle.cpp']),
+            runtests.ProblemScope(cases=None,
+                                  solutions=frozenset({'solutions/tle.cpp'
+                                                       })))
+
+
+class JudgeWithBaselineTest(unittest.TestCase):
+    baseline: history.CaseResults = {
+        ('solutions/ac.cpp', 'easy.1'): ('AC', 1.0),
+        ('solutions/ac.cpp', 'easy.2'): ('AC', 1.0),
+        ('solutions/tle.cpp', 'easy.1'): ('AC', 1.0),
+        ('solutions/tle.cpp', 'easy.2'): ('TLE', 0.0),
+    }
+
+    def test_sameResults(self) -> None:
+        report = {
+            'state':
+            'failed',
+            'tests': [
+                _solutionResult('solutions/ac.cpp', 'passed',
+                                {'easy.2': 'AC'}),
+                # Only TLE in every case would pass on its own.
+                _solutionResult('solutions/tle.cpp', 'failed',
+                                {'easy.1': 'AC'}),
+            ],
+        }
+        judged = runtests._judgeWithBaseline(report, _TESTS_CONFIG,
+                                             self.baseline)
+        assert judged is not None
+        self.assertEqual(judged['state'], 'passed')
+        self.assertEqual([test['state'] for test in judged['tests']],
+                         ['passed', 'passed'])
+        self.assertEqual(report['state'], 'failed')
+
+    def test_acceptedSolutionFailed(self) -> None:
+        report = {
+            'state':
+            'failed',
+            'tests': [
+                _solutionResult('solutions/ac.cpp', 'failed',
+                                {'easy.2': 'WA'}),
+                _solutionResult('solutions/tle.cpp', 'passed',
+                                {'easy.2': 'TLE'}),
+            ],
+        }
+        judged = runtests._judgeWithBaseline(report, _TESTS_CONFIG,
+                                             self.baseline)
+        assert judged is not None
+        self.assertEqual(judged['state'], 'failed')
+
+    def test_differentResults(self) -> None:
+        for verdicts in ({'easy.2': 'AC'}, {'easy.3': 'TLE'}, {}):
+            report = {
+                'state':
+                'passed',
+                'tests': [
+                    _solutionResult('solutions/tle.cpp', 'passed', verdicts),
+                ],
+            }
+            self.assertIsNone(
+                runtests._judgeWithBaseline(report, _TESTS_CONFIG,
+                                            self.baseline), verdicts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,388 @@
+import functools
+import logging
+import os
+import re
+import time
+
+from typing import (Any, Callable, List, Mapping, NamedTuple, Optional,
+                    Sequence, Tuple, Type, Union)
+
+import yaml
+
+import configindex
+import contests
+import problems
+
+# The location of a value within a config, as a list of keys and indices.
+_Path = Tuple[Union[str, int], ...]
+_Location = Callable[[], _Path]
+_Error = Tuple[_Path, str]
+_Validator = Callable[[Any, _Location, List[_Error]], None]
+
+
+class _Leaf(NamedTuple):
+    """The checks of a schema that only constrains the type of a value."""
+    types: Tuple[Type[Any], ...]
+    rejectBool: bool
+    expectedType: str
+    minimum: Optional[float]
+
+
+_TYPES: Mapping[str, Tuple[Type[Any], ...]] = {
+    'array': (list, ),
+    'boolean': (bool, ),
+    'integer': (int, ),
+    'null': (type(None), ),
+    'number': (int, float),
+    'object': (dict, ),
+    'string': (str, ),
+}
+
+
+_STRING_ARRAY = {'type': 'array', 'items': {'type': 'string'}}
+_DURATION = {'type': ['number', 'string']}
+_SIZE = {'type': 'integer', 'minimum': 0}
+
+# A subset of JSON Schema that covers every field that the deploy scripts
+# read from a problem's settings.json without a default.
+PROBLEM_SCHEMA: Mapping[str, Any] = {
+    'type': 'object',
+    'required': ['title', 'source', 'limits', 'validator', 'misc'],
+    'properties': {
+        'title': {'type': 'string'},
+        'source': {'type': 'string'},
+        'limits': {
+            'type': 'object',
+            'required': [
+                'TimeLimit', 'MemoryLimit', 'InputLimit', 'OutputLimit',
+                'ExtraWallTime', 'OverallWallTimeLimit'
+            ],
+            'properties': {
+                'TimeLimit': _DURATION,
+                'MemoryLimit': _SIZE,
+                'InputLimit': _SIZE,
+                'OutputLimit': _SIZE,
+                'ExtraWallTime': _DURATION,
+                'OverallWallTimeLimit': _DURATION,
+            },
+        },
+        'validator': {
+            'type': 'object',
+            'required': ['name', 'limits'],
+            'properties': {
+                'name': {
+                    'enum': [
+                        'custom', 'literal', 'token', 'token-caseless',
+                        'token-numeric'
+                    ]
+                },
+                'limits': {
+                    'type': 'object',
+                    'required': ['TimeLimit'],
+                    'properties': {
+                        'TimeLimit': _DURATION
+                    },
+                },
+            },
+        },
+        'misc': {
+            'type': 'object',
+            'required':
+            ['alias', 'visibility', 'languages', 'email_clarifications'],
+            'properties': {
+                'alias': {'type': 'string', 'pattern': r'^[a-zA-Z0-9_-]+$'},
+                'visibility': {'type': ['integer', 'string']},
+                'languages': {'type': 'string'},
+                'email_clarifications': {'type': ['boolean', 'integer']},
+                'group_score_policy': {'type': 'string'},
+            },
+        },
+        'cases': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['name', 'cases'],
+                'properties': {
+                    'name': {'type': 'string'},
+                    'cases': {
+                        'type': 'array',
+                        'items': {
+                            'type': 'object',
+                            'required': ['name', 'weight'],
+                            'properties': {
+                                'name': {'type': 'string'},
+                                'weight': {'type': 'number', 'minimum': 0},
+                            },
+                        },
+                    },
+                },
+            },
+        },
+        'dependencies': _STRING_ARRAY,
+    },
+}
+
+_TIMESTAMP = {
+    'type': 'string',
+    'pattern': r'^\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ$',
+}
+
+# The same, for a contest's contest.yaml.
+CONTEST_SCHEMA: Mapping[str, Any] = {
+    'type': 'object',
+    'required': ['alias', 'title', 'start_time', 'finish_time', 'misc'],
+    'properties': {
+        'alias': {'type': 'string', 'pattern': r'^[a-zA-Z0-9_-]+$'},
+        'title': {'type': 'string'},
+        'description': {'type': 'string'},
+        'start_time': _TIMESTAMP,
+        'finish_time': _TIMESTAMP,
+        'window_length': {'type': ['integer', 'null']},
+        'misc': {
+            'type': 'object',
+            'required': [
+                'admission_mode', 'feedback', 'languages', 'penalty',
+                'requests_user_information', 'score_mode', 'scoreboard',
+                'show_scoreboard_after', 'submissions_gap'
+            ],
+            'properties': {
+                'languages': {'type': 'string'},
+                'penalty': {
+                    'type': 'object',
+                    'required':
+                    ['time', 'calc_policy', 'type', 'points_decay_factor'],
+                },
+                'scoreboard': {'type': 'number'},
+                'submissions_gap': {'type': 'integer', 'minimum': 0},
+            },
+        },
+        'admins': {
+            'type': 'object',
+            'properties': {
+                'users': _STRING_ARRAY,
+                'groups': _STRING_ARRAY,
+            },
+        },
+        'problems': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'required': ['alias'],
+                'properties': {
+                    'alias': {'type': 'string'},
+                    'points': {'type': 'number', 'minimum': 0},
+                    'order_in_contest': {'type': 'integer'},
+                },
+            },
+        },
+        'contestants': {
+            'type': 'object',
+            'properties': {
+                'users': _STRING_ARRAY,
+                'groups': _STRING_ARRAY,
+                'file': {'type': 'string'},
+                'header': {'type': 'boolean'},
+            },
+        },
+    },
+}
+
+
+_LEAF_KEYWORDS = {'type', 'minimum'}
+
+
+def _leaf(schema: Mapping[str, Any]) -> Optional[_Leaf]:
+    """Returns the inlined checks of a schema, if it has no nested values."""
+    if set(schema) - _LEAF_KEYWORDS or 'type' not in schema:
+        return None
+    typeNames = schema['type']
+    if isinstance(typeNames, str):
+        typeNames = [typeNames]
+    return _Leaf(
+        types=tuple(t for typeName in typeNames for t in _TYPES[typeName]),
+        # bool is a subclass of int, but true is not a number.
+        rejectBool='boolean' not in typeNames,
+        expectedType=' or '.join(typeNames),
+        minimum=schema.get('minimum'))
+
+
+def _matches(leaf: _Leaf, value: Any) -> bool:
+    return isinstance(value, leaf.types) and (
+        not leaf.rejectBool or value.__class__ is not bool) and (
+            leaf.minimum is None or value >= leaf.minimum)
+
+
+def _checkLeaf(leaf: _Leaf, value: Any, location: _Location,
+               errors: List[_Error]) -> None:
+    if not isinstance(value, leaf.types) or (leaf.rejectBool
+                                             and value.__class__ is bool):
+        errors.append(
+            (location(), f'expected {leaf.expectedType}, got {value!r}'))
+    elif leaf.minimum is not None and value < leaf.minimum:
+        errors.append(
+            (location(), f'expected at least {leaf.minimum}, got {value!r}'))
+
+
+def _compile(schema: Mapping[str, Any]) -> _Validator:
+    """Compiles a schema into a function that appends its errors to a list.
+
+    Every keyword is resolved here, once, so that validating a config only
+    runs the checks that apply to each value. Fields that only have a type
+    are checked inline, and the location of a value is only computed when
+    it has an error.
+    """
+    leaf = _leaf({k: v for k, v in schema.items() if k in _LEAF_KEYWORDS})
+    choices = list(schema['enum']) if 'enum' in schema else None
+    pattern = re.compile(schema['pattern']) if 'pattern' in schema else None
+    required = list(schema.get('required', []))
+    properties = [(name, _leaf(propertySchema), _compile(propertySchema))
+                  for name, propertySchema in schema.get('properties',
+                                                         {}).items()]
+    itemSchema = schema.get('items')
+    itemLeaf = _leaf(itemSchema) if itemSchema is not None else None
+    checkItem = _compile(itemSchema) if itemSchema is not None else None
+
+    def _check(value: Any, location: _Location, errors: List[_Error]) -> None:
+        if leaf is not None and not _matches(leaf, value):
+            _checkLeaf(leaf, value, location, errors)
+            return
+        if choices is not None and value not in choices:
+            errors.append(
+                (location(), f'expected one of {choices}, got {value!r}'))
+        if pattern is not None and isinstance(
+                value, str) and not pattern.search(value):
+            errors.append(
+                (location(),
+                 f'expected to match {pattern.pattern}, got {value!r}'))
+        if isinstance(value, dict):
+            for name in required:
+                if name not in value:
+                    errors.append(
+                        (location(), f'missing required field {name!r}'))
+            for name, propertyLeaf, checkProperty in properties:
+                if name not in value:
+                    continue
+                propertyValue = value[name]
+                if propertyLeaf is not None and _matches(
+                        propertyLeaf, propertyValue):
+                    continue
+                checkProperty(propertyValue,
+                              functools.partial(_child, location, name),
+                              errors)
+        elif checkItem is not None and isinstance(value, list):
+            for i, item in enumerate(value):
+                if itemLeaf is not None and _matches(itemLeaf, item):
+                    continue
+                checkItem(item, functools.partial(_child, location, i),
+                          errors)
+
+    return _check
+
+
+def _root() -> _Path:
+    return ()
+
+
+def _child(parent: _Location, component: Union[str, int]) -> _Path:
+    return parent() + (component, )
+
+
+_validateProblem = _compile(PROBLEM_SCHEMA)
+_validateContest = _compile(CONTEST_SCHEMA)
+
+
+def _compose(path: str) -> Optional[yaml.Node]:
+    """Parses a .json or .yaml file, keeping the position of every value.
+
+    This is only used to report errors, so it is done lazily.
+    """
+    try:
+        with open(path, 'r') as f:
+            node: Optional[yaml.Node] = yaml.compose(
+                f, Loader=configindex.YamlLoader)
+            return node
+    except yaml.YAMLError:
+        return None
+
+
+def _line(node: Optional[yaml.Node], location: _Path) -> Optional[int]:
+    """Returns the line of the value at `location`, or of its parent."""
+    if node is None:
+        return None
+    for component in location:
+        child: Optional[yaml.Node] = None
+        if isinstance(node, yaml.MappingNode):
+            for key, value in node.value:
+                if key.value == component:
+                    child = value
+                    break
+        elif isinstance(node, yaml.SequenceNode) and isinstance(
+                component, int) and component < len(node.value):
+            child = node.value[component]
+        if child is None:
+            break
+        node = child
+    line: int = node.start_mark.line + 1
+    return line
+
+
+def _formatLocation(location: _Path) -> str:
+    if not location:
+        return '(root)'
+    return ''.join(f'[{component}]' if isinstance(component, int) else
+                   f'.{component}' for component in location).lstrip('.')
+
+
+def _report(validate: _Validator, configPath: str, config: Any, *,
+            rootDirectory: str, ci: bool) -> bool:
+    errors: List[_Error] = []
+    validate(config, _root, errors)
+    if not errors:
+        return True
+    relativePath = os.path.relpath(configPath, rootDirectory)
+    node = _compose(configPath)
+    for location, message in errors:
+        problems.error(
+            f'{relativePath}: {_formatLocation(location)}: {message}',
+            filename=relativePath,
+            line=_line(node, location),
+            ci=ci)
+    return False
+
+
+def validate(*,
+             problemList: Sequence[problems.Problem] = (),
+             contestList: Sequence[contests.Contest] = (),
+             rootDirectory: str,
+             ci: bool) -> bool:
+    """Validates the configs of the problems and contests.
+
+    All the errors are reported. Returns whether all the configs are valid.
+    """
+    start = time.monotonic()
+    index = configindex.configIndex(rootDirectory)
+    configs: List[Tuple[_Validator, str]] = [
+        (_validateProblem,
+         os.path.join(rootDirectory, p.path, 'settings.json'))
+        for p in problemList
+    ] + [(_validateContest,
+          os.path.join(rootDirectory, c.path, contests.CONFIG_FILE))
+         for c in contestList]
+    # The configs come from the config index, which parsed them when the
+    # problems and contests were loaded. The checks themselves run in this
+    # thread: they are pure Python, so threads would not speed them up, and
+    # sending the configs to worker processes costs about as much as checking
+    # them.
+    parsedConfigs = index.loadAll([path for _, path in configs])
+
+    valid = True
+    for (validator, path), config in zip(configs, parsedConfigs):
+        if not _report(validator,
+                       path,
+                       config,
+                       rootDirectory=rootDirectory,
+                       ci=ci):
+            valid = False
+    logging.info('Validated %d configs in %.2fs', len(configs),
+                 time.monotonic() - start)
+    return valid
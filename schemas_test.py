@@ -0,0 +1,160 @@
+import copy
+import json
+import unittest
+import unittest.mock
+
+from typing import Any, Dict, List, Tuple
+
+import contests
+import problems
+import schemas
+import testutil
+
+_PROBLEM_CONFIG: Dict[str, Any] = {
+    'title': 'Sumas',
+    'source': 'omegaUp',
+    'limits': {
+        'TimeLimit': '1s',
+        'MemoryLimit': 33554432,
+        'InputLimit': 10240,
+        'OutputLimit': 10240,
+        'ExtraWallTime': 0,
+        'OverallWallTimeLimit': 60000,
+    },
+    'validator': {
+        'name': 'token',
+        'limits': {
+            'TimeLimit': 1000
+        },
+    },
+    'misc': {
+        'alias': 'sumas',
+        'visibility': 'public',
+        'languages': 'all',
+        'email_clarifications': False,
+    },
+    'cases': [{
+        'name': 'easy',
+        'cases': [{
+            'name': 'easy.1',
+            'weight': 0.5
+        }, {
+            'name': 'easy.2',
+            'weight': 0.5
+        }],
+    }],
+}
+
+_CONTEST_YAML = '''\
+alias: contest
+title: Contest
+start_time: '2026-01-01T00:00:00Z'
+finish_time: '2026-01-01T05:00:00Z'
+misc:
+  admission_mode: private
+  feedback: detailed
+  languages: all
+  penalty:
+    time: 0
+    calc_policy: sum
+    type: none
+    points_decay_factor: 0
+  requests_user_information: 'no'
+  score_mode: partial
+  scoreboard: 100
+  show_scoreboard_after: true
+  submissions_gap: -1
+problems:
+  - alias: sumas
+    points: 100
+  - points: 100
+'''
+
+
+def _errors(validator: schemas._Validator,
+            config: Any) -> List[Tuple[str, str]]:
+    errors: List[schemas._Error] = []
+    validator(config, schemas._root, errors)
+    return [(schemas._formatLocation(location), message)
+            for location, message in errors]
+
+
+class ProblemSchemaTest(unittest.TestCase):
+    def test_valid(self) -> None:
+        self.assertEqual(_errors(schemas._validateProblem, _PROBLEM_CONFIG),
+                         [])
+
+    def test_errors(self) -> None:
+        config = copy.deepcopy(_PROBLEM_CONFIG)
+        del config['source']
+        config['limits']['MemoryLimit'] = True
+        config['limits']['InputLimit'] = -1
+        config['validator']['name'] = 'tokens'
+        config['misc']['alias'] = 'sumas y restas'
+        config['cases'][0]['cases'][1]['weight'] = '1'
+        config['dependencies'] = ['lib', 1]
+        self.assertEqual(
+            _errors(schemas._validateProblem, config), [
+                ('(root)', "missing required field 'source'"),
+                ('limits.MemoryLimit', 'expected integer, got True'),
+                ('limits.InputLimit', 'expected at least 0, got -1'),
+                ('validator.name',
+                 "expected one of ['custom', 'literal', 'token', "
+                 "'token-caseless', 'token-numeric'], got 'tokens'"),
+                ('misc.alias', 'expected to match ^[a-zA-Z0-9_-]+$, got '
+                 "'sumas y restas'"),
+                ('cases[0].cases[1].weight', "expected number, got '1'"),
+                ('dependencies[1]', 'expected string, got 1'),
+            ])
+
+    def test_wrongType(self) -> None:
+        self.assertEqual(_errors(schemas._validateProblem, []),
+                         [('(root)', 'expected object, got []')])
+
+
+class ValidateTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.rootDirectory = self.tempDirectory
+
+    def test_validate(self) -> None:
+        self.writeFile('problems/sumas/settings.json',
+                       json.dumps(_PROBLEM_CONFIG, indent=2))
+        self.writeFile('contests/contest/contest.yaml', _CONTEST_YAML)
+        problemList = [
+            problems.Problem.load('problems/sumas', self.rootDirectory)
+        ]
+        contestList = [
+            contests.Contest(path='contests/contest',
+                             title='Contest',
+                             config={})
+        ]
+
+        self.assertTrue(
+            schemas.validate(problemList=problemList,
+                             rootDirectory=self.rootDirectory,
+                             ci=True))
+        with unittest.mock.patch.object(problems, 'error') as error:
+            self.assertFalse(
+                schemas.validate(problemList=problemList,
+                                 contestList=contestList,
+                                 rootDirectory=self.rootDirectory,
+                                 ci=True))
+        self.assertEqual(error.call_args_list, [
+            unittest.mock.call(
+                'contests/contest/contest.yaml: misc.submissions_gap: '
+                'expected at least 0, got -1',
+                filename='contests/contest/contest.yaml',
+                line=18,
+                ci=True),
+            unittest.mock.call(
+                "contests/contest/contest.yaml: problems[1]: missing "
+                "required field 'alias'",
+                filename='contests/contest/contest.yaml',
+                line=22,
+                ci=True),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import tempfile
+import unittest
+
+from typing import Optional, Union
+
+
+class TempDirectoryTestCase(unittest.TestCase):
+    """A test case that gets a new temporary directory for every test.
+
+    The directory is in `self.tempDirectory`, and it is removed once the test
+    finishes.
+    """
+    def setUp(self) -> None:
+        super().setUp()
+        tempDirectory = tempfile.TemporaryDirectory()
+        self.addCleanup(tempDirectory.cleanup)
+        self.tempDirectory = tempDirectory.name
+
+    def writeFile(self,
+                  path: str,
+                  contents: Union[str, bytes],
+                  mode: Optional[int] = None) -> str:
+        """Writes a file and its parent directories, and returns its path.
+
+        Relative paths are relative to the temporary directory.
+        """
+        path = os.path.join(self.tempDirectory, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(contents.encode('utf-8') if isinstance(contents, str) else
+                    contents)
+        if mode is not None:
+            os.chmod(path, mode)
+        return path
@@ -0,0 +1,143 @@
+import functools
+import glob
+import logging
+import os
+import re
+
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional, Set
+
+_SYSFS_CPU_DIRECTORY = '/sys/devices/system/cpu'
+_SYSFS_NODE_DIRECTORY = '/sys/devices/system/node'
+
+
+class Cpu(NamedTuple):
+    """A logical CPU, and where it is in the machine."""
+    id: int
+    # The lowest logical CPU that shares the same physical core.
+    core: int
+    package: int
+    node: Optional[int]
+
+    def placement(self) -> Dict[str, Any]:
+        """Returns the placement of the CPU, to be recorded with a run."""
+        return {
+            'cpu': self.id,
+            'core': self.core,
+            'package': self.package,
+            'node': self.node,
+        }
+
+
+def _parseCpuList(contents: str) -> Set[int]:
+    """Parses a list of CPUs in the kernel's format, like `0-3,8-11`."""
+    cpus: Set[int] = set()
+    for part in contents.strip().split(','):
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        cpus.update(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+def _readFile(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def cpus() -> Dict[int, Cpu]:
+    """Returns the logical CPUs that this process is allowed to run on.
+
+    The topology is read from sysfs. When it is not available, every CPU is
+    considered its own physical core, with no NUMA node.
+    """
+    try:
+        allowed = os.sched_getaffinity(0)
+    except AttributeError:
+        # os.sched_getaffinity() is not available in all OSs. Since we don't
+        # want to speculate how many cores there are, let's be paranoid and
+        # use a single one.
+        allowed = {0}
+
+    nodes: Dict[int, int] = {}
+    for nodePath in glob.glob(os.path.join(_SYSFS_NODE_DIRECTORY, 'node*')):
+        match = re.fullmatch(r'node(\d+)', os.path.basename(nodePath))
+        contents = _readFile(os.path.join(nodePath, 'cpulist'))
+        if match is None or contents is None:
+            continue
+        for cpu in _parseCpuList(contents):
+            nodes[cpu] = int(match.group(1))
+
+    result: Dict[int, Cpu] = {}
+    for cpu in sorted(allowed):
+        topologyDirectory = os.path.join(_SYSFS_CPU_DIRECTORY, f'cpu{cpu}',
+                                         'topology')
+        siblings: FrozenSet[int] = frozenset({cpu})
+        contents = _readFile(
+            os.path.join(topologyDirectory, 'thread_siblings_list'))
+        if contents is not None:
+            siblings = frozenset(_parseCpuList(contents) | {cpu})
+        package = _readFile(
+            os.path.join(topologyDirectory, 'physical_package_id'))
+        result[cpu] = Cpu(id=cpu,
+                          core=min(siblings),
+                          package=int(package) if package else 0,
+                          node=nodes.get(cpu))
+    return result
+
+
+def physicalCoreCount() -> int:
+    """Returns the number of physical cores this process can run on."""
+    return len({cpu.core for cpu in cpus().values()})
+
+
+def allocate(count: int) -> List[Cpu]:
+    """Chooses `count` CPUs to run that many workers, one on each.
+
+    Workers get their own physical core before any of them shares one with a
+    hyperthread sibling, and they fill the NUMA node with the most cores
+    first, so that they stay on as few nodes as possible. Fewer than `count`
+    CPUs are returned if the process cannot run on that many.
+    """
+    available = cpus()
+    coresPerNode: Dict[Optional[int], Set[int]] = {}
+    for cpu in available.values():
+        coresPerNode.setdefault(cpu.node, set()).add(cpu.core)
+
+    firstThreads: List[Cpu] = []
+    siblings: List[Cpu] = []
+    seenCores: Set[int] = set()
+    for cpu in sorted(available.values(),
+                      key=lambda cpu: (-len(coresPerNode[cpu.node]),
+                                       -1 if cpu.node is None else cpu.node,
+                                       cpu.core, cpu.id)):
+        if cpu.core in seenCores:
+            siblings.append(cpu)
+        else:
+            seenCores.add(cpu.core)
+            firstThreads.append(cpu)
+
+    allocated = (firstThreads + siblings)[:count]
+    if len(allocated) > len(firstThreads):
+        logging.warning(
+            'Running %d workers on %d physical cores. Workers that share a '
+            'core with a hyperthread sibling will have noisier timings.',
+            len(allocated), len(firstThreads))
+    return allocated
+
+
+def dockerArguments(cpu: Cpu, *, memory: Optional[str] = None) -> List[str]:
+    """Returns the `docker run` flags that confine a container to `cpu`.
+
+    Memory is also allocated from the CPU's NUMA node, and if `memory` is
+    provided, it limits how much the container can use.
+    """
+    args = ['--cpuset-cpus', str(cpu.id)]
+    if cpu.node is not None:
+        args += ['--cpuset-mems', str(cpu.node)]
+    if memory is not None:
+        args += ['--memory', memory, '--memory-swap', memory]
+    return args
@@ -0,0 +1,103 @@
+import os
+import unittest
+import unittest.mock
+
+from typing import List, Mapping, Set
+
+import testutil
+import topology
+
+
+class TopologyTest(testutil.TempDirectoryTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.cpuDirectory = os.path.join(self.tempDirectory, 'cpu')
+        self.nodeDirectory = os.path.join(self.tempDirectory, 'node')
+        for name, value in (('_SYSFS_CPU_DIRECTORY', self.cpuDirectory),
+                            ('_SYSFS_NODE_DIRECTORY', self.nodeDirectory)):
+            patcher = unittest.mock.patch.object(topology, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        topology.cpus.cache_clear()
+        self.addCleanup(topology.cpus.cache_clear)
+
+    def _machine(self, nodes: Mapping[int, str],
+                 siblings: Mapping[int, str]) -> None:
+        """Writes the sysfs of a machine with the given CPUs in each node."""
+        for node, cpuList in nodes.items():
+            self.writeFile(
+                os.path.join(self.nodeDirectory, f'node{node}', 'cpulist'),
+                cpuList)
+        for cpu, siblingList in siblings.items():
+            topologyDirectory = os.path.join(self.cpuDirectory, f'cpu{cpu}',
+                                             'topology')
+            self.writeFile(
+                os.path.join(topologyDirectory, 'thread_siblings_list'),
+                siblingList)
+            self.writeFile(
+                os.path.join(topologyDirectory, 'physical_package_id'),
+                '0\n')
+
+    def _allocate(self, count: int, allowed: Set[int]) -> List[int]:
+        with unittest.mock.patch('os.sched_getaffinity',
+                                 return_value=allowed):
+            return [cpu.id for cpu in topology.allocate(count)]
+
+    def test_parseCpuList(self) -> None:
+        self.assertEqual(topology._parseCpuList('0-3,8,10-11\n'),
+                         {0, 1, 2, 3, 8, 10, 11})
+        self.assertEqual(topology._parseCpuList('\n'), set())
+
+    def test_allocate(self) -> None:
+        # Node 1 has two physical cores, and node 0 only one. CPUs n and
+        # n + 4 are hyperthread siblings.
+        self._machine({
+            0: '0,4\n',
+            1: '1-2,5-6\n',
+        }, {
+            0: '0,4\n',
+            1: '1,5\n',
+            2: '2,6\n',
+            4: '0,4\n',
+            5: '1,5\n',
+            6: '2,6\n',
+        })
+        allowed = {0, 1, 2, 4, 5, 6}
+        self.assertEqual(self._allocate(2, allowed), [1, 2])
+        self.assertEqual(self._allocate(3, allowed), [1, 2, 0])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(self._allocate(4, allowed), [1, 2, 0, 5])
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(self._allocate(10, allowed), [1, 2, 0, 5, 6, 4])
+
+        cpus = topology.cpus()
+        self.assertEqual(cpus[5].core, 1)
+        self.assertEqual(cpus[5].node, 1)
+        self.assertEqual(topology.physicalCoreCount(), 3)
+        self.assertEqual(topology.dockerArguments(cpus[5], memory='1g'), [
+            '--cpuset-cpus', '5', '--cpuset-mems', '1', '--memory', '1g',
+            '--memory-swap', '1g'
+        ])
+
+    def test_affinity(self) -> None:
+        self._machine({0: '0-3\n'}, {
+            0: '0,2\n',
+            1: '1,3\n',
+            2: '0,2\n',
+            3: '1,3\n',
+        })
+        # The sibling of CPU 0 is not available, but it still shares the
+        # core.
+        with self.assertLogs(level='WARNING'):
+            self.assertEqual(self._allocate(4, {1, 2, 3}), [2, 1, 3])
+
+    def test_noSysfs(self) -> None:
+        self.assertEqual(self._allocate(2, {3, 5, 7}), [3, 5])
+        self.assertEqual(topology.cpus()[3],
+                         topology.Cpu(id=3, core=3, package=0, node=None))
+        self.assertEqual(topology.dockerArguments(topology.cpus()[3]),
+                         ['--cpuset-cpus', '3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,19 @@
 #!/usr/bin/python3
 import argparse
 import datetime
+import functools
 import logging
 import os
+import sys
 
 import contests
-import omegaup.api
+import deployclient
+import journal
+import manifest
+import operations
+import problems
 import repository
+import schemas
 
 
 def _main() -> None:
@@ -49,32 +56,120 @@ def _main() -> None:
                         type=int,
                         default=60,
                         help="Timeout for deploy API call (in seconds)")
+    deployclient.addClientArguments(parser)
+    parser.add_argument('--jobs',
+                        type=int,
+                        default=4,
+                        help='Maximum number of contests upserted at a time')
+    parser.add_argument('--contestant-rate-limit',
+                        type=float,
+                        default=20.0,
+                        help=('Maximum number of contestant add/remove calls '
+                              'per second, across all contests'))
+    journal.addJournalArguments(parser)
+    parser.add_argument('--manifest',
+                        type=str,
+                        default=None,
+                        help=('Path of the deploy manifest that records what '
+                              'was last deployed. Defaults to a file in the '
+                              'state directory.'))
+    parser.add_argument('--verify-remote',
+                        action='store_true',
+                        help=('Read and reconcile every part of the contests, '
+                              'even those that the deploy manifest says have '
+                              'not changed. Without it, changes made to the '
+                              'contests outside of this repository are not '
+                              'undone.'))
+    parser.add_argument('--plan',
+                        action='store_true',
+                        help=('Only report which API calls would be made, '
+                              'without changing anything.'))
     parser.add_argument('contest_paths',
                         metavar='PROBLEM',
                         type=str,
                         nargs='*')
+    problems.addAnnotationArguments(parser)
 
     args = parser.parse_args()
+    problems.configureAnnotations(args)
 
     logging.basicConfig(format='%(asctime)s: %(message)s',
                         level=logging.DEBUG if args.verbose else logging.INFO)
     logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
-    client = omegaup.api.Client(username=args.username,
-                                password=args.password,
-                                api_token=args.api_token,
-                                url=args.url)
+    client = deployclient.Client(username=args.username,
+                                 password=args.password,
+                                 api_token=args.api_token,
+                                 url=args.url,
+                                 poolSize=args.api_concurrency)
+    client.dumpMetricsAtExit(args.metrics_file)
 
     rootDirectory = repository.repositoryRoot()
 
-    for contest in contests.contests(allContests=args.all,
-                                     rootDirectory=rootDirectory,
-                                     contestPaths=args.contest_paths):
-        contests.upsertContest(
-            client,
-            os.path.join(rootDirectory, contest.path),
-            canCreate=args.can_create,
-            timeout=datetime.timedelta(seconds=args.timeout))
+    deployManifest = manifest.DeployManifest(
+        args.manifest or os.path.join(repository.stateDirectory(rootDirectory),
+                                      'deploy-manifest.json'),
+        url=args.url)
+
+    contestList = contests.contests(allContests=args.all,
+                                    rootDirectory=rootDirectory,
+                                    contestPaths=args.contest_paths)
+    if not schemas.validate(contestList=contestList,
+                            rootDirectory=rootDirectory,
+                            ci=args.ci):
+        sys.exit(1)
+
+    if args.plan:
+        plans = operations.readConcurrently(
+            {
+                contest.path:
+                functools.partial(contests.planContest,
+                                  client,
+                                  os.path.join(rootDirectory, contest.path),
+                                  canCreate=args.can_create,
+                                  concurrency=args.api_concurrency,
+                                  deployManifest=deployManifest,
+                                  verifyRemote=args.verify_remote)
+                for contest in contestList
+            },
+            concurrency=args.api_concurrency)
+        operations.logPlans(list(plans.values()))
+        return
+
+    deployJournal = journal.DeployJournal(
+        os.path.join(repository.stateDirectory(rootDirectory),
+                     'contests-journal.json'),
+        commit=repository.currentCommit(),
+        url=args.url,
+        resume=args.resume)
+
+    rateLimiter = operations.RateLimiter(args.contestant_rate_limit)
+
+    def _upsert(contest: contests.Contest) -> None:
+        # upsertContest only applies the difference between the desired and
+        # the current state, so it is safe to retry it as a whole.
+        deployJournal.run(
+            f'contest:{contest.config["alias"]}',
+            'upsert',
+            lambda: contests.upsertContest(
+                client,
+                os.path.join(rootDirectory, contest.path),
+                canCreate=args.can_create,
+                timeout=datetime.timedelta(seconds=args.timeout),
+                concurrency=args.api_concurrency,
+                rateLimiter=rateLimiter,
+                deployManifest=deployManifest,
+                verifyRemote=args.verify_remote),
+            default=None,
+            retries=args.retries)
+
+    results = operations.runTasks(
+        {
+            contest.path: functools.partial(_upsert, contest)
+            for contest in contestList
+        },
+        concurrency=args.jobs)
+    operations.exitOnFailure(results)
 
 
 if __name__ == '__main__':
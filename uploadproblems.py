@@ -1,81 +1,37 @@
 #!/usr/bin/python3
 import argparse
 import datetime
-import json
+import functools
 import logging
 import os
-import subprocess
+import sys
 import tempfile
-import zipfile
 
-from typing import Any, Mapping, Set
+from typing import (Any, Callable, Dict, Iterable, List, Mapping, NamedTuple,
+                    Optional, Set, Tuple)
 
+import configindex
+import deployclient
+import journal
+import manifest
 import omegaup.api
+import operations
+import problempackage
 import problems
 import repository
+import schemas
 
 
-def createProblemZip(problemConfig: Mapping[str, Any], problemPath: str,
-                     zipPath: str) -> None:
-    """Creates a problem .zip on the provided path."""
-    with zipfile.ZipFile(zipPath, 'w',
-                         compression=zipfile.ZIP_DEFLATED) as archive:
-
-        def _addFile(f: str) -> None:
-            logging.debug('writing %s', f)
-            archive.write(f, os.path.relpath(f, problemPath))
-
-        def _recursiveAdd(directory: str) -> None:
-            for (root, _,
-                 filenames) in os.walk(os.path.join(problemPath, directory)):
-                for f in filenames:
-                    _addFile(os.path.join(root, f))
-
-        testplan = os.path.join(problemPath, 'testplan')
-
-        if os.path.isfile(testplan):
-            _addFile(testplan)
-
-        if problemConfig['validator']['name'] == 'custom':
-            validators = [
-                x for x in os.listdir(problemPath) if x.startswith('validator')
-            ]
-
-            if not validators:
-                raise Exception('Custom validator missing!')
-            if len(validators) != 1:
-                raise Exception('More than one validator found!')
-
-            validator = os.path.join(problemPath, validators[0])
-
-            _addFile(validator)
-
-        for directory in ('statements', 'solutions', 'cases'):
-            _recursiveAdd(directory)
-
-        for directory in ('examples', 'interactive'):
-            if not os.path.isdir(os.path.join(problemPath, directory)):
-                continue
-            _recursiveAdd(directory)
-
-
-def uploadProblemZip(
-    client: omegaup.api.Client,
-    problemConfig: Mapping[str, Any],
-    canCreate: bool,
-    zipPath: str,
-    commitMessage: str,
-    timeout: datetime.timedelta,
-) -> None:
-    """Uploads a problem with the given .zip and configuration."""
+def problemPayload(problemConfig: Mapping[str, Any],
+                   commitMessage: str) -> Dict[str, Any]:
+    """Returns the payload of the problem create/update API call."""
     misc = problemConfig['misc']
-    alias = misc['alias']
     limits = problemConfig['limits']
     validator = problemConfig['validator']
 
     payload = {
         'message': commitMessage,
-        'problem_alias': alias,
+        'problem_alias': misc['alias'],
         'title': problemConfig['title'],
         'source': problemConfig['source'],
         'visibility': misc['visibility'],
@@ -93,17 +49,6 @@ def uploadProblemZip(
                                        'sum-if-not-zero'),
     }
 
-    exists = client.problem.details(problem_alias=alias,
-                                    check_=False)['status'] == 'ok'
-
-    if not exists:
-        if not canCreate:
-            raise Exception("Problem doesn't exist!")
-        logging.info("Problem doesn't exist. Creating problem.")
-        endpoint = '/api/problem/create/'
-    else:
-        endpoint = '/api/problem/update/'
-
     languages = payload.get('languages', '')
 
     if languages == 'all':
@@ -134,23 +79,89 @@ def uploadProblemZip(
     elif languages == 'none':
         payload['languages'] = ''
 
-    files = {'problem_contents': open(zipPath, 'rb')}
+    return payload
+
+
+def problemMetadata(problemConfig: Mapping[str, Any]) -> Dict[str, Any]:
+    """Returns the parts of the configuration that are synced after upload.
+
+    These are the admins, admin groups and tags, which are not part of the
+    problem version and are synced through separate API calls.
+    """
+    misc = problemConfig['misc']
+    return {
+        'admins': misc.get('admins', []),
+        'admin-groups': misc.get('admin-groups', []),
+        'tags': misc.get('tags'),
+    }
+
 
-    client.query(endpoint, payload, files, timeout)
+class ProblemState(NamedTuple):
+    """The current state of a problem in omegaUp."""
+    exists: bool
+    admins: Optional[omegaup.api.ApiReturnType]
+    tags: Optional[omegaup.api.ApiReturnType]
+    # The number of API calls that were made to read the state.
+    apiCalls: int
 
-    targetAdmins = misc.get('admins', [])
-    targetAdminGroups = misc.get('admin-groups', [])
 
-    if targetAdmins or targetAdminGroups:
-        allAdmins = client.problem.admins(problem_alias=alias)
+def readProblemState(
+    client: omegaup.api.Client,
+    problemConfig: Mapping[str, Any],
+    *,
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+) -> ProblemState:
+    """Reads the current state of a problem.
+
+    All the reads are issued concurrently, so this costs a single round-trip.
+    Only the admins and tags that are present in the configuration are read.
+    """
+    misc = problemConfig['misc']
+    alias = misc['alias']
 
-    if targetAdmins is not None:
+    reads: Dict[str, Callable[[], omegaup.api.ApiReturnType]] = {
+        'details':
+        lambda: client.problem.details(problem_alias=alias, check_=False),
+    }
+    if 'admins' in misc or 'admin-groups' in misc:
+        reads['admins'] = lambda: client.problem.admins(problem_alias=alias,
+                                                        check_=False)
+    if 'tags' in misc:
+        reads['tags'] = lambda: client.problem.tags(problem_alias=alias,
+                                                    check_=False)
+    results = operations.readConcurrently(reads, concurrency=concurrency)
+
+    if results['details']['status'] != 'ok':
+        return ProblemState(exists=False,
+                            admins=None,
+                            tags=None,
+                            apiCalls=len(reads))
+    for name in ('admins', 'tags'):
+        if name in results and results[name].get('status') == 'error':
+            raise Exception(results[name])
+    return ProblemState(exists=True,
+                        admins=results.get('admins'),
+                        tags=results.get('tags'),
+                        apiCalls=len(reads))
+
+
+def problemMetadataOperations(
+    client: omegaup.api.Client,
+    problemConfig: Mapping[str, Any],
+    state: ProblemState,
+) -> List[operations.Operation]:
+    """Computes the calls needed to sync the admins, admin groups and tags."""
+    misc = problemConfig['misc']
+    alias = misc['alias']
+    result: List[operations.Operation] = []
+
+    if 'admins' in misc and state.admins is not None:
         admins = {
             a['username'].lower()
-            for a in allAdmins['admins'] if a['role'] == 'admin'
+            for a in state.admins['admins'] if a['role'] == 'admin'
         }
 
-        desiredAdmins = {admin.lower() for admin in targetAdmins}
+        desiredAdmins = {admin.lower() for admin in misc['admins'] or []}
 
         clientAdmin: Set[str] = set()
         if client.username:
@@ -158,56 +169,301 @@ def uploadProblemZip(
         adminsToRemove = admins - desiredAdmins - clientAdmin
         adminsToAdd = desiredAdmins - admins - clientAdmin
 
-        for admin in adminsToAdd:
-            logging.info('Adding problem admin: %s', admin)
-            client.problem.addAdmin(problem_alias=alias, usernameOrEmail=admin)
-
-        for admin in adminsToRemove:
-            logging.info('Removing problem admin: %s', admin)
-            client.problem.removeAdmin(problem_alias=alias,
-                                       usernameOrEmail=admin)
-
-    if targetAdminGroups is not None:
+        for admin in sorted(adminsToAdd):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/problem/addAdmin/',
+                    payload={
+                        'problem_alias': alias,
+                        'usernameOrEmail': admin,
+                    },
+                    description=f'Adding problem admin: {admin}'))
+
+        for admin in sorted(adminsToRemove):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/problem/removeAdmin/',
+                    payload={
+                        'problem_alias': alias,
+                        'usernameOrEmail': admin,
+                    },
+                    description=f'Removing problem admin: {admin}'))
+
+    if 'admin-groups' in misc and state.admins is not None:
         adminGroups = {
             a['alias'].lower()
-            for a in allAdmins['group_admins'] if a['role'] == 'admin'
+            for a in state.admins['group_admins'] if a['role'] == 'admin'
         }
 
-        desiredGroups = {group.lower() for group in targetAdminGroups}
+        desiredGroups = {
+            group.lower()
+            for group in misc['admin-groups'] or []
+        }
 
         groupsToRemove = adminGroups - desiredGroups
         groupsToAdd = desiredGroups - adminGroups
 
-        for group in groupsToAdd:
-            logging.info('Adding problem admin group: %s', group)
-            client.problem.addGroupAdmin(problem_alias=alias, group=group)
-
-        for group in groupsToRemove:
-            logging.info('Removing problem admin group: %s', group)
-            client.problem.removeGroupAdmin(problem_alias=alias, group=group)
-
-    if 'tags' in misc:
-        tags = {
-            t['name'].lower()
-            for t in client.problem.tags(problem_alias=alias)['tags']
-        }
-
-        desiredTags = {t.lower() for t in misc['tags']}
+        for group in sorted(groupsToAdd):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/problem/addGroupAdmin/',
+                    payload={
+                        'problem_alias': alias,
+                        'group': group,
+                    },
+                    description=f'Adding problem admin group: {group}'))
+
+        for group in sorted(groupsToRemove):
+            result.append(
+                operations.Operation(
+                    endpoint='/api/problem/removeGroupAdmin/',
+                    payload={
+                        'problem_alias': alias,
+                        'group': group,
+                    },
+                    description=f'Removing problem admin group: {group}'))
+
+    if 'tags' in misc and state.tags is not None:
+        tags = {t['name'].lower() for t in state.tags['tags']}
+
+        desiredTags = {t.lower() for t in misc['tags'] or []}
 
         tagsToRemove = tags - desiredTags
         tagsToAdd = desiredTags - tags
 
-        for tag in tagsToRemove:
-            if tag.startsWith('problemRestrictedTag'):
+        for tag in sorted(tagsToRemove):
+            if tag.startswith('problemrestrictedtag'):
                 logging.info('Skipping restricted tag: %s', tag)
                 continue
-            client.problem.removeTag(problem_alias=alias, name=tag)
+            result.append(
+                operations.Operation(
+                    endpoint='/api/problem/removeTag/',
+                    payload={
+                        'problem_alias': alias,
+                        'name': tag,
+                    },
+                    description=f'Removing problem tag: {tag}'))
+
+        for tag in sorted(tagsToAdd):
+            result.append(
+                operations.Operation(endpoint='/api/problem/addTag/',
+                                     payload={
+                                         'problem_alias': alias,
+                                         'name': tag,
+                                         'public': str(False),
+                                     },
+                                     description=f'Adding problem tag: {tag}'))
+
+    return result
+
+
+def syncProblemMetadata(
+    client: omegaup.api.Client,
+    problemConfig: Mapping[str, Any],
+    *,
+    state: Optional[ProblemState] = None,
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+) -> int:
+    """Syncs the admins, admin groups and tags of an existing problem.
+
+    If the current `state` of the problem is not provided, or the problem did
+    not exist yet when it was read, it is read first. Returns the number of
+    API calls that were made.
+    """
+    apiCalls = 0
+    if state is None or not state.exists:
+        state = readProblemState(client,
+                                 problemConfig,
+                                 concurrency=concurrency)
+        apiCalls += state.apiCalls
+    metadataOperations = problemMetadataOperations(client, problemConfig,
+                                                   state)
+    operations.applyOperations(client,
+                               metadataOperations,
+                               concurrency=concurrency)
+    return apiCalls + len(metadataOperations)
+
+
+def _uploadProblemContents(
+    client: omegaup.api.Client,
+    problemConfig: Mapping[str, Any],
+    canCreate: bool,
+    commitMessage: str,
+    upload: Callable[[str, Dict[str, Any]], None],
+    concurrency: int,
+) -> Tuple[ProblemState, int]:
+    """Uploads the problem contents with `upload`.
+
+    The current state is read before the upload, so that the metadata can be
+    synced right after it without another round-trip. Returns that state and
+    the number of API calls that were made.
+    """
+    state = readProblemState(client, problemConfig, concurrency=concurrency)
+
+    if not state.exists:
+        if not canCreate:
+            raise Exception("Problem doesn't exist!")
+        logging.info("Problem doesn't exist. Creating problem.")
+        endpoint = '/api/problem/create/'
+    else:
+        endpoint = '/api/problem/update/'
 
-        for tag in tagsToAdd:
-            logging.info('Adding problem tag: %s', tag)
-            client.problem.addTag(problem_alias=alias,
-                                  name=tag,
-                                  public=payload.get('public', False))
+    upload(endpoint, problemPayload(problemConfig, commitMessage))
+    return state, state.apiCalls + 1
+
+
+def _zipUpload(
+    client: omegaup.api.Client,
+    zipPath: str,
+    timeout: datetime.timedelta,
+) -> Callable[[str, Dict[str, Any]], None]:
+    """Returns a function that uploads the .zip in `zipPath`."""
+    def _upload(endpoint: str, payload: Dict[str, Any]) -> None:
+        with open(zipPath, 'rb') as f:
+            client.query(endpoint, payload, {'problem_contents': f}, timeout)
+
+    return _upload
+
+
+def _streamUpload(
+    client: deployclient.Client,
+    problemConfig: Mapping[str, Any],
+    problemPath: str,
+    timeout: datetime.timedelta,
+    compressionPolicy: problempackage.CompressionPolicy,
+) -> Callable[[str, Dict[str, Any]], None]:
+    """Returns a function that uploads the .zip while it is being built."""
+    def _upload(endpoint: str, payload: Dict[str, Any]) -> None:
+        with problempackage.ProblemZipStream(
+                problemConfig, problemPath,
+                policy=compressionPolicy) as stream:
+            client.queryStreaming(endpoint,
+                                  payload,
+                                  fileField='problem_contents',
+                                  filename='problem.zip',
+                                  chunks=stream,
+                                  timeout_=timeout)
+            logging.debug('Streamed %d bytes', stream.size)
+
+    return _upload
+
+
+def uploadProblemZip(
+    client: omegaup.api.Client,
+    problemConfig: Mapping[str, Any],
+    canCreate: bool,
+    zipPath: str,
+    commitMessage: str,
+    timeout: datetime.timedelta,
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+) -> int:
+    """Uploads a problem with the given .zip and configuration.
+
+    Returns the number of API calls that were made.
+    """
+    state, apiCalls = _uploadProblemContents(
+        client, problemConfig, canCreate, commitMessage,
+        _zipUpload(client, zipPath, timeout), concurrency)
+    return apiCalls + syncProblemMetadata(
+        client, problemConfig, state=state, concurrency=concurrency)
+
+
+def _problemHashes(
+        problemConfig: Mapping[str, Any],
+        entries: Iterable[problempackage.PackageEntry]) -> Dict[str, str]:
+    """Returns the hashes of the sections recorded in the deploy manifest."""
+    # The commit message changes on every deploy, so it is not considered
+    # when deciding whether the settings changed.
+    settings = problemPayload(problemConfig, '')
+    del settings['message']
+    return {
+        'contents': problempackage.manifestHash(entries),
+        'settings': manifest.hashJson(settings),
+        'metadata': manifest.hashJson(problemMetadata(problemConfig)),
+    }
+
+
+def _changedSections(deployManifest: manifest.DeployManifest, alias: str,
+                     hashes: Mapping[str, str]) -> Set[str]:
+    """Returns the sections that changed since the last deploy."""
+    previous = deployManifest.get('problems', alias)
+    return {
+        section
+        for section, sectionHash in hashes.items()
+        if previous.get(section) != sectionHash
+    }
+
+
+def planProblem(
+    client: omegaup.api.Client,
+    problemPath: str,
+    canCreate: bool,
+    deployManifest: Optional[manifest.DeployManifest] = None,
+    compressionPolicy: problempackage.CompressionPolicy = (
+        problempackage.CompressionPolicy()),
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+    exactSize: bool = False,
+) -> operations.Plan:
+    """Computes what uploading a problem would do, without changing it.
+
+    Only read calls are made. The bytes to upload are the uncompressed size
+    of the package, unless `exactSize` is set, in which case the problem is
+    packaged (but not stored) to know the size of the .zip.
+    """
+    problemConfig = configindex.loadConfig(
+        os.path.join(problemPath, 'settings.json'))
+
+    title = problemConfig['title']
+    alias = problemConfig['misc']['alias']
+    entries = problempackage.packageManifest(problemConfig, problemPath)
+    changes = {'contents', 'settings', 'metadata'}
+    if deployManifest is not None:
+        changes = _changedSections(deployManifest, alias,
+                                   _problemHashes(problemConfig, entries))
+        if not changes:
+            return operations.Plan(title=title,
+                                   action='unchanged',
+                                   reads=0,
+                                   operations=[])
+
+    state = readProblemState(client, problemConfig, concurrency=concurrency)
+    if changes == {'metadata'}:
+        return operations.Plan(title=title,
+                               action='metadata',
+                               reads=state.apiCalls,
+                               operations=problemMetadataOperations(
+                                   client, problemConfig, state))
+
+    if state.exists:
+        action = 'update'
+        endpoint = '/api/problem/update/'
+    else:
+        action = 'create' if canCreate else 'missing'
+        endpoint = '/api/problem/create/'
+        # The metadata is synced right after the problem is created, when it
+        # has no admins nor tags yet.
+        state = state._replace(admins={'admins': [], 'group_admins': []},
+                               tags={'tags': []})
+    if exactSize:
+        uploadBytes = problempackage.problemZipSize(problemConfig,
+                                                    problemPath,
+                                                    compressionPolicy)
+        sizeDescription = f'{uploadBytes} bytes'
+    else:
+        uploadBytes = sum(entry.size for entry in entries)
+        sizeDescription = f'{uploadBytes} bytes uncompressed'
+    return operations.Plan(
+        title=title,
+        action=action,
+        reads=state.apiCalls,
+        operations=[
+            operations.Operation(
+                endpoint=endpoint,
+                payload=problemPayload(problemConfig, ''),
+                description=('Uploading problem contents '
+                             f'({sizeDescription})')),
+        ] + problemMetadataOperations(client, problemConfig, state),
+        uploadBytes=uploadBytes)
 
 
 def uploadProblem(
@@ -216,23 +472,115 @@ def uploadProblem(
     commitMessage: str,
     canCreate: bool,
     timeout: datetime.timedelta,
+    deployManifest: Optional[manifest.DeployManifest] = None,
+    streaming: bool = False,
+    compressionPolicy: problempackage.CompressionPolicy = (
+        problempackage.CompressionPolicy()),
+    concurrency: int = operations.DEFAULT_CONCURRENCY,
+    deployJournal: Optional[journal.DeployJournal] = None,
+    retries: int = 4,
+    force: bool = False,
 ) -> None:
-    with open(os.path.join(problemPath, 'settings.json'), 'r') as f:
-        problemConfig = json.load(f)
+    """Uploads a problem, skipping it if it has not changed.
+
+    If a `deployManifest` is provided, problems whose packaged contents and
+    settings match the last successful deploy are not uploaded again. If only
+    their admins or tags changed, just those are synced. With `force`, the
+    problem is uploaded regardless, and the manifest is still updated.
+
+    If `streaming` is set and the client supports it, the package is built
+    while it is being uploaded. Otherwise it is built in a temporary file.
+
+    Up to `concurrency` API calls are made at the same time.
+
+    The upload is done in two steps, `contents` and `metadata`, which are
+    retried up to `retries` times on transient failures. Since `contents` is
+    not idempotent, it is only retried when the server could not be reached.
+    If a `deployJournal` is provided, steps that it already has as completed
+    are skipped.
+    """
+    problemConfig = configindex.loadConfig(
+        os.path.join(problemPath, 'settings.json'))
+
+    alias = problemConfig['misc']['alias']
+    key = f'problem:{alias}'
+    hashes = _problemHashes(
+        problemConfig,
+        problempackage.packageManifest(problemConfig, problemPath))
+
+    def _step(step: str,
+              fn: Callable[[], int],
+              retryable: Callable[[Exception], bool] = journal.isTransient
+              ) -> int:
+        if deployJournal is None:
+            return journal.retrying(fn,
+                                    description=f'{key}: {step}',
+                                    retries=retries,
+                                    retryable=retryable)
+        return deployJournal.run(key,
+                                 step,
+                                 fn,
+                                 default=0,
+                                 retries=retries,
+                                 retryable=retryable)
+
+    state: Optional[ProblemState] = None
+
+    def _contents() -> int:
+        nonlocal state
+        if streaming and isinstance(client, deployclient.Client):
+            state, apiCalls = _uploadProblemContents(
+                client, problemConfig, canCreate, commitMessage,
+                _streamUpload(client, problemConfig, problemPath, timeout,
+                              compressionPolicy), concurrency)
+        else:
+            with tempfile.NamedTemporaryFile() as tempFile:
+                problempackage.createProblemZip(problemConfig, problemPath,
+                                                tempFile.name,
+                                                compressionPolicy)
+                state, apiCalls = _uploadProblemContents(
+                    client, problemConfig, canCreate, commitMessage,
+                    _zipUpload(client, tempFile.name, timeout), concurrency)
+        return apiCalls
+
+    def _metadata() -> int:
+        nonlocal state
+        # The state that was read before the upload is only used on the
+        # first attempt, since a failed attempt might have changed it.
+        knownState, state = state, None
+        return syncProblemMetadata(client,
+                                   problemConfig,
+                                   state=knownState,
+                                   concurrency=concurrency)
+
+    if deployManifest is not None and not force:
+        changes = _changedSections(deployManifest, alias, hashes)
+        if not changes:
+            logging.info('No changes to %s since the last deploy. '
+                         'Skipping.', problemConfig['title'])
+            return
+        if changes == {'metadata'}:
+            logging.info('Only the metadata of %s changed. Syncing it.',
+                         problemConfig['title'])
+            apiCalls = _step('metadata', _metadata)
+            deployManifest.update('problems', alias, hashes)
+            logging.info('Success syncing %s (%d API calls)',
+                         problemConfig['title'], apiCalls)
+            return
 
     logging.info('Uploading problem: %s', problemConfig['title'])
 
-    with tempfile.NamedTemporaryFile() as tempFile:
-        createProblemZip(problemConfig, problemPath, tempFile.name)
+    # Creating or updating the problem is not idempotent, and a timeout does
+    # not mean that the server did not do it, so only failures to connect
+    # are retried.
+    apiCalls = _step('contents', _contents, retryable=journal.isUnsent)
+    apiCalls += _step('metadata', _metadata)
 
-        uploadProblemZip(client,
-                         problemConfig,
-                         canCreate,
-                         tempFile.name,
-                         commitMessage=commitMessage,
-                         timeout=timeout)
+    logging.info('Success uploading %s (%d API calls)',
+                 problemConfig['title'], apiCalls)
 
-        logging.info('Success uploading %s', problemConfig['title'])
+    if deployManifest is not None:
+        deployManifest.update('problems', alias, hashes)
 
 
 def _main() -> None:
@@ -276,38 +624,113 @@ def _main() -> None:
                         type=int,
                         default=60,
                         help="Timeout for deploy API call (in seconds)")
+    parser.add_argument('--manifest',
+                        type=str,
+                        default=None,
+                        help=('Path of the deploy manifest that records what '
+                              'was last deployed. Defaults to a file in the '
+                              'state directory.'))
+    parser.add_argument('--force',
+                        action='store_true',
+                        help=('Upload the problems even if the deploy '
+                              'manifest says they have not changed.'))
+    parser.add_argument('--streaming',
+                        action='store_true',
+                        help=('Stream each problem .zip into the request '
+                              'while it is being built, instead of building '
+                              'it in a temporary file first. The server must '
+                              'accept chunked request bodies.'))
+    problempackage.addCompressionArguments(parser)
+    deployclient.addClientArguments(parser)
+    journal.addJournalArguments(parser)
+    parser.add_argument('--plan',
+                        action='store_true',
+                        help=('Only report what would be uploaded and which '
+                              'API calls would be made, without changing '
+                              'anything.'))
+    parser.add_argument('--plan-exact-size',
+                        action='store_true',
+                        help=('With --plan, package each problem to report '
+                              'the exact size of its .zip instead of the '
+                              'uncompressed size of its files.'))
     parser.add_argument('problem_paths',
                         metavar='PROBLEM',
                         type=str,
                         nargs='*')
+    problems.addAnnotationArguments(parser)
+
     args = parser.parse_args()
+    problems.configureAnnotations(args)
 
     logging.basicConfig(format='%(asctime)s: %(message)s',
                         level=logging.DEBUG if args.verbose else logging.INFO)
     logging.getLogger('urllib3').setLevel(logging.CRITICAL)
 
-    client = omegaup.api.Client(username=args.username,
-                                password=args.password,
-                                api_token=args.api_token,
-                                url=args.url)
+    client = deployclient.Client(username=args.username,
+                                 password=args.password,
+                                 api_token=args.api_token,
+                                 url=args.url,
+                                 poolSize=args.api_concurrency)
+    client.dumpMetricsAtExit(args.metrics_file)
 
-    if env.get('GITHUB_ACTIONS'):
-        commit = env['GITHUB_SHA']
-    else:
-        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'],
-                                         universal_newlines=True).strip()
+    commit = repository.currentCommit()
 
     rootDirectory = repository.repositoryRoot()
 
-    for problem in problems.problems(allProblems=args.all,
-                                     rootDirectory=rootDirectory,
-                                     problemPaths=args.problem_paths):
+    deployManifest = manifest.DeployManifest(
+        args.manifest or os.path.join(repository.stateDirectory(rootDirectory),
+                                      'deploy-manifest.json'),
+        url=args.url)
+
+    compressionPolicy = problempackage.compressionPolicy(args)
+    problemList = problems.problems(allProblems=args.all,
+                                    rootDirectory=rootDirectory,
+                                    problemPaths=args.problem_paths)
+    if not schemas.validate(problemList=problemList,
+                            rootDirectory=rootDirectory,
+                            ci=args.ci):
+        sys.exit(1)
+
+    if args.plan:
+        plans = operations.readConcurrently(
+            {
+                problem.path:
+                functools.partial(planProblem,
+                                  client,
+                                  os.path.join(rootDirectory, problem.path),
+                                  canCreate=args.can_create,
+                                  deployManifest=(None if args.force else
+                                                  deployManifest),
+                                  compressionPolicy=compressionPolicy,
+                                  concurrency=args.api_concurrency,
+                                  exactSize=args.plan_exact_size)
+                for problem in problemList
+            },
+            concurrency=args.api_concurrency)
+        operations.logPlans(list(plans.values()))
+        return
+
+    deployJournal = journal.DeployJournal(
+        os.path.join(repository.stateDirectory(rootDirectory),
+                     'problems-journal.json'),
+        commit=commit,
+        url=args.url,
+        resume=args.resume)
+
+    for problem in problemList:
         uploadProblem(
             client,
             os.path.join(rootDirectory, problem.path),
             commitMessage=f'Deployed automatically from commit {commit}',
             canCreate=args.can_create,
-            timeout=datetime.timedelta(seconds=args.timeout))
+            timeout=datetime.timedelta(seconds=args.timeout),
+            deployManifest=deployManifest,
+            streaming=args.streaming,
+            compressionPolicy=compressionPolicy,
+            concurrency=args.api_concurrency,
+            deployJournal=deployJournal,
+            retries=args.retries,
+            force=args.force)
 
 
 if __name__ == '__main__':